@@ -1,3 +1,4 @@
+from django.http import StreamingHttpResponse
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
@@ -11,8 +12,11 @@ logger = logging.getLogger(__name__)
 REQUEST_TIMEOUT = 30
 
 
-def make_internal_request(method, path, data=None, headers=None):
-    """Helper function to make internal API requests"""
+def make_internal_request(method, path, data=None, headers=None, stream=False):
+    """Helper function to make internal API requests
+
+    With ``stream`` the body is not read up front, for streamed responses.
+    """
     url = f"{settings.INTERNAL_API_BASE_URL}{path}"
     default_headers = {
         'Content-Type': 'application/json',
@@ -27,7 +31,8 @@ def make_internal_request(method, path, data=None, headers=None):
             url,
             json=data,
             headers=default_headers,
-            timeout=REQUEST_TIMEOUT
+            timeout=REQUEST_TIMEOUT,
+            stream=stream
         )
         response.raise_for_status()
         return response
@@ -44,9 +49,12 @@ def query_auto_generate(request, project_id):
     """
     try:
         schema_path = f"/api/v1/projects/{project_id}/database-schema/"
+        if request.data.get('refresh_schema', False):
+            schema_path += "?refresh=true"
         schema_response = make_internal_request('GET', schema_path)
 
-        if not request.data.get("user_requirements") or not request.data.get("llm_provider"):
+        if not request.data.get("user_requirements") or not (
+                request.data.get("llm_provider") or request.data.get("model_class")):
             return Response(
                 {"error": "Missing user_requirements or llm_provider"},
                 status=status.HTTP_400_BAD_REQUEST
@@ -61,9 +69,11 @@ def query_auto_generate(request, project_id):
         generate_data = {
             'dataset_metadata': cleaned_response,
             'user_requirements': request.data.get('user_requirements'),
-            'llm_provider': request.data.get('llm_provider'),
             'project_id': project_id
         }
+        for field in ('llm_provider', 'model_class'):
+            if request.data.get(field):
+                generate_data[field] = request.data.get(field)
 
 
         generate_path = "/api/v1/query/generate/"
@@ -80,6 +90,64 @@ def query_auto_generate(request, project_id):
 
 
 
+@api_view(['POST'])
+def query_auto_generate_batch(request, project_id):
+    """
+    POST /api/v1/projects/<int:project_id>/query/generate/batch/
+    Fetches the schema once and generates a query for every prompt of ``prompts``,
+    streaming the per-item results back as Server-Sent Events
+    """
+    prompts = request.data.get('prompts')
+    if not prompts or not isinstance(prompts, list) or not (
+            request.data.get('llm_provider') or request.data.get('model_class')):
+        return Response(
+            {"error": "Missing prompts or llm_provider"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        schema_path = f"/api/v1/projects/{project_id}/database-schema/"
+        if request.data.get('refresh_schema', False):
+            schema_path += "?refresh=true"
+        schema_response = make_internal_request('GET', schema_path)
+
+        cleaned_response = dict(schema_response.json())
+        cleaned_response.pop("project_id", None)
+        cleaned_response.pop("status", None)
+
+        generate_data = {
+            'dataset_metadata': cleaned_response,
+            'prompts': prompts,
+            'project_id': project_id,
+            'use_cache': request.data.get('use_cache', True)
+        }
+        for field in ('llm_provider', 'model_class'):
+            if request.data.get(field):
+                generate_data[field] = request.data.get(field)
+        generate_response = make_internal_request(
+            'POST', "/api/v1/query/generate/batch/", generate_data,
+            headers={'Accept': 'text/event-stream'}, stream=True
+        )
+
+    except Exception as e:
+        logger.error(f"Batch query generation failed: {str(e)}")
+        return Response(
+            {'error': 'Query generation failed', 'details': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+    def relay():
+        try:
+            yield from generate_response.iter_content(chunk_size=None)
+        finally:
+            generate_response.close()
+
+    response = StreamingHttpResponse(relay(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @api_view(['POST'])
 def query_integrate_execute(request, project_id):
     """
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .src.repo.models import DatabaseConfiguration, ProjectMetadata
+from .src.repo.models import (
+    DatabaseConfiguration, ProjectMetadata, SchemaSnapshot, CatalogTable, CatalogColumn,
+    SchemaRefreshRun
+)
 
 
 @admin.register(DatabaseConfiguration)
@@ -33,4 +36,39 @@ class ProjectMetadataAdmin(admin.ModelAdmin):
         ('Status', {
             'fields': ('is_active', 'created_at', 'updated_at')
         })
-    )
\ No newline at end of file
+    )
+
+
+class CatalogColumnInline(admin.TabularInline):
+    model = CatalogColumn
+    fields = ('ordinal_position', 'column_name', 'data_type', 'is_nullable', 'description')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
+@admin.register(SchemaSnapshot)
+class SchemaSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('snapshot_id', 'project', 'version', 'database_type', 'table_count', 'is_current', 'created_at')
+    list_filter = ('is_current', 'database_type')
+    search_fields = ('project__project_name',)
+    readonly_fields = ('created_at', 'content_hash', 'config_hash')
+    list_per_page = 20
+
+
+@admin.register(CatalogTable)
+class CatalogTableAdmin(admin.ModelAdmin):
+    list_display = ('table_id', 'table_name', 'snapshot', 'row_count')
+    search_fields = ('table_name', 'columns__column_name')
+    list_select_related = ('snapshot',)
+    inlines = [CatalogColumnInline]
+    list_per_page = 20
+
+
+@admin.register(SchemaRefreshRun)
+class SchemaRefreshRunAdmin(admin.ModelAdmin):
+    list_display = ('run_id', 'project', 'started_at', 'duration_ms', 'status', 'snapshot_version', 'next_run_at')
+    list_filter = ('status',)
+    search_fields = ('project__project_name', 'error_message')
+    list_select_related = ('project',)
+    list_per_page = 20
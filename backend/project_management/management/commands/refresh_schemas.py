@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from project_management.src.repo.repository import ProjectRepository
+from project_management.src.service.project_service import ProjectService
+from project_management.src.service.schema_refresh_scheduler import SchemaRefreshScheduler
+
+
+class Command(BaseCommand):
+    help = "Refresh the warehouse schemas of active projects in the background"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Refresh due projects once and exit")
+        parser.add_argument('--full', action='store_true', help="Re-read every table instead of refreshing incrementally")
+        parser.add_argument('--project', type=int, action='append', dest='project_ids',
+                            help="Refresh this project now regardless of its schedule (repeatable, implies --once)")
+        parser.add_argument('--max-concurrency', type=int,
+                            default=getattr(settings, 'SCHEMA_REFRESH_MAX_CONCURRENCY', 4))
+        parser.add_argument('--poll-interval', type=float,
+                            default=getattr(settings, 'SCHEMA_REFRESH_POLL_INTERVAL', 30))
+
+    def handle(self, *args, **options):
+        scheduler = SchemaRefreshScheduler(
+            ProjectService(ProjectRepository()),
+            interval=getattr(settings, 'SCHEMA_REFRESH_INTERVAL', 900),
+            jitter=getattr(settings, 'SCHEMA_REFRESH_JITTER', 0.1),
+            max_concurrency=options['max_concurrency'],
+            type_limits=getattr(settings, 'SCHEMA_REFRESH_TYPE_LIMITS', {}),
+            full=options['full']
+        )
+
+        if options['once'] or options['project_ids']:
+            runs = scheduler.run_once(project_ids=options['project_ids'])
+            for run in runs:
+                self.stdout.write(
+                    f"Project {run.project_id}: {run.status} in {run.duration_ms} ms"
+                    + (f" ({run.error_message})" if run.error_message else "")
+                )
+            self.stdout.write(self.style.SUCCESS(f"Refreshed {len(runs)} project schemas"))
+            return
+
+        self.stdout.write(f"Refreshing project schemas every {options['poll_interval']}s, press CTRL+C to stop")
+        try:
+            scheduler.run_forever(poll_interval=options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped")
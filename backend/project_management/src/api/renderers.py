@@ -0,0 +1,39 @@
+import json
+
+import pyarrow as pa
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from ..service.sample_data import ARROW_STREAM_MEDIA_TYPE, schema_to_arrow_stream
+
+
+class ArrowStreamRenderer(BaseRenderer):
+    """Render schema responses as an Arrow IPC stream (``Accept: application/vnd.apache.arrow.stream``)
+
+    Schema payloads are written with ``schema_to_arrow_stream``, the remaining
+    response keys (project_id, status, ...) going into the stream metadata.
+    Any other payload, such as an error, becomes a one-row table of JSON text.
+    """
+    media_type = ARROW_STREAM_MEDIA_TYPE
+    format = 'arrow'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        if isinstance(data, dict) and isinstance(data.get('schema'), dict) and 'tables' in data['schema']:
+            metadata = {key: value for key, value in data.items() if key != 'schema'}
+            return schema_to_arrow_stream(data['schema'], metadata)
+
+        if not isinstance(data, dict):
+            data = {'data': data}
+        batch = pa.RecordBatch.from_pydict({
+            key: pa.array([json.dumps(value, cls=JSONEncoder)], pa.string())
+            for key, value in data.items()
+        })
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+        return sink.getvalue().to_pybytes()
@@ -9,5 +9,7 @@ urlpatterns = [
     path('projects/<int:project_id>/restore', views.restore_project, name='restore_project'),
     path('database-configurations/<str:database_type>/', views.get_database_config, name='get-database-config'),
     path('projects/<int:project_id>/database-schema/', views.retrieve_database_schema, name='retrieve_database_schema'),
+    path('projects/<int:project_id>/database-schema/stream/', views.stream_database_schema, name='stream_database_schema'),
+    path('projects/<int:project_id>/relationships/', views.retrieve_relationships, name='retrieve_relationships'),
 
 ]
\ No newline at end of file
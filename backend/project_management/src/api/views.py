@@ -1,10 +1,18 @@
+import json
+
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework import status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, renderer_classes
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from ..repo.models import ProjectMetadata, DatabaseConfiguration
 from ..repo.repository import ProjectRepository
 from ..service.project_service import ProjectService
+from ..service.schema_selection import SchemaSelection
+from ..service.sample_data import jsonable_schema, jsonable_table
+from .renderers import ArrowStreamRenderer
 from .serializers import (
     ProjectSetupRequestSerializer,
     ProjectSetupResponseSerializer,
@@ -29,9 +37,14 @@ def root_view(request):
             "project-detail": "/api/v1/projects/<int:project_id>/",
             "get-database-config": "/api/v1/database-configurations/<str:database_type>/",
             "get-database-schema": "/api/v1/projects/<int:project_id>/database-schema/",
+            "stream-database-schema": "/api/v1/projects/<int:project_id>/database-schema/stream/",
+            "get-relationships": "/api/v1/projects/<int:project_id>/relationships/",
             "integrate-execute-query": "/api/v1/projects/<int:project_id>/query/integrate-execute/",
             "execute-query": "/api/v1/projects/<int:project_id>/query/run/",
             "generate-query": "/api/v1/projects/<int:project_id>/query/generate/",
+            "stream-generate-query": "/api/v1/query/generate/stream/",
+            "generate-query-batch": "/api/v1/projects/<int:project_id>/query/generate/batch/",
+            "llm-metrics": "/api/v1/query/metrics/",
 
 
         }
@@ -90,7 +103,7 @@ def project_detail(request, project_id):
     elif request.method == 'PATCH':
 
 
-        project_repository.update_project_metadata(request.data,project_id)
+        project_service.update_project(request.data, project_id)
         return Response({
             'status': 'success',
             'message': 'Project updated successfully'
@@ -126,20 +139,43 @@ def get_database_config(request, database_type):
 
 
 @api_view(['GET'])
+@renderer_classes([JSONRenderer, BrowsableAPIRenderer, ArrowStreamRenderer])
 def retrieve_database_schema(request, project_id):
     """
     Retrieve database schema details for a specific project.
+
+    Pass ``?refresh=true`` to bypass the schema cache. Tables can be selected
+    with ``include``/``exclude`` globs or ``include_regex``/``exclude_regex``,
+    sample rows turned off with ``samples=false`` or capped with
+    ``max_sample_rows``, table keys projected with ``fields=columns,...`` and
+    tables paged with ``limit`` and the returned ``next_cursor``. Pass
+    ``profile=true`` to add row counts, null fractions, distinct counts and
+    min/max values per column.
+
+    With ``Accept: application/vnd.apache.arrow.stream`` the schema is returned
+    as an Arrow IPC stream and sample rows keep their warehouse types.
     """
     try:
+        refresh = request.query_params.get('refresh', 'false').lower() == 'true'
+        profile = request.query_params.get('profile', 'false').lower() == 'true'
+        selection = SchemaSelection.from_query_params(request.query_params)
 
-        details = project_service.get_schema_details(project_id)
+        details = project_service.get_schema_details(
+            project_id, refresh=refresh, selection=selection, profile=profile
+        )
+        schema = details['schema']
+        if request.accepted_renderer.format != ArrowStreamRenderer.format:
+            schema = jsonable_schema(schema)
 
-        return Response({
+        response = {
             'project_id': project_id,
             'database_type': details['database_type'],
-            'schema': details['schema'],
+            'schema': schema,
             'status': 'success'
-        })
+        }
+        if 'next_cursor' in details:
+            response['next_cursor'] = details['next_cursor']
+        return Response(response)
 
     except ValueError as e:
         return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -149,6 +185,59 @@ def retrieve_database_schema(request, project_id):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@api_view(['GET'])
+def retrieve_relationships(request, project_id):
+    """
+    Retrieve the primary keys and foreign keys of a project's schema.
+
+    Pass ``?tables=orders,customers`` to also get the ``join_path``: the
+    foreign keys joining those tables through the fewest intermediate tables.
+    Pass ``?refresh=true`` to bypass the schema cache.
+    """
+    try:
+        refresh = request.query_params.get('refresh', 'false').lower() == 'true'
+        tables = [
+            table.strip()
+            for value in request.query_params.getlist('tables')
+            for table in value.split(',')
+            if table.strip()
+        ]
+
+        details = project_service.get_relationships(project_id, tables=tables, refresh=refresh)
+        return Response({'project_id': project_id, **details, 'status': 'success'})
+
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response(
+            {'detail': f"Database error: {str(e)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@api_view(['GET'])
+def stream_database_schema(request, project_id):
+    """
+    Stream database schema details as NDJSON, one table per line.
+
+    The first line describes the database type, then every table is written as
+    soon as it has been introspected, and a final ``end`` line carries the
+    schema-level fields. Failures after streaming started are reported as an
+    ``error`` line. Pass ``?refresh=true`` to bypass the schema cache.
+    """
+    try:
+        refresh = request.query_params.get('refresh', 'false').lower() == 'true'
+        events = project_service.stream_schema_details(project_id, refresh=refresh)
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    response = StreamingHttpResponse(
+        (json.dumps({'project_id': project_id, **jsonable_table(event)}, cls=JSONEncoder) + '\n' for event in events),
+        content_type='application/x-ndjson'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @api_view(['POST'])
 def restore_project(request, project_id):
         try:
@@ -52,4 +52,127 @@ class ProjectMetadata(models.Model):
         ]
 
     def __str__(self):
-        return f"{self.project_name} (ID: {self.project_id})"
\ No newline at end of file
+        return f"{self.project_name} (ID: {self.project_id})"
+
+class SchemaSnapshot(models.Model):
+    snapshot_id = models.AutoField(primary_key=True)
+    project = models.ForeignKey(
+        ProjectMetadata,
+        on_delete=models.CASCADE,
+        related_name='schema_snapshots'
+    )
+    version = models.PositiveIntegerField(null=False)
+    database_type = models.CharField(max_length=50, null=False)
+    config_hash = models.CharField(max_length=64, null=False)
+    content_hash = models.CharField(max_length=64, null=False)
+    schema_metadata = models.JSONField(default=dict)
+    table_markers = models.JSONField(null=True, blank=True)
+    table_count = models.PositiveIntegerField(default=0)
+    is_current = models.BooleanField(default=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'schema_snapshots'
+        verbose_name = 'Schema Snapshot'
+        verbose_name_plural = 'Schema Snapshots'
+        ordering = ['project', '-version']
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'version'], name='unique_schema_snapshot_version'),
+        ]
+        indexes = [
+            models.Index(fields=['project', 'is_current']),
+        ]
+
+    def __str__(self):
+        return f"Project {self.project_id} schema v{self.version}"
+
+
+class CatalogTable(models.Model):
+    table_id = models.AutoField(primary_key=True)
+    snapshot = models.ForeignKey(
+        SchemaSnapshot,
+        on_delete=models.CASCADE,
+        related_name='tables'
+    )
+    table_name = models.CharField(max_length=255, null=False)
+    position = models.PositiveIntegerField(default=0)
+    row_count = models.BigIntegerField(null=True, blank=True)
+    sample_rows = models.JSONField(null=True, blank=True)
+    properties = models.JSONField(default=dict)
+
+    class Meta:
+        db_table = 'catalog_tables'
+        verbose_name = 'Catalog Table'
+        verbose_name_plural = 'Catalog Tables'
+        ordering = ['snapshot', 'position']
+        constraints = [
+            models.UniqueConstraint(fields=['snapshot', 'table_name'], name='unique_catalog_table_name'),
+        ]
+        indexes = [
+            models.Index(fields=['table_name']),
+        ]
+
+    def __str__(self):
+        return f"{self.table_name} (snapshot {self.snapshot_id})"
+
+
+class CatalogColumn(models.Model):
+    column_id = models.AutoField(primary_key=True)
+    table = models.ForeignKey(
+        CatalogTable,
+        on_delete=models.CASCADE,
+        related_name='columns'
+    )
+    column_name = models.CharField(max_length=255, null=False)
+    ordinal_position = models.PositiveIntegerField(null=False)
+    data_type = models.CharField(max_length=255, null=True, blank=True)
+    is_nullable = models.BooleanField(null=True)
+    description = models.TextField(null=True, blank=True)
+    properties = models.JSONField(default=dict)
+
+    class Meta:
+        db_table = 'catalog_columns'
+        verbose_name = 'Catalog Column'
+        verbose_name_plural = 'Catalog Columns'
+        ordering = ['table', 'ordinal_position']
+        constraints = [
+            models.UniqueConstraint(fields=['table', 'column_name'], name='unique_catalog_column_name'),
+        ]
+        indexes = [
+            models.Index(fields=['column_name']),
+        ]
+
+    def __str__(self):
+        return f"{self.table.table_name}.{self.column_name}"
+
+
+class SchemaRefreshRun(models.Model):
+    STATUS_CHOICES = [
+        ('success', 'Success'),
+        ('failed', 'Failed'),
+    ]
+
+    run_id = models.AutoField(primary_key=True)
+    project = models.ForeignKey(
+        ProjectMetadata,
+        on_delete=models.CASCADE,
+        related_name='schema_refresh_runs'
+    )
+    started_at = models.DateTimeField(null=False)
+    duration_ms = models.PositiveIntegerField(null=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, null=False)
+    error_message = models.TextField(null=True, blank=True)
+    snapshot_version = models.PositiveIntegerField(null=True, blank=True)
+    next_run_at = models.DateTimeField(null=False)
+
+    class Meta:
+        db_table = 'schema_refresh_runs'
+        verbose_name = 'Schema Refresh Run'
+        verbose_name_plural = 'Schema Refresh Runs'
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['project', '-started_at']),
+        ]
+
+    def __str__(self):
+        return f"Project {self.project_id} refresh at {self.started_at} ({self.status})"
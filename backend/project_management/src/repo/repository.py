@@ -1,5 +1,11 @@
+import hashlib
+import json
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from .models import ProjectMetadata, DatabaseConfiguration
+from django.db import transaction
+from django.db.models import Max, Q
+from rest_framework.utils.encoders import JSONEncoder
+from .models import ProjectMetadata, DatabaseConfiguration, SchemaSnapshot, CatalogTable, CatalogColumn
 from datetime import datetime
 
 class ProjectRepository:
@@ -74,3 +80,187 @@ class ProjectRepository:
             project.save()
         except ProjectMetadata.DoesNotExist:
             pass
+
+
+class SchemaCatalogRepository:
+    """Versioned copies of project schemas stored in our own database
+
+    Every ``save_snapshot`` call whose content differs from the current
+    snapshot of the project creates a new version with one CatalogTable row
+    per table and one CatalogColumn row per column, so tables and columns can
+    be looked up by name without reaching the customer warehouse.
+
+    Table fields that follow the data rather than the schema (sample rows, row
+    counts, modification times) are left out of the content hash and updated
+    in place on the current version. Only the latest
+    ``SCHEMA_CATALOG_KEEP_VERSIONS`` versions of a project are kept.
+    """
+
+    COLUMN_FIELDS = ('name', 'type')
+    TABLE_FIELDS = ('columns', 'sample_rows')
+    VOLATILE_TABLE_FIELDS = ('sample_rows', 'num_rows', 'modified')
+
+    @classmethod
+    def content_hash(cls, schema_info):
+        structure = {
+            **schema_info,
+            'tables': {
+                table_name: {key: value for key, value in table_info.items() if key not in cls.VOLATILE_TABLE_FIELDS}
+                for table_name, table_info in schema_info.get('tables', {}).items()
+            }
+        }
+        payload = json.dumps(structure, sort_keys=True, cls=JSONEncoder)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def save_snapshot(self, project_id, database_type, config_hash, schema_info, markers=None):
+        """Store a schema as the project's current snapshot
+
+        Args:
+            project_id: Project the schema belongs to
+            database_type: Warehouse type the schema was read from
+            config_hash: Hash of the connection settings it was read with
+            schema_info: Schema dictionary as returned by the schema retrievers
+            markers: Optional per-table change markers of the schema
+
+        Returns:
+            The current SchemaSnapshot, which is the existing one if nothing changed
+        """
+        schema_info = json.loads(json.dumps(schema_info, cls=JSONEncoder))
+        content_hash = self.content_hash(schema_info)
+
+        with transaction.atomic():
+            # Lock the project row so concurrent saves get consecutive versions
+            ProjectMetadata.objects.select_for_update().get(pk=project_id)
+            current = self.get_current_snapshot(project_id)
+            if current is not None and current.content_hash == content_hash and current.config_hash == config_hash:
+                if current.table_markers != markers:
+                    current.table_markers = markers
+                    current.save(update_fields=['table_markers'])
+                self._update_volatile_fields(current, schema_info.get('tables', {}))
+                return current
+
+            version = (
+                SchemaSnapshot.objects.filter(project_id=project_id).aggregate(Max('version'))['version__max'] or 0
+            ) + 1
+            SchemaSnapshot.objects.filter(project_id=project_id, is_current=True).update(is_current=False)
+
+            tables = schema_info.get('tables', {})
+            snapshot = SchemaSnapshot.objects.create(
+                project_id=project_id,
+                version=version,
+                database_type=database_type,
+                config_hash=config_hash,
+                content_hash=content_hash,
+                schema_metadata={key: value for key, value in schema_info.items() if key != 'tables'},
+                table_markers=markers,
+                table_count=len(tables),
+                is_current=True
+            )
+
+            catalog_tables = CatalogTable.objects.bulk_create([
+                CatalogTable(
+                    snapshot=snapshot,
+                    table_name=table_name,
+                    position=position,
+                    row_count=table_info.get('num_rows'),
+                    sample_rows=table_info.get('sample_rows'),
+                    properties={key: value for key, value in table_info.items() if key not in self.TABLE_FIELDS}
+                )
+                for position, (table_name, table_info) in enumerate(tables.items())
+            ])
+            # bulk_create only sets primary keys on some backends, so re-read them
+            table_ids = dict(CatalogTable.objects.filter(snapshot=snapshot).values_list('table_name', 'table_id'))
+
+            CatalogColumn.objects.bulk_create([
+                CatalogColumn(
+                    table_id=table_ids[catalog_table.table_name],
+                    column_name=column['name'],
+                    ordinal_position=ordinal,
+                    data_type=column.get('type'),
+                    is_nullable=self._column_nullable(column),
+                    description=column.get('description') or None,
+                    properties={key: value for key, value in column.items() if key not in self.COLUMN_FIELDS}
+                )
+                for catalog_table in catalog_tables
+                for ordinal, column in enumerate(tables[catalog_table.table_name].get('columns') or [], start=1)
+            ], batch_size=1000)
+
+            keep = getattr(settings, 'SCHEMA_CATALOG_KEEP_VERSIONS', 10)
+            if keep:
+                # Tables and columns of old versions go with them (on_delete=CASCADE)
+                SchemaSnapshot.objects.filter(project_id=project_id, version__lte=version - keep).delete()
+
+        return snapshot
+
+    def _update_volatile_fields(self, snapshot, tables):
+        """Refresh sample rows, row counts and other data-dependent fields of a snapshot's tables in place"""
+        changed = []
+        for catalog_table in CatalogTable.objects.filter(snapshot=snapshot):
+            table_info = tables.get(catalog_table.table_name)
+            if table_info is None:
+                continue
+            properties = {key: value for key, value in table_info.items() if key not in self.TABLE_FIELDS}
+            sample_rows = table_info.get('sample_rows')
+            row_count = table_info.get('num_rows')
+            if (catalog_table.sample_rows, catalog_table.row_count, catalog_table.properties) != (
+                    sample_rows, row_count, properties):
+                catalog_table.sample_rows = sample_rows
+                catalog_table.row_count = row_count
+                catalog_table.properties = properties
+                changed.append(catalog_table)
+        if changed:
+            CatalogTable.objects.bulk_update(changed, ['sample_rows', 'row_count', 'properties'], batch_size=500)
+
+    def get_current_snapshot(self, project_id):
+        return SchemaSnapshot.objects.filter(project_id=project_id, is_current=True).first()
+
+    def get_snapshot(self, project_id, version):
+        try:
+            return SchemaSnapshot.objects.get(project_id=project_id, version=version)
+        except SchemaSnapshot.DoesNotExist:
+            return None
+
+    def list_snapshots(self, project_id):
+        return SchemaSnapshot.objects.filter(project_id=project_id).order_by('-version')
+
+    def find_tables(self, project_id, table_name, version=None):
+        """Tables of a snapshot (the current one by default) with the given name"""
+        return CatalogTable.objects.filter(
+            self._snapshot_filter(project_id, version, prefix='snapshot__'),
+            table_name=table_name
+        ).select_related('snapshot').prefetch_related('columns')
+
+    def find_columns(self, project_id, column_name, version=None):
+        """Columns of a snapshot (the current one by default) with the given name"""
+        return CatalogColumn.objects.filter(
+            self._snapshot_filter(project_id, version, prefix='table__snapshot__'),
+            column_name=column_name
+        ).select_related('table')
+
+    def to_schema(self, snapshot):
+        """Rebuild the schema dictionary a snapshot was saved from"""
+        tables = {}
+        for catalog_table in snapshot.tables.prefetch_related('columns'):
+            tables[catalog_table.table_name] = {
+                'columns': [
+                    {'name': column.column_name, 'type': column.data_type, **column.properties}
+                    for column in catalog_table.columns.all()
+                ],
+                'sample_rows': catalog_table.sample_rows,
+                **catalog_table.properties
+            }
+        return {**snapshot.schema_metadata, 'tables': tables}
+
+    @staticmethod
+    def _snapshot_filter(project_id, version, prefix):
+        if version is None:
+            return Q(**{f'{prefix}project_id': project_id, f'{prefix}is_current': True})
+        return Q(**{f'{prefix}project_id': project_id, f'{prefix}version': version})
+
+    @staticmethod
+    def _column_nullable(column):
+        if 'nullable' in column:
+            return column['nullable']
+        if 'mode' in column:
+            return column['mode'] != 'REQUIRED'
+        return None
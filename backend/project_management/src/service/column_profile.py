@@ -0,0 +1,97 @@
+from decimal import Decimal
+
+# Type name fragments of columns that cannot be compared, so MIN/MAX/DISTINCT do not apply
+UNCOMPARABLE_TYPE_KEYWORDS = (
+    'json', 'xml', 'point', 'line', 'polygon', 'circle', 'box', 'path', 'geo', 'array', '[]',
+    'struct', 'record', 'variant', 'object', 'bytea', 'binary', 'blob', 'vector', 'range', 'tsvector'
+)
+ORDERABLE_TYPE_KEYWORDS = (
+    'int', 'serial', 'numeric', 'decimal', 'number', 'float', 'double', 'real', 'money',
+    'date', 'time', 'char', 'text', 'string', 'enum'
+)
+
+
+def column_metrics(data_type):
+    """Aggregates a column of the given warehouse type supports: ``(distinct, min_max)``"""
+    data_type = (data_type or '').lower()
+    if any(keyword in data_type for keyword in UNCOMPARABLE_TYPE_KEYWORDS):
+        return False, False
+    if 'bool' in data_type:
+        return True, False
+    orderable = any(keyword in data_type for keyword in ORDERABLE_TYPE_KEYWORDS)
+    return orderable, orderable
+
+
+def build_profile_query(table_ref, columns, quote, distinct='COUNT(DISTINCT {})'):
+    """One aggregate query profiling every column of a table
+
+    Args:
+        table_ref: Quoted, fully qualified table name
+        columns: Column dicts with ``name`` and ``type``
+        quote: Callable quoting an identifier in the backend's dialect
+        distinct: Distinct-count expression template, e.g. ``APPROX_COUNT_DISTINCT({})``
+
+    Returns:
+        Tuple of the SQL text and the plan ``parse_profile_row`` needs to read its result
+    """
+    expressions = ['COUNT(*)']
+    plan = []
+    for column in columns:
+        quoted = quote(column['name'])
+        with_distinct, with_min_max = column_metrics(column.get('type'))
+        metrics = ['non_null']
+        expressions.append(f'COUNT({quoted})')
+        if with_distinct:
+            metrics.append('distinct_count')
+            expressions.append(distinct.format(quoted))
+        if with_min_max:
+            metrics.extend(['min', 'max'])
+            expressions.extend([f'MIN({quoted})', f'MAX({quoted})'])
+        plan.append((column['name'], metrics))
+
+    return f"SELECT {', '.join(expressions)} FROM {table_ref}", plan
+
+
+def parse_profile_row(plan, row, approximate_distinct=False):
+    """Turn the single result row of a profile query into a table profile"""
+    values = iter(row)
+    row_count = next(values)
+    profile = {
+        'row_count': row_count,
+        'source': 'aggregate',
+        'approximate': approximate_distinct,
+        'columns': {}
+    }
+    for column_name, metrics in plan:
+        measured = {metric: jsonable_value(next(values)) for metric in metrics}
+        non_null = measured.pop('non_null')
+        profile['columns'][column_name] = {
+            'null_fraction': round(1 - non_null / row_count, 6) if row_count else None,
+            'distinct_count': measured.get('distinct_count'),
+            'min': measured.get('min'),
+            'max': measured.get('max')
+        }
+    return profile
+
+
+def empty_profile(columns):
+    """Profile of a table known to have no rows"""
+    return {
+        'row_count': 0,
+        'source': 'metadata',
+        'approximate': False,
+        'columns': {
+            column['name']: {'null_fraction': None, 'distinct_count': 0, 'min': None, 'max': None}
+            for column in columns
+        }
+    }
+
+
+def jsonable_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (bytes, memoryview)):
+        return str(value)
+    return value
@@ -0,0 +1,259 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _postgres_is_healthy(conn):
+    if conn.closed:
+        return False
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    conn.rollback()
+    return True
+
+
+def _snowflake_is_healthy(conn):
+    if conn.is_closed():
+        return False
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1")
+    return True
+
+
+def _mysql_close(conn):
+    if conn.is_connected():
+        conn.close()
+
+
+BACKEND_HOOKS = {
+    'postgres': {
+        'is_healthy': _postgres_is_healthy,
+        'reset': lambda conn: conn.rollback(),
+        'close': lambda conn: conn.close(),
+    },
+    'mysql': {
+        'is_healthy': lambda conn: conn.is_connected(),
+        'reset': lambda conn: conn.rollback(),
+        'close': _mysql_close,
+    },
+    'snowflake': {
+        'is_healthy': _snowflake_is_healthy,
+        'reset': lambda conn: None,
+        'close': lambda conn: conn.close(),
+    },
+    'bigquery': {
+        'is_healthy': lambda client: True,
+        'reset': lambda client: None,
+        'close': lambda client: client.close(),
+    },
+}
+
+
+class ConnectionManager:
+    """Process-wide pools of source-warehouse connections keyed by project.
+
+    Connections (or BigQuery clients) are reused across schema retrieval and any
+    other call that reads from a project's warehouse. Each pool is keyed by the
+    project, a hash of its connection settings and an optional variant such as a
+    statement timeout, so connections opened with different settings are never
+    mixed.
+
+    Released connections are reset and kept while idle for up to
+    ``idle_timeout`` seconds, at most ``max_idle`` per pool. A connection idle for
+    more than ``health_check_interval`` seconds is health-checked before it is
+    handed out again. ``invalidate`` drops every pooled connection of a project
+    and makes connections currently in use close on release.
+
+    Once a connection is pooled, a daemon thread runs ``evict_idle`` every
+    ``eviction_interval`` seconds, so idle connections are closed in every
+    process, even one that stops using its pools.
+    """
+
+    def __init__(self, max_idle=8, idle_timeout=300, health_check_interval=30, eviction_interval=60):
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.eviction_interval = max(0.01, eviction_interval)
+        self._pools = {}
+        self._in_use = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+        self._evictor = None
+
+    @staticmethod
+    def config_key(database_type, database_metadata):
+        payload = json.dumps([database_type, database_metadata], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def acquire(self, project_id, database_type, database_metadata, connect, variant=None):
+        """Borrow a healthy connection, opening a new one with ``connect`` if none is idle
+
+        Every acquired connection must be handed back with ``release``.
+        """
+        key = (project_id, database_type, self.config_key(database_type, database_metadata), variant)
+        hooks = BACKEND_HOOKS[database_type]
+        expired = []
+        conn = None
+        needs_check = False
+
+        with self._lock:
+            pool = self._pools.get(key, [])
+            now = time.monotonic()
+            while pool:
+                candidate, last_used = pool.pop()
+                if now - last_used > self.idle_timeout:
+                    expired.append((candidate, hooks))
+                    continue
+                conn = candidate
+                needs_check = now - last_used > self.health_check_interval
+                break
+            generation = self._generations.get(project_id, 0)
+
+        self._close_all(expired)
+
+        if conn is not None and needs_check and not self._is_healthy(conn, hooks):
+            self._close(conn, hooks)
+            conn = None
+
+        if conn is None:
+            conn = connect()
+
+        with self._lock:
+            self._in_use[id(conn)] = (key, generation)
+        return conn
+
+    def release(self, conn, discard=False):
+        """Return a connection to its pool, or close it if discarded or invalidated"""
+        with self._lock:
+            key, generation = self._in_use.pop(id(conn), (None, None))
+        if key is None:
+            return
+
+        project_id, database_type = key[0], key[1]
+        hooks = BACKEND_HOOKS[database_type]
+
+        if not discard:
+            try:
+                hooks['reset'](conn)
+            except Exception as e:
+                logger.warning(f"Resetting {database_type} connection failed: {str(e)}")
+                discard = True
+
+        overflow = None
+        with self._lock:
+            current = self._generations.get(project_id, 0) == generation
+            pool = self._pools.setdefault(key, [])
+            if discard or not current or len(pool) >= self.max_idle:
+                overflow = conn
+            else:
+                pool.append((conn, time.monotonic()))
+                self._start_evictor()
+
+        if overflow is not None:
+            self._close(overflow, hooks)
+
+    @contextmanager
+    def connection(self, project_id, database_type, database_metadata, connect, variant=None):
+        """Context manager around ``acquire``/``release``; connections that raised are discarded"""
+        conn = self.acquire(project_id, database_type, database_metadata, connect, variant)
+        try:
+            yield conn
+        except Exception:
+            self.release(conn, discard=True)
+            raise
+        else:
+            self.release(conn)
+
+    def invalidate(self, project_id):
+        """Close the pooled connections of a project, e.g. after its settings changed"""
+        with self._lock:
+            self._generations[project_id] = self._generations.get(project_id, 0) + 1
+            keys = [key for key in self._pools if key[0] == project_id]
+            stale = [
+                (conn, BACKEND_HOOKS[key[1]])
+                for key in keys
+                for conn, _ in self._pools.pop(key)
+            ]
+        self._close_all(stale)
+
+    def evict_idle(self):
+        """Close every pooled connection idle for longer than ``idle_timeout``"""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            for key, pool in list(self._pools.items()):
+                keep = []
+                for conn, last_used in pool:
+                    if now - last_used > self.idle_timeout:
+                        expired.append((conn, BACKEND_HOOKS[key[1]]))
+                    else:
+                        keep.append((conn, last_used))
+                if keep:
+                    self._pools[key] = keep
+                else:
+                    del self._pools[key]
+        self._close_all(expired)
+        return len(expired)
+
+    def _start_evictor(self):
+        # Called with the lock held
+        if self._evictor is None or not self._evictor.is_alive():
+            self._evictor = threading.Thread(target=self._evict_forever, name='connection-evictor', daemon=True)
+            self._evictor.start()
+
+    def _evict_forever(self):
+        while True:
+            time.sleep(self.eviction_interval)
+            try:
+                self.evict_idle()
+            except Exception as e:
+                logger.warning(f"Evicting idle connections failed: {str(e)}")
+            with self._lock:
+                if not self._pools:
+                    # Started again by the next pooled connection
+                    self._evictor = None
+                    return
+
+    def close_all(self):
+        with self._lock:
+            stale = [
+                (conn, BACKEND_HOOKS[key[1]])
+                for key, pool in self._pools.items()
+                for conn, _ in pool
+            ]
+            self._pools.clear()
+        self._close_all(stale)
+
+    @staticmethod
+    def _is_healthy(conn, hooks):
+        try:
+            return hooks['is_healthy'](conn)
+        except Exception as e:
+            logger.info(f"Discarding unhealthy pooled connection: {str(e)}")
+            return False
+
+    def _close_all(self, connections):
+        for conn, hooks in connections:
+            self._close(conn, hooks)
+
+    @staticmethod
+    def _close(conn, hooks):
+        try:
+            hooks['close'](conn)
+        except Exception as e:
+            logger.warning(f"Failed to close pooled connection: {str(e)}")
+
+
+connection_manager = ConnectionManager(
+    max_idle=getattr(settings, 'CONNECTION_POOL_MAX_IDLE', 8),
+    idle_timeout=getattr(settings, 'CONNECTION_POOL_IDLE_TIMEOUT', 300),
+    health_check_interval=getattr(settings, 'CONNECTION_POOL_HEALTH_CHECK_INTERVAL', 30),
+    eviction_interval=getattr(settings, 'CONNECTION_POOL_EVICTION_INTERVAL', 60)
+)
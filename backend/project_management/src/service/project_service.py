@@ -1,21 +1,44 @@
 import os
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
 from ..utils.github_utils import push_to_github,create_github_repository
 from ..repo.models import ProjectMetadata
+from ..repo.repository import SchemaCatalogRepository
 from .tool_handler import IBaseToolHandler, DbtHandler, SQLMeshHandler
+from .schema_cache import SchemaCache
+from .sample_fetcher import SampleFetcher
+from .sample_data import rows_to_record_batch, table_to_record_batch, jsonable_schema
+from .column_profile import build_profile_query, column_metrics, empty_profile, parse_profile_row
+from .relationship_graph import build_relationship_graph, empty_relationships, graph_to_json, join_path
+from .connection_manager import connection_manager
 from google.cloud import bigquery
 from google.oauth2 import service_account
 import json
 import psycopg2
 from psycopg2 import sql
-from psycopg2.extras import RealDictCursor
 import snowflake.connector
 import mysql.connector
 from mysql.connector import Error as MySQLError
 
+logger = logging.getLogger(__name__)
+
+# Standard SQL type names of INFORMATION_SCHEMA and their legacy names, which
+# the BigQuery table API (SchemaField.field_type) reports
+BIGQUERY_LEGACY_TYPES = {
+    'INT64': 'INTEGER',
+    'FLOAT64': 'FLOAT',
+    'BOOL': 'BOOLEAN',
+    'STRUCT': 'RECORD',
+}
 
 class ProjectService:
-    def __init__(self, project_repository):
+    def __init__(self, project_repository, catalog_repository=None):
         self.project_repository = project_repository
+        self.catalog_repository = catalog_repository or SchemaCatalogRepository()
         self.schema_retrievers = {
             'postgres': self._get_postgres_schema,
             'bigquery': self._get_bigquery_schema,
@@ -23,6 +46,45 @@ class ProjectService:
             'mysql': self._get_mysql_schema
 
         }
+        self.schema_fingerprinters = {
+            'postgres': self._get_postgres_fingerprint,
+            'bigquery': self._get_bigquery_fingerprint,
+            'snowflake': self._get_snowflake_fingerprint,
+            'mysql': self._get_mysql_fingerprint
+        }
+        self.table_marker_readers = {
+            'postgres': self._get_postgres_table_markers,
+            'bigquery': self._get_bigquery_table_markers,
+            'snowflake': self._get_snowflake_table_markers,
+            'mysql': self._get_mysql_table_markers
+        }
+        self.relationship_readers = {
+            'postgres': self._get_postgres_relationships,
+            'bigquery': self._get_bigquery_relationships,
+            'snowflake': self._get_snowflake_relationships,
+            'mysql': self._get_mysql_relationships
+        }
+        self.table_profilers = {
+            'postgres': self._profile_postgres_tables,
+            'bigquery': self._profile_bigquery_tables,
+            'snowflake': self._profile_snowflake_tables,
+            'mysql': self._profile_mysql_tables
+        }
+        self.connectors = {
+            'postgres': self._connect_postgres,
+            'bigquery': self._get_bigquery_client,
+            'snowflake': self._connect_snowflake,
+            'mysql': self._connect_mysql
+        }
+        self.connection_manager = connection_manager
+        self.schema_cache = SchemaCache(
+            ttl=getattr(settings, 'SCHEMA_CACHE_TTL', 3600),
+            max_entries=getattr(settings, 'SCHEMA_CACHE_MAX_ENTRIES', 128),
+            recheck_interval=getattr(settings, 'SCHEMA_CACHE_RECHECK_INTERVAL', 30)
+        )
+        # Profiles of selected tables profiled while the full schema was not cached
+        self.selection_profiles = OrderedDict()
+        self.selection_profiles_lock = threading.Lock()
 
     def _get_tool_handler(self, tool: str, database_type: str) -> IBaseToolHandler:
         """Retrieve the appropriate tool handler based on the tool name.
@@ -121,17 +183,44 @@ class ProjectService:
         except Exception as e:
             raise e
 
+    def update_project(self, project_metadata_data, project_id):
+        """Update a project's metadata, closing its pooled connections if its connection settings changed"""
+        previous = self.project_repository.get_project_by_id(project_id)
+        self.project_repository.update_project_metadata(project_metadata_data, project_id)
+        project = self.project_repository.get_project_by_id(project_id)
+        if previous is not None and (previous.database_type_id, previous.database_metadata) != (
+                project.database_type_id, project.database_metadata):
+            self.connection_manager.invalidate(project_id)
+        return project_id
+
     def delete_project(self, project_id):
         self.project_repository.delete_project(project_id)
 
-    def get_schema_details(self, project_id):
+    def get_schema_details(self, project_id, refresh=False, selection=None, profile=False):
         """
         Unified method to get schema details for any supported database type
+
+        Results are served from the project schema cache while the warehouse
+        fingerprint is unchanged and the entry has not expired. A stale entry
+        is refreshed incrementally, re-reading only the tables that changed.
+
+        A ``selection`` asking for less than the full schema is answered from a
+        warm cache entry if there is one, and otherwise by the retriever with
+        its filters pushed down into the catalog queries; it never loads or
+        replaces the cached full schema.
+
         Args:
             project_id: ID of the project to get schema for
+            refresh: Bypass the cache and reload the schema from the warehouse
+            selection: Optional SchemaSelection of tables, fields and page
+            profile: Add column statistics (``profile``) to every returned table.
+                They are computed once per table and cached with the schema
+                until the table changes.
 
         Returns:
-            Dictionary containing schema information
+            Dictionary containing schema information, plus ``next_cursor`` when
+            a selection was given, or else the ``schema_hash`` of the stored
+            catalog version when there is one
         """
         try:
             project = ProjectMetadata.objects.get(pk=project_id)
@@ -141,22 +230,827 @@ class ProjectService:
                 raise ValueError(f"Unsupported database type: {db_type}")
 
 
-            schema_func = self.schema_retrievers[db_type]
+            db_metadata = project.database_metadata
 
+            snapshot = None
+            if selection is not None and not selection.is_everything:
+                selected = self._get_selected_schema(db_type, db_metadata, project_id, selection, refresh)
+                schema, next_cursor = selection.page(selected)
+                details = {
+                    'database_type': db_type,
+                    'schema': schema,
+                    'next_cursor': next_cursor
+                }
+            else:
+                snapshot = self._get_snapshot(db_type, db_metadata, project_id, refresh)
+                details = {
+                    'database_type': db_type,
+                    'schema': snapshot['schema'],
+                }
+                if snapshot.get('content_hash'):
+                    details['schema_hash'] = snapshot['content_hash']
+
+            if profile:
+                # A selection reuses the profiles of a cached full schema, but never loads one
+                snapshot = snapshot or self._get_cached_snapshot(db_type, db_metadata, project_id)
+                if snapshot is None:
+                    snapshot = {
+                        'schema': selected,
+                        'profiles': self._get_selection_profiles(db_type, db_metadata, project_id)
+                    }
+                details['schema'] = self._attach_profiles(
+                    db_type, db_metadata, project_id, snapshot, details['schema']
+                )
 
+            return details
 
-            return {
-            'database_type': db_type,
-            'schema': schema_func(project.database_metadata),
+        except ProjectMetadata.DoesNotExist:
+            raise ValueError(f"Project with ID {project_id} not found")
+        except Exception as e:
+            raise Exception(f"Schema retrieval failed: {str(e)}")
 
+    def get_relationships(self, project_id, tables=None, refresh=False):
+        """
+        Primary keys and foreign keys of a project's schema as a table graph
+
+        The graph is built from the relationships of the cached schema snapshot,
+        once per snapshot.
+
+        Args:
+            project_id: ID of the project
+            tables: Optional list of tables to compute the join path between
+            refresh: Bypass the cache and reload the schema from the warehouse
+
+        Returns:
+            Dictionary with ``database_type``, ``tables`` (name to ``primary_key``),
+            ``foreign_keys`` and, when ``tables`` was given, ``join_path``
+        """
+        try:
+            project = ProjectMetadata.objects.get(pk=project_id)
+            db_type = project.database_type.database_type.lower()
+
+            if db_type not in self.schema_retrievers:
+                raise ValueError(f"Unsupported database type: {db_type}")
+
+            snapshot = self._get_snapshot(db_type, project.database_metadata, project_id, refresh)
+            graph = snapshot.get('relationship_graph')
+            if graph is None:
+                schema_info = snapshot['schema']
+                graph = snapshot['relationship_graph'] = build_relationship_graph(
+                    schema_info.get('relationships') or empty_relationships(), schema_info['tables']
+                )
+
+            details = {'database_type': db_type, **graph_to_json(graph)}
+            if tables:
+                details['join_path'] = join_path(graph, tables)
+            return details
+
+        except ProjectMetadata.DoesNotExist:
+            raise ValueError(f"Project with ID {project_id} not found")
+        except Exception as e:
+            raise Exception(f"Relationship retrieval failed: {str(e)}")
+
+    def _get_snapshot(self, db_type, db_metadata, project_id, refresh=False):
+        """The project's full schema snapshot, from the schema cache when it is still valid"""
+        return self.schema_cache.get_or_load(
+            project_id,
+            SchemaCache.metadata_key(db_type, db_metadata),
+            load=self._schema_loader(db_type, db_metadata, project_id, refresh),
+            fingerprint=lambda: self.schema_fingerprinters[db_type](db_metadata, project_id),
+            refresh=refresh
+        )
+
+    def _get_cached_snapshot(self, db_type, db_metadata, project_id):
+        """The project's full schema snapshot if the schema cache holds a valid one, never loading it"""
+        return self.schema_cache.get(
+            project_id,
+            SchemaCache.metadata_key(db_type, db_metadata),
+            fingerprint=lambda: self.schema_fingerprinters[db_type](db_metadata, project_id)
+        )
+
+    def _get_selection_profiles(self, db_type, db_metadata, project_id):
+        """Profile cache of a project's selected tables, used while its full schema is not cached"""
+        key = (project_id, SchemaCache.metadata_key(db_type, db_metadata))
+        with self.selection_profiles_lock:
+            profiles = self.selection_profiles.get(key)
+            if profiles is None:
+                profiles = self.selection_profiles[key] = {}
+            self.selection_profiles.move_to_end(key)
+            while len(self.selection_profiles) > getattr(settings, 'SCHEMA_CACHE_MAX_ENTRIES', 128):
+                self.selection_profiles.popitem(last=False)
+        return profiles
+
+    def _attach_profiles(self, db_type, db_metadata, project_id, snapshot, schema_info):
+        """Add a ``profile`` to every table of ``schema_info``, reusing the ones cached on ``snapshot``
+
+        ``snapshot`` is the cached full schema, or for a selection answered
+        without one, the selected tables with a profile cache of their own.
+        Only the tables of ``schema_info`` are profiled. Cached profiles are
+        kept for ``SCHEMA_PROFILE_TTL`` seconds, since the table markers only
+        track schema changes, not data changes, and as long as the table's
+        columns are unchanged. Profiles that failed are returned as
+        ``{'error': ...}`` and not cached.
+        """
+        profiles = snapshot.setdefault('profiles', {})
+        snapshot_tables = snapshot['schema']['tables']
+        ttl = getattr(settings, 'SCHEMA_PROFILE_TTL', 86400)
+        now = time.monotonic()
+
+        def columns_of(table):
+            return [(column.get('name'), column.get('type')) for column in snapshot_tables[table].get('columns', [])]
+
+        missing = {
+            table: snapshot_tables[table] for table in schema_info['tables']
+            if table in snapshot_tables and (
+                table not in profiles or now - profiles[table][0] >= ttl
+                or profiles[table][2] != columns_of(table)
+            )
         }
 
+        computed = self.table_profilers[db_type](db_metadata, project_id, missing) if missing else {}
+        for table, table_profile in computed.items():
+            if 'error' not in table_profile:
+                profiles[table] = (now, table_profile, columns_of(table))
+
+        return {
+            **schema_info,
+            'tables': {
+                table: {
+                    **table_info,
+                    'profile': profiles[table][1] if table in profiles else computed.get(table)
+                }
+                for table, table_info in schema_info['tables'].items()
+            }
+        }
+
+    def _get_selected_schema(self, db_type, db_metadata, project_id, selection, refresh=False):
+        """Tables matching a selection, from the cache when it holds enough sample rows"""
+        if not refresh:
+            cached = self.schema_cache.get(
+                project_id,
+                SchemaCache.metadata_key(db_type, db_metadata),
+                fingerprint=lambda: self.schema_fingerprinters[db_type](db_metadata, project_id)
+            )
+            enough_samples = (
+                not selection.samples
+                or selection.max_sample_rows is None
+                or selection.max_sample_rows <= db_metadata.get('max_sample_rows', 3)
+            )
+            if cached is not None and enough_samples:
+                return selection.apply(cached['schema'])
+
+        schema_info = self.schema_retrievers[db_type](db_metadata, project_id, selection=selection)
+        relationships = self._read_relationships(db_type, db_metadata, project_id)
+        if relationships is not None:
+            schema_info['relationships'] = relationships
+        return schema_info
+
+    def stream_schema_details(self, project_id, refresh=False):
+        """
+        Streaming variant of ``get_schema_details`` yielding one event per table
+
+        The project is looked up eagerly, so an unknown project or unsupported
+        database type raises ``ValueError`` before anything is streamed. The
+        schema is then loaded through the same cache in a background thread and
+        every table is yielded as soon as it is introspected. Tables served from
+        the cache are yielded once the load returns.
+
+        Args:
+            project_id: ID of the project to get schema for
+            refresh: Bypass the cache and reload the schema from the warehouse
+
+        Returns:
+            Iterator of event dictionaries:
+                {'type': 'schema', 'database_type': str}
+                {'type': 'table', 'name': str, **table_info} for every table
+                {'type': 'end', 'table_count': int, **schema-level fields}
+                or {'type': 'error', 'error': str} if retrieval fails
+        """
+        try:
+            project = ProjectMetadata.objects.get(pk=project_id)
         except ProjectMetadata.DoesNotExist:
             raise ValueError(f"Project with ID {project_id} not found")
+
+        db_type = project.database_type.database_type.lower()
+        if db_type not in self.schema_retrievers:
+            raise ValueError(f"Unsupported database type: {db_type}")
+
+        fingerprint_func = self.schema_fingerprinters[db_type]
+        db_metadata = project.database_metadata
+        events = queue.Queue()
+
+        def load():
+            try:
+                snapshot = self.schema_cache.get_or_load(
+                    project_id,
+                    SchemaCache.metadata_key(db_type, db_metadata),
+                    load=self._schema_loader(
+                        db_type, db_metadata, project_id, refresh,
+                        on_table=lambda name, table_info: events.put(('table', name, table_info))
+                    ),
+                    fingerprint=lambda: fingerprint_func(db_metadata, project_id),
+                    refresh=refresh
+                )
+                events.put(('done', snapshot['schema'], None))
+            except Exception as e:
+                logger.exception(f"Streaming schema retrieval failed for project {project_id}")
+                events.put(('error', f"Schema retrieval failed: {str(e)}", None))
+
+        def stream():
+            threading.Thread(target=load, name=f'schema-stream-{project_id}', daemon=True).start()
+            yield {'type': 'schema', 'database_type': db_type}
+
+            sent = set()
+            while True:
+                kind, payload, table_info = events.get()
+                if kind == 'table':
+                    if payload not in sent:
+                        sent.add(payload)
+                        yield {'type': 'table', 'name': payload, **table_info}
+                elif kind == 'done':
+                    for name, cached_info in payload['tables'].items():
+                        if name not in sent:
+                            yield {'type': 'table', 'name': name, **cached_info}
+                    header = {key: value for key, value in payload.items() if key != 'tables'}
+                    yield {'type': 'end', 'table_count': len(payload['tables']), **header}
+                    return
+                else:
+                    yield {'type': 'error', 'error': payload}
+                    return
+
+        return stream()
+
+    def _schema_loader(self, db_type, db_metadata, project_id, refresh=False, on_table=None):
+        """Build the ``load`` callable handed to the schema cache
+
+        Without a cached previous snapshot the project's stored catalog is used
+        as the base for an incremental refresh, unless ``refresh`` is set, and
+        every loaded snapshot is written back to the catalog.
+        """
+        config_hash = SchemaCache.metadata_key(db_type, db_metadata)
+
+        def load(previous):
+            if previous is None and not refresh:
+                previous = self._get_stored_snapshot(project_id, config_hash)
+            snapshot = self._load_schema_snapshot(db_type, db_metadata, project_id, previous, on_table=on_table)
+            self._store_snapshot(project_id, db_type, config_hash, snapshot)
+            return snapshot
+
+        return load
+
+    def _get_stored_snapshot(self, project_id, config_hash):
+        try:
+            stored = self.catalog_repository.get_current_snapshot(project_id)
+            if stored is None or stored.config_hash != config_hash or stored.table_markers is None:
+                return None
+            return {'schema': self.catalog_repository.to_schema(stored), 'markers': stored.table_markers}
         except Exception as e:
-            raise Exception(f"Schema retrieval failed: {str(e)}")
+            logger.warning(f"Reading stored schema catalog failed for project {project_id}: {str(e)}")
+            return None
+
+    def _store_snapshot(self, project_id, db_type, config_hash, snapshot):
+        try:
+            stored = self.catalog_repository.save_snapshot(
+                project_id, db_type, config_hash, jsonable_schema(snapshot['schema']), markers=snapshot['markers']
+            )
+            snapshot['content_hash'] = stored.content_hash
+        except Exception as e:
+            logger.warning(f"Storing schema catalog failed for project {project_id}: {str(e)}")
+
+    def _load_schema_snapshot(self, db_type, db_metadata, project_id, previous=None, on_table=None):
+        """Load a schema snapshot, re-reading only tables changed since ``previous``
+
+        A snapshot is ``{'schema': schema_info, 'markers': {table: marker}}``.
+        Tables whose modification marker differs from the previous snapshot, or
+        that are new, are introspected again; tables that disappeared are dropped
+        and every other table is reused as-is. Without a previous snapshot, or
+        when markers cannot be read, the whole schema is loaded.
+
+        ``on_table(name, table_info)`` is called for every table of the new
+        snapshot as soon as it is known, reused tables first.
+        """
+        schema_func = self.schema_retrievers[db_type]
+
+        try:
+            markers = self.table_marker_readers[db_type](db_metadata, project_id)
+        except Exception as e:
+            logger.warning(f"Reading table markers failed for project {project_id}: {str(e)}")
+            markers = None
+
+        if previous is None or markers is None or previous['markers'] is None:
+            schema_info = schema_func(db_metadata, project_id, on_table=on_table)
+            return {
+                'schema': self._with_relationships(db_type, db_metadata, project_id, schema_info),
+                'markers': markers
+            }
+
+        previous_tables = previous['schema']['tables']
+        changed = [
+            table for table, marker in markers.items()
+            if table not in previous_tables or previous['markers'].get(table) != marker
+        ]
+        removed = [table for table in previous_tables if table not in markers]
+        logger.info(
+            f"Incremental schema refresh for project {project_id}: "
+            f"{len(changed)} changed, {len(removed)} removed, {len(markers) - len(changed)} reused"
+        )
+
+        if on_table is not None:
+            for table in markers:
+                if table not in changed:
+                    on_table(table, previous_tables[table])
+
+        delta = (
+            schema_func(db_metadata, project_id, tables=changed, on_table=on_table)
+            if changed else previous['schema']
+        )
+        tables = {}
+        for table in markers:
+            if table not in changed:
+                tables[table] = previous_tables[table]
+            elif table in delta['tables']:
+                tables[table] = delta['tables'][table]
+
+        # Column statistics of reused tables are still valid
+        profiles = {
+            table: table_profile for table, table_profile in previous.get('profiles', {}).items()
+            if table in tables and table not in changed
+        }
+        schema_info = self._with_relationships(
+            db_type, db_metadata, project_id, {**delta, 'tables': tables},
+            fallback=previous['schema'].get('relationships')
+        )
+        return {'schema': schema_info, 'markers': markers, 'profiles': profiles}
+
+    def _with_relationships(self, db_type, db_metadata, project_id, schema_info, fallback=None):
+        """Add the schema's ``relationships``, keeping ``fallback`` when they cannot be read"""
+        relationships = self._read_relationships(db_type, db_metadata, project_id)
+        if relationships is None:
+            relationships = fallback
+        if relationships is None:
+            schema_info.pop('relationships', None)
+            return schema_info
+        return {**schema_info, 'relationships': relationships}
+
+    def _read_relationships(self, db_type, db_metadata, project_id):
+        """Primary and foreign keys of the schema, or None when the catalog cannot be read
+
+        Returns:
+            ``{'primary_keys': {table: [column]}, 'foreign_keys': [foreign_key]}``
+            where each foreign key is a dict with ``name``, ``table``,
+            ``columns``, ``referenced_table`` and ``referenced_columns``
+        """
+        try:
+            return self.relationship_readers[db_type](db_metadata, project_id)
+        except Exception as e:
+            logger.warning(f"Reading table relationships failed for project {project_id}: {str(e)}")
+            return None
+
+    @staticmethod
+    def _relationships_from_rows(rows):
+        """Group key column rows into relationships
+
+        Args:
+            rows: ``(constraint_name, constraint_type, table, column,
+                referenced_table, referenced_column)`` tuples ordered by table,
+                constraint and column position; the type is 'p' or 'f'
+        """
+        relationships = empty_relationships()
+        foreign_keys = {}
+        for name, constraint_type, table, column, referenced_table, referenced_column in rows:
+            if constraint_type == 'p':
+                relationships['primary_keys'].setdefault(table, []).append(column)
+                continue
+            foreign_key = foreign_keys.get((table, name))
+            if foreign_key is None:
+                foreign_key = foreign_keys[(table, name)] = {
+                    'name': name,
+                    'table': table,
+                    'columns': [],
+                    'referenced_table': referenced_table,
+                    'referenced_columns': []
+                }
+                relationships['foreign_keys'].append(foreign_key)
+            foreign_key['columns'].append(column)
+            foreign_key['referenced_columns'].append(referenced_column)
+        return relationships
+
+    def _get_postgres_relationships(self, db_metadata, project_id=None):
+        """Primary and foreign keys of every table in the schema from pg_constraint"""
+        with self._connection(project_id, 'postgres', db_metadata) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(sql.SQL("""
+                    SELECT
+                        con.conname,
+                        con.contype,
+                        c.relname,
+                        a.attname,
+                        rc.relname,
+                        ra.attname
+                    FROM pg_catalog.pg_constraint con
+                    JOIN pg_catalog.pg_class c ON c.oid = con.conrelid
+                    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+                    CROSS JOIN LATERAL unnest(con.conkey, con.confkey)
+                        WITH ORDINALITY AS k(attnum, refnum, position)
+                    JOIN pg_catalog.pg_attribute a
+                        ON a.attrelid = con.conrelid
+                        AND a.attnum = k.attnum
+                    LEFT JOIN pg_catalog.pg_class rc ON rc.oid = con.confrelid
+                    LEFT JOIN pg_catalog.pg_attribute ra
+                        ON ra.attrelid = con.confrelid
+                        AND ra.attnum = k.refnum
+                    WHERE n.nspname = %s
+                    AND c.relkind IN ('r', 'p')
+                    AND con.contype IN ('p', 'f')
+                    ORDER BY c.relname, con.conname, k.position
+                """), [db_metadata.get('schema', 'public')])
+                return self._relationships_from_rows(cursor.fetchall())
+
+    def _get_bigquery_relationships(self, db_metadata, project_id=None):
+        """Primary and foreign keys of the dataset's tables from INFORMATION_SCHEMA
+
+        CONSTRAINT_COLUMN_USAGE lists the referenced columns of a foreign key,
+        which are paired with its own columns by their position in the
+        referenced primary key.
+        """
+        with self._connection(project_id, 'bigquery', db_metadata) as client:
+            dataset = client.get_dataset(db_metadata['dataset'])
+            dataset_path = f"{dataset.project}.{dataset.dataset_id}"
+            rows = client.query(f"""
+                SELECT
+                    tc.constraint_name,
+                    IF(tc.constraint_type = 'PRIMARY KEY', 'p', 'f'),
+                    k.table_name,
+                    k.column_name,
+                    r.table_name,
+                    r.column_name
+                FROM `{dataset_path}.INFORMATION_SCHEMA.TABLE_CONSTRAINTS` tc
+                JOIN `{dataset_path}.INFORMATION_SCHEMA.KEY_COLUMN_USAGE` k
+                    ON k.constraint_name = tc.constraint_name
+                    AND k.table_name = tc.table_name
+                LEFT JOIN `{dataset_path}.INFORMATION_SCHEMA.CONSTRAINT_COLUMN_USAGE` u
+                    ON tc.constraint_type = 'FOREIGN KEY'
+                    AND u.constraint_name = tc.constraint_name
+                LEFT JOIN `{dataset_path}.INFORMATION_SCHEMA.TABLE_CONSTRAINTS` rp
+                    ON rp.table_name = u.table_name
+                    AND rp.constraint_type = 'PRIMARY KEY'
+                LEFT JOIN `{dataset_path}.INFORMATION_SCHEMA.KEY_COLUMN_USAGE` r
+                    ON r.constraint_name = rp.constraint_name
+                    AND r.table_name = rp.table_name
+                    AND r.column_name = u.column_name
+                    AND r.ordinal_position = k.position_in_unique_constraint
+                WHERE tc.constraint_type = 'PRIMARY KEY'
+                OR (tc.constraint_type = 'FOREIGN KEY' AND r.column_name IS NOT NULL)
+                ORDER BY k.table_name, tc.constraint_name, k.ordinal_position
+            """).result()
+            return self._relationships_from_rows(tuple(row.values()) for row in rows)
+
+    def _get_snowflake_relationships(self, db_metadata, project_id=None):
+        """Primary and foreign keys of the schema's tables
+
+        Snowflake's information_schema has no key columns, so they are read with
+        SHOW PRIMARY KEYS and SHOW IMPORTED KEYS for the whole schema.
+        """
+        schema_ref = (
+            f"{self._quote_identifier(db_metadata['database'])}."
+            f"{self._quote_identifier(db_metadata.get('schema', 'PUBLIC'))}"
+        )
+        with self._connection(project_id, 'snowflake', db_metadata) as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"SHOW PRIMARY KEYS IN SCHEMA {schema_ref}")
+                primary_keys = self._named_rows(cur)
+                cur.execute(f"SHOW IMPORTED KEYS IN SCHEMA {schema_ref}")
+                imported_keys = self._named_rows(cur)
+
+        rows = [
+            (key['constraint_name'], 'p', key['table_name'], key['column_name'], None, None, key['key_sequence'])
+            for key in primary_keys
+        ] + [
+            (key['fk_name'], 'f', key['fk_table_name'], key['fk_column_name'],
+             key['pk_table_name'], key['pk_column_name'], key['key_sequence'])
+            for key in imported_keys
+        ]
+        rows.sort(key=lambda row: (row[2], row[0], row[6]))
+        return self._relationships_from_rows(row[:6] for row in rows)
+
+    def _get_mysql_relationships(self, db_metadata, project_id=None):
+        """Primary and foreign keys of the database's tables from KEY_COLUMN_USAGE"""
+        with self._connection(project_id, 'mysql', db_metadata) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT
+                        constraint_name,
+                        IF(constraint_name = 'PRIMARY', 'p', 'f'),
+                        table_name,
+                        column_name,
+                        referenced_table_name,
+                        referenced_column_name
+                    FROM information_schema.key_column_usage
+                    WHERE table_schema = %s
+                    AND (constraint_name = 'PRIMARY' OR referenced_table_name IS NOT NULL)
+                    ORDER BY table_name, constraint_name, ordinal_position
+                """, [db_metadata['database']])
+                return self._relationships_from_rows(cursor.fetchall())
+
+    @staticmethod
+    def _named_rows(cursor):
+        names = [column[0].lower() for column in cursor.description]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
 
-    def _get_postgres_schema(self, db_metadata):
+    def _get_postgres_table_markers(self, db_metadata, project_id=None):
+        """Relation OID plus a hash of each table's column definitions"""
+        with self._connection(project_id, 'postgres', db_metadata) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(sql.SQL("""
+                    SELECT
+                        c.relname,
+                        c.oid::text || ':' || md5(coalesce(string_agg(
+                            concat_ws(':', a.attnum, a.attname, a.atttypid, a.atttypmod,
+                                      a.attnotnull, pg_catalog.pg_get_expr(d.adbin, d.adrelid)),
+                            ',' ORDER BY a.attnum
+                        ), ''))
+                    FROM pg_catalog.pg_class c
+                    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+                    LEFT JOIN pg_catalog.pg_attribute a
+                        ON a.attrelid = c.oid
+                        AND a.attnum > 0
+                        AND NOT a.attisdropped
+                    LEFT JOIN pg_catalog.pg_attrdef d
+                        ON d.adrelid = a.attrelid
+                        AND d.adnum = a.attnum
+                    WHERE n.nspname = %s
+                    AND c.relkind IN ('r', 'p')
+                    GROUP BY c.oid, c.relname
+                    ORDER BY c.relname
+                """), [db_metadata.get('schema', 'public')])
+                return {row[0]: row[1] for row in cursor.fetchall()}
+
+    def _get_bigquery_table_markers(self, db_metadata, project_id=None):
+        """Last modification time of every table in the dataset"""
+        with self._connection(project_id, 'bigquery', db_metadata) as client:
+            dataset = client.get_dataset(db_metadata['dataset'])
+            rows = client.query(
+                f"SELECT table_id, last_modified_time "
+                f"FROM `{dataset.project}.{dataset.dataset_id}.__TABLES__` "
+                f"ORDER BY table_id"
+            ).result()
+            return {row[0]: str(row[1]) for row in rows}
+
+    def _get_snowflake_table_markers(self, db_metadata, project_id=None):
+        """LAST_ALTERED of every base table in the schema"""
+        with self._connection(project_id, 'snowflake', db_metadata) as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT table_name, last_altered
+                    FROM information_schema.tables
+                    WHERE table_schema = %s
+                    AND table_type = 'BASE TABLE'
+                    ORDER BY table_name
+                """, (db_metadata.get('schema', 'PUBLIC'),))
+                return {row[0]: str(row[1]) for row in cur.fetchall()}
+
+    def _get_mysql_table_markers(self, db_metadata, project_id=None):
+        """CREATE_TIME and UPDATE_TIME of every table in the database"""
+        with self._connection(project_id, 'mysql', db_metadata) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT table_name, create_time, update_time
+                    FROM information_schema.tables
+                    WHERE table_schema = %s
+                    ORDER BY table_name
+                """, [db_metadata['database']])
+                return {row[0]: f"{row[1]}:{row[2]}" for row in cursor.fetchall()}
+
+    def _connection(self, project_id, database_type, db_metadata, statement_timeout=None):
+        """Pooled warehouse connection for a project, as a context manager"""
+        return self.connection_manager.connection(
+            project_id, database_type, db_metadata,
+            connect=self._connector(database_type, db_metadata, statement_timeout),
+            variant=statement_timeout
+        )
+
+    def _acquire_connection(self, project_id, database_type, db_metadata, statement_timeout=None):
+        """Pooled warehouse connection for a project; hand it back with connection_manager.release"""
+        return self.connection_manager.acquire(
+            project_id, database_type, db_metadata,
+            connect=self._connector(database_type, db_metadata, statement_timeout),
+            variant=statement_timeout
+        )
+
+    def _connector(self, database_type, db_metadata, statement_timeout=None):
+        connect = self.connectors[database_type]
+        if statement_timeout:
+            return lambda: connect(db_metadata, statement_timeout=statement_timeout)
+        return lambda: connect(db_metadata)
+
+    def _connect_postgres(self, db_metadata, statement_timeout=None):
+        options = f"-c statement_timeout={int(statement_timeout * 1000)}" if statement_timeout else None
+        return psycopg2.connect(
+            host='localhost',
+            port=db_metadata.get('port', 5432),
+            user=db_metadata['user'],
+            password=db_metadata['password'],
+            dbname=db_metadata['dbname'],
+            options=options
+        )
+
+    def _connect_mysql(self, db_metadata, statement_timeout=None):
+        conn = mysql.connector.connect(
+            host='localhost',
+            port=db_metadata.get('port', 3306),
+            user=db_metadata['user'],
+            password=db_metadata['password'],
+            database=db_metadata['database']
+        )
+        if statement_timeout:
+            with conn.cursor() as cursor:
+                cursor.execute(f"SET SESSION MAX_EXECUTION_TIME = {int(statement_timeout * 1000)}")
+        return conn
+
+    def _connect_snowflake(self, db_metadata, statement_timeout=None):
+        session_parameters = {}
+        if statement_timeout:
+            session_parameters['STATEMENT_TIMEOUT_IN_SECONDS'] = int(statement_timeout)
+        return snowflake.connector.connect(
+            user=db_metadata['user'],
+            password=db_metadata['password'],
+            account=db_metadata['account'],
+            warehouse=db_metadata.get('warehouse'),
+            database=db_metadata['database'],
+            schema=db_metadata.get('schema', 'PUBLIC'),
+            session_parameters=session_parameters
+        )
+
+    def _get_bigquery_client(self, db_metadata):
+        credentials = None
+        if 'keyfile' in db_metadata:
+            keyfile = db_metadata['keyfile']
+            if isinstance(keyfile, str):
+                try:
+                    keyfile = json.loads(keyfile)
+                except json.JSONDecodeError:
+
+                    credentials = service_account.Credentials.from_service_account_file(keyfile)
+                else:
+                    credentials = service_account.Credentials.from_service_account_info(keyfile)
+
+
+        return bigquery.Client(
+            credentials=credentials,
+            project=db_metadata.get('project')
+        )
+
+    def _get_postgres_fingerprint(self, db_metadata, project_id=None):
+        """Hash the catalog entries of every column and key constraint in the schema"""
+        with self._connection(project_id, 'postgres', db_metadata) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(sql.SQL("""
+                    SELECT md5(string_agg(
+                        concat_ws(':', c.oid, c.relname, a.attnum, a.attname,
+                                  a.atttypid, a.atttypmod, a.attnotnull),
+                        ',' ORDER BY c.relname, a.attnum
+                    )) || ':' || coalesce((
+                        SELECT md5(string_agg(
+                            con.oid::text || pg_catalog.pg_get_constraintdef(con.oid), ',' ORDER BY con.oid
+                        ))
+                        FROM pg_catalog.pg_constraint con
+                        JOIN pg_catalog.pg_namespace cn ON cn.oid = con.connamespace
+                        WHERE cn.nspname = %s
+                        AND con.contype IN ('p', 'f')
+                    ), '')
+                    FROM pg_catalog.pg_class c
+                    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+                    LEFT JOIN pg_catalog.pg_attribute a
+                        ON a.attrelid = c.oid
+                        AND a.attnum > 0
+                        AND NOT a.attisdropped
+                    WHERE n.nspname = %s
+                    AND c.relkind IN ('r', 'p')
+                """), [db_metadata.get('schema', 'public')] * 2)
+                return cursor.fetchone()[0]
+
+    def _get_bigquery_fingerprint(self, db_metadata, project_id=None):
+        """Table count and latest table modification time of the dataset"""
+        with self._connection(project_id, 'bigquery', db_metadata) as client:
+            dataset = client.get_dataset(db_metadata['dataset'])
+            rows = list(client.query(
+                f"SELECT COUNT(*), MAX(last_modified_time) "
+                f"FROM `{dataset.project}.{dataset.dataset_id}.__TABLES__`"
+            ).result())
+            return f"{rows[0][0]}:{rows[0][1]}"
+
+    def _get_snowflake_fingerprint(self, db_metadata, project_id=None):
+        """Table count and latest LAST_ALTERED of the schema"""
+        with self._connection(project_id, 'snowflake', db_metadata) as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT COUNT(*), MAX(last_altered)
+                    FROM information_schema.tables
+                    WHERE table_schema = %s
+                    AND table_type = 'BASE TABLE'
+                """, (db_metadata.get('schema', 'PUBLIC'),))
+                row = cur.fetchone()
+                return f"{row[0]}:{row[1]}"
+
+    def _get_mysql_fingerprint(self, db_metadata, project_id=None):
+        """Table count and latest CREATE_TIME/UPDATE_TIME of the database"""
+        with self._connection(project_id, 'mysql', db_metadata) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT COUNT(*), MAX(create_time), MAX(update_time)
+                    FROM information_schema.tables
+                    WHERE table_schema = %s
+                """, [db_metadata['database']])
+                row = cursor.fetchone()
+                return f"{row[0]}:{row[1]}:{row[2]}"
+
+    def _get_sample_fetcher(self, db_metadata, connect, fetch, close=None, selection=None):
+        """Build the concurrent sample-row stage for one schema retrieval
+
+        Concurrency and the per-table timeout can be set per project through
+        ``sample_max_workers`` and ``sample_timeout`` in its database metadata.
+        ``connect`` receives the per-table timeout so it can be enforced by the
+        warehouse itself and free the worker. Returns None when ``selection``
+        does not ask for sample rows.
+        """
+        if selection is not None and not selection.samples:
+            return None
+
+        timeout = self._get_sample_timeout(db_metadata)
+        return SampleFetcher(
+            connect=lambda: connect(timeout),
+            fetch=fetch,
+            close=close,
+            max_workers=db_metadata.get(
+                'sample_max_workers', getattr(settings, 'SCHEMA_SAMPLE_MAX_WORKERS', 8)
+            ),
+            timeout=timeout
+        )
+
+    def _get_sample_timeout(self, db_metadata):
+        return db_metadata.get('sample_timeout', getattr(settings, 'SCHEMA_SAMPLE_TIMEOUT', 10))
+
+    def _get_max_sample_rows(self, db_metadata, selection=None):
+        if selection is not None and selection.max_sample_rows is not None:
+            return selection.max_sample_rows
+        return db_metadata.get('max_sample_rows', 3)
+
+    def _selection_conditions(self, selection, table_name):
+        """SQL conditions applying the pushable part of a selection to a table listing
+
+        Globs become LIKE patterns and the cursor a comparison; regular
+        expressions are left to ``SchemaSelection.select`` on the names read.
+
+        Args:
+            selection: SchemaSelection or None
+            table_name: The table name with a binary collation in the dialect,
+                e.g. ``"CAST(table_name AS BINARY)"``, so comparisons and the
+                caller's ORDER BY follow code point order like Python's sort
+
+        Returns:
+            Tuple of the ``AND ...`` conditions, their parameters and a LIMIT clause
+        """
+        if selection is None:
+            return '', [], ''
+
+        conditions, params = [], []
+        include, exclude = selection.include_like('!'), selection.exclude_like('!')
+        if include is not None:
+            conditions.append('(' + ' OR '.join(f"{table_name} LIKE %s ESCAPE '!'" for _ in include) + ')')
+            params.extend(include)
+        for pattern in exclude or []:
+            conditions.append(f"{table_name} NOT LIKE %s ESCAPE '!'")
+            params.append(pattern)
+        if selection.after is not None:
+            conditions.append(f"{table_name} > %s")
+            params.append(selection.after)
+
+        limit = f"LIMIT {int(selection.pushdown_limit)}" if selection.pushdown_limit else ''
+        return ' '.join(f"AND {condition}" for condition in conditions), params, limit
+
+    def _collect_tables(self, fetcher, table_names, build_table, on_table=None):
+        """Pair each table with its sample rows as the fetches complete
+
+        ``build_table(name, sample_rows)`` returns the table entry, which is
+        passed to ``on_table`` right away when given. Without a fetcher the
+        entries are built without a ``sample_rows`` key. The returned
+        dictionary keeps the catalog order of ``table_names``.
+        """
+        if fetcher is None:
+            results = ((table, None) for table in table_names)
+        else:
+            results = fetcher.iter_fetch(table_names)
+
+        tables = {}
+        for table, sample_rows in results:
+            tables[table] = build_table(table, sample_rows)
+            if fetcher is None:
+                tables[table].pop('sample_rows', None)
+            if on_table is not None:
+                on_table(table, tables[table])
+        return {table: tables[table] for table in table_names}
+
+    def _get_postgres_schema(self, db_metadata, project_id=None, tables=None, on_table=None, selection=None):
         """Retrieve PostgreSQL schema details with enhanced error handling
 
         Args:
@@ -168,24 +1062,21 @@ class ProjectService:
                 - dbname: Database name
                 - schema: Schema name (default: 'public')
                 - max_sample_rows: Maximum sample rows (default: 3)
+            project_id: Project whose pooled connections should be used
+            tables: Optional list of table names to restrict introspection to
+            on_table: Optional callable ``on_table(name, table_info)`` invoked as
+                soon as each table is complete
+            selection: Optional SchemaSelection whose table filter, page and
+                sample options are applied by the catalog queries
 
         Returns:
             Dictionary with schema information including tables, columns, and sample data
         """
 
 
-        conn = None
         try:
-            conn = psycopg2.connect(
-                host='localhost',
-                port=db_metadata.get('port', 5432),
-                user=db_metadata['user'],
-                password=db_metadata['password'],
-                dbname=db_metadata['dbname']
-            )
-
             schema_name = db_metadata.get('schema', 'public')
-            max_sample_rows = db_metadata.get('max_sample_rows', 3)
+            max_sample_rows = self._get_max_sample_rows(db_metadata, selection)
 
             schema_info = {
                 'database': db_metadata['dbname'],
@@ -193,97 +1084,167 @@ class ProjectService:
                 'tables': {}
             }
 
-            with conn.cursor() as cursor:
-
-                cursor.execute(sql.SQL("""
-                    SELECT table_name 
-                    FROM information_schema.tables 
-                    WHERE table_schema = %s
-                    AND table_type = 'BASE TABLE'
-                    ORDER BY table_name
-                """), [schema_name])
+            with self._connection(project_id, 'postgres', db_metadata) as conn:
+                table_columns = self._get_postgres_columns(conn, schema_name, tables, selection)
+
+                fetcher = self._get_sample_fetcher(
+                    db_metadata,
+                    connect=lambda timeout: self._acquire_connection(
+                        project_id, 'postgres', db_metadata, statement_timeout=timeout
+                    ),
+                    close=self.connection_manager.release,
+                    fetch=lambda sample_conn, table: self._fetch_postgres_sample(
+                        sample_conn, schema_name, table, max_sample_rows
+                    ),
+                    selection=selection
+                )
+                schema_info['tables'] = self._collect_tables(
+                    fetcher, table_columns,
+                    lambda table, sample_rows: {
+                        'columns': table_columns[table],
+                        'sample_rows': sample_rows
+                    },
+                    on_table
+                )
 
-                tables = [row[0] for row in cursor.fetchall()]
+            return schema_info
 
-            for table in tables:
-                try:
-                    with conn.cursor() as cursor:
+        except Exception as e:
+            raise Exception(f"PostgreSQL schema retrieval failed: {str(e)}")
 
-                        cursor.execute(sql.SQL("""
-                            SELECT 
-                                column_name, 
-                                data_type,
-                                is_nullable,
-                                column_default,
-                                character_maximum_length,
-                                numeric_precision,
-                                numeric_scale
-                            FROM information_schema.columns
-                            WHERE table_schema = %s
-                            AND table_name = %s
-                            ORDER BY ordinal_position
-                        """), [schema_name, table])
+    def _get_postgres_columns(self, conn, schema_name, tables=None, selection=None):
+        """Read every column of every base table in a schema with one catalog query
 
-                        columns = []
-                        for row in cursor.fetchall():
-                            try:
-                                columns.append({
-                                    'name': row[0],
-                                    'type': row[1],
-                                    'nullable': row[2] == 'YES',
-                                    'default': row[3],
-                                    'max_length': row[4],
-                                    'precision': row[5],
-                                    'scale': row[6]
-                                })
-                            except IndexError as e:
-
-                                continue
-
-
-                    sample_rows = []
-                    try:
-                        with conn.cursor(cursor_factory=RealDictCursor) as dict_cursor:
-                            dict_cursor.execute(
-                                sql.SQL("SELECT * FROM {}.{} LIMIT {}")
-                                .format(
-                                    sql.Identifier(schema_name),
-                                    sql.Identifier(table),
-                                    sql.Literal(max_sample_rows)
-                                )
-                            )
-                            sample_rows = dict_cursor.fetchall()
-
-
-                            for row in sample_rows:
-                                for key, value in row.items():
-                                    if hasattr(value, 'isoformat'):
-                                        row[key] = value.isoformat()
-                                    elif isinstance(value, (bytes, memoryview)):
-                                        row[key] = str(value)
-                    except Exception as e:
-                        sample_rows = f"Failed to retrieve sample data: {str(e)}"
-
-                    schema_info['tables'][table] = {
-                        'columns': columns,
-                        'sample_rows': sample_rows
-                    }
+        Queries pg_catalog directly instead of the information_schema views, which
+        are much slower on schemas with thousands of tables. The values are the
+        ones information_schema.columns reports: ``type`` is its ``data_type``
+        (``ARRAY`` for arrays, ``USER-DEFINED`` for enums and other types
+        outside pg_catalog, the base type for domains), and nullability,
+        lengths, precision and scale are computed with the same expressions
+        and helper functions the view uses.
 
-                except Exception as e:
+        Args:
+            conn: Open psycopg2 connection
+            schema_name: Schema to introspect
+            tables: Optional list of table names to restrict the query to
+            selection: Optional SchemaSelection whose patterns, cursor and page
+                size restrict the tables read
 
-                    schema_info['tables'][table] = {
-                        'error': f"Failed to process table: {str(e)}"
-                    }
+        Returns:
+            Dictionary mapping table name to its ordered list of column dicts.
+            Tables without columns map to an empty list.
+        """
+        with conn.cursor() as cursor:
+            if selection is not None and (selection.include or selection.exclude):
+                # Regular expressions are matched in Python: list the names, then read the selected tables
+                table_filter, params = self._postgres_table_filter(schema_name, tables, selection)
+                cursor.execute(sql.SQL(f"""
+                    SELECT c.relname
+                    FROM pg_catalog.pg_class c
+                    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+                    {table_filter}
+                    ORDER BY c.relname::text COLLATE "C"
+                """), params)
+                tables = selection.select([row[0] for row in cursor.fetchall()])
+                selection = None
+
+            table_filter, params = self._postgres_table_filter(schema_name, tables, selection)
+            cursor.execute(sql.SQL(f"""
+                WITH selected AS (
+                    SELECT c.oid, c.relname
+                    FROM pg_catalog.pg_class c
+                    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+                    {table_filter}
+                    ORDER BY c.relname::text COLLATE "C"
+                    LIMIT %s
+                )
+                SELECT
+                    c.relname,
+                    a.attname,
+                    CASE WHEN t.typtype = 'd' THEN
+                        CASE WHEN bt.typelem <> 0 AND bt.typlen = -1 THEN 'ARRAY'
+                             WHEN nbt.nspname = 'pg_catalog' THEN pg_catalog.format_type(t.typbasetype, NULL)
+                             ELSE 'USER-DEFINED' END
+                    ELSE
+                        CASE WHEN t.typelem <> 0 AND t.typlen = -1 THEN 'ARRAY'
+                             WHEN nt.nspname = 'pg_catalog' THEN pg_catalog.format_type(a.atttypid, NULL)
+                             ELSE 'USER-DEFINED' END
+                    END,
+                    NOT (a.attnotnull OR (t.typtype = 'd' AND t.typnotnull)),
+                    pg_catalog.pg_get_expr(d.adbin, d.adrelid),
+                    information_schema._pg_char_max_length(
+                        information_schema._pg_truetypid(a.*, t.*), information_schema._pg_truetypmod(a.*, t.*)
+                    ),
+                    information_schema._pg_numeric_precision(
+                        information_schema._pg_truetypid(a.*, t.*), information_schema._pg_truetypmod(a.*, t.*)
+                    ),
+                    information_schema._pg_numeric_scale(
+                        information_schema._pg_truetypid(a.*, t.*), information_schema._pg_truetypmod(a.*, t.*)
+                    )
+                FROM selected c
+                LEFT JOIN pg_catalog.pg_attribute a
+                    ON a.attrelid = c.oid
+                    AND a.attnum > 0
+                    AND NOT a.attisdropped
+                LEFT JOIN pg_catalog.pg_type t ON t.oid = a.atttypid
+                LEFT JOIN pg_catalog.pg_namespace nt ON nt.oid = t.typnamespace
+                LEFT JOIN pg_catalog.pg_type bt ON t.typtype = 'd' AND bt.oid = t.typbasetype
+                LEFT JOIN pg_catalog.pg_namespace nbt ON nbt.oid = bt.typnamespace
+                LEFT JOIN pg_catalog.pg_attrdef d
+                    ON d.adrelid = a.attrelid
+                    AND d.adnum = a.attnum
+                ORDER BY c.relname::text COLLATE "C", a.attnum
+            """), [*params, selection.pushdown_limit if selection is not None else None])
+
+            table_columns = {}
+            for row in cursor.fetchall():
+                columns = table_columns.setdefault(row[0], [])
+                if row[1] is None:
                     continue
+                columns.append({
+                    'name': row[1],
+                    'type': row[2],
+                    'nullable': row[3],
+                    'default': row[4],
+                    'max_length': row[5],
+                    'precision': row[6],
+                    'scale': row[7]
+                })
+
+        return table_columns
+
+    @staticmethod
+    def _postgres_table_filter(schema_name, tables, selection):
+        """WHERE clause over ``pg_class c`` and ``pg_namespace n`` for the tables to read, and its parameters"""
+        include = selection.include_like() if selection is not None else None
+        exclude = selection.exclude_like() if selection is not None else None
+        after = selection.after if selection is not None else None
+        return """
+            WHERE n.nspname = %s
+            AND c.relkind IN ('r', 'p')
+            AND (%s::text[] IS NULL OR c.relname::text = ANY(%s::text[]))
+            AND (%s::text[] IS NULL OR c.relname::text LIKE ANY(%s::text[]))
+            AND (%s::text[] IS NULL OR NOT c.relname::text LIKE ANY(%s::text[]))
+            AND (%s::text IS NULL OR c.relname::text COLLATE "C" > %s::text)
+        """, [schema_name, tables, tables, include, include, exclude, exclude, after, after]
+
+    def _fetch_postgres_sample(self, conn, schema_name, table, max_sample_rows):
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    sql.SQL("SELECT * FROM {}.{} LIMIT {}")
+                    .format(
+                        sql.Identifier(schema_name),
+                        sql.Identifier(table),
+                        sql.Literal(max_sample_rows)
+                    )
+                )
+                return rows_to_record_batch([column.name for column in cursor.description], cursor.fetchall())
+        except Exception:
+            conn.rollback()
+            raise
 
-            return schema_info
-
-        except Exception as e:
-            raise Exception(f"PostgreSQL schema retrieval failed: {str(e)}")
-        finally:
-            if conn is not None:
-                conn.close()
-    def _get_bigquery_schema(self, db_metadata):
+    def _get_bigquery_schema(self, db_metadata, project_id=None, tables=None, on_table=None, selection=None):
         """
         Retrieve schema details from BigQuery
         Args:
@@ -291,90 +1252,229 @@ class ProjectService:
                 - project (str): GCP project ID
                 - dataset (str): BigQuery dataset ID
                 - keyfile (str/dict): Service account JSON or path to JSON file
+            project_id: Project whose pooled client should be used
+            tables: Optional list of table IDs to restrict introspection to
+            on_table: Optional callable invoked with each table as soon as it is complete
+            selection: Optional SchemaSelection pushed down into the catalog queries
 
         Returns:
             Dictionary with schema information
         """
         try:
+            with self._connection(project_id, 'bigquery', db_metadata) as client:
+                return self._read_bigquery_schema(client, db_metadata, tables, on_table, selection)
 
+        except ImportError:
+            raise Exception("Google Cloud BigQuery client not installed. Run: pip install google-cloud-bigquery")
+        except Exception as e:
+            raise Exception(f"BigQuery schema retrieval failed: {str(e)}")
 
+    def _read_bigquery_schema(self, client, db_metadata, tables=None, on_table=None, selection=None):
+        dataset = client.get_dataset(db_metadata['dataset'])
+        max_sample_rows = self._get_max_sample_rows(db_metadata, selection)
+        schema_info = {
+            'project': client.project,
+            'dataset': dataset.dataset_id,
+            'location': dataset.location,
+            'tables': {}
+        }
 
-
-
-            credentials = None
-            if 'keyfile' in db_metadata:
-                keyfile = db_metadata['keyfile']
-                if isinstance(keyfile, str):
-                    try:
-                        keyfile = json.loads(keyfile)
-                    except json.JSONDecodeError:
-
-                        credentials = service_account.Credentials.from_service_account_file(keyfile)
-                    else:
-                        credentials = service_account.Credentials.from_service_account_info(keyfile)
-
-
-            client = bigquery.Client(
-                credentials=credentials,
-                project=db_metadata.get('project')
+        try:
+            catalog = self._get_bigquery_catalog(client, dataset, tables, selection)
+        except Exception as e:
+            logger.warning(
+                f"INFORMATION_SCHEMA lookup failed for dataset {dataset.dataset_id}, "
+                f"falling back to per-table metadata: {str(e)}"
             )
+            catalog = self._get_bigquery_catalog_per_table(client, dataset, tables, selection)
+
+        timeout = self._get_sample_timeout(db_metadata)
+
+        def fetch_sample(sample_client, table_id):
+            entry = catalog[table_id]
+            table_path = f"{dataset.project}.{dataset.dataset_id}.{table_id}"
+            if entry['table_type'] != 'BASE TABLE':
+                # tabledata.list only serves stored tables, views need a query job
+                rows = sample_client.query(
+                    f"SELECT * FROM `{table_path}` LIMIT {int(max_sample_rows)}",
+                    timeout=timeout
+                ).result(timeout=timeout)
+            else:
+                rows = sample_client.list_rows(
+                    table_path,
+                    selected_fields=entry['fields'],
+                    max_results=max_sample_rows,
+                    timeout=timeout
+                )
+            # A few rows are cheaper over the REST API than through a Storage API session
+            return table_to_record_batch(rows.to_arrow(create_bqstorage_client=False))
+
+        # The BigQuery client is thread-safe, so workers share it
+        fetcher = self._get_sample_fetcher(
+            db_metadata,
+            connect=lambda timeout: client,
+            fetch=fetch_sample,
+            close=lambda sample_client: None,
+            selection=selection
+        )
+        schema_info['tables'] = self._collect_tables(
+            fetcher, catalog,
+            lambda table_id, sample_rows: {
+                'columns': catalog[table_id]['columns'],
+                'sample_rows': sample_rows,
+                'num_rows': catalog[table_id]['num_rows'],
+                'created': catalog[table_id]['created'],
+                'modified': catalog[table_id]['modified']
+            },
+            on_table
+        )
+
+        return schema_info
+
+    def _get_bigquery_catalog(self, client, dataset, tables=None, selection=None):
+        """Read tables and columns of a dataset with a single INFORMATION_SCHEMA query
 
-
-            dataset = client.get_dataset(db_metadata['dataset'])
-            schema_info = {
-                'project': client.project,
-                'dataset': dataset.dataset_id,
-                'location': dataset.location,
-                'tables': {}
-            }
-
-
-            tables = client.list_tables(dataset)
-            for table in tables:
-                table_ref = client.get_table(table.reference)
-                columns= [
+        Returns:
+            Dictionary mapping table ID to its columns, table type, row count,
+            creation and modification times, and the SchemaFields to request
+            sample rows with (None when the table has nested columns, in which
+            case list_rows looks the schema up itself)
+        """
+        dataset_path = f"{dataset.project}.{dataset.dataset_id}"
+        conditions, parameters = [], []
+        if tables is not None:
+            conditions.append("table_name IN UNNEST(@tables)")
+            parameters.append(bigquery.ArrayQueryParameter('tables', 'STRING', list(tables)))
+        # Only globs are pushed down; regular expressions are matched by selection.select below.
+        # BigQuery compares and orders strings by code point already.
+        include = selection.include_like() if selection is not None else None
+        exclude = selection.exclude_like() if selection is not None else None
+        if include is not None:
+            conditions.append("EXISTS (SELECT 1 FROM UNNEST(@include_like) pattern WHERE table_name LIKE pattern)")
+            parameters.append(bigquery.ArrayQueryParameter('include_like', 'STRING', include))
+        if exclude is not None:
+            conditions.append("NOT EXISTS (SELECT 1 FROM UNNEST(@exclude_like) pattern WHERE table_name LIKE pattern)")
+            parameters.append(bigquery.ArrayQueryParameter('exclude_like', 'STRING', exclude))
+        if selection is not None and selection.after is not None:
+            conditions.append("table_name > @after")
+            parameters.append(bigquery.ScalarQueryParameter('after', 'STRING', selection.after))
+
+        table_filter = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        limit = f"LIMIT {int(selection.pushdown_limit)}" if selection is not None and selection.pushdown_limit else ""
+        job_config = bigquery.QueryJobConfig(query_parameters=parameters) if parameters else None
+
+        rows = client.query(f"""
+            SELECT
+                t.table_name,
+                t.table_type,
+                c.column_name,
+                c.data_type,
+                c.is_nullable,
+                p.description,
+                m.row_count,
+                TIMESTAMP_MILLIS(m.creation_time) AS created,
+                TIMESTAMP_MILLIS(m.last_modified_time) AS modified
+            FROM (
+                SELECT table_name, table_type
+                FROM `{dataset_path}.INFORMATION_SCHEMA.TABLES`
+                {table_filter}
+                ORDER BY table_name
+                {limit}
+            ) t
+            LEFT JOIN `{dataset_path}.INFORMATION_SCHEMA.COLUMNS` c
+                ON c.table_name = t.table_name
+            LEFT JOIN `{dataset_path}.INFORMATION_SCHEMA.COLUMN_FIELD_PATHS` p
+                ON p.table_name = c.table_name
+                AND p.column_name = c.column_name
+                AND p.field_path = c.column_name
+            LEFT JOIN `{dataset_path}.__TABLES__` m
+                ON m.table_id = t.table_name
+            ORDER BY t.table_name, c.ordinal_position
+        """, job_config=job_config).result()
+
+        catalog = {}
+        for row in rows:
+            entry = catalog.get(row['table_name'])
+            if entry is None:
+                entry = catalog[row['table_name']] = {
+                    'columns': [],
+                    'fields': [],
+                    'table_type': row['table_type'],
+                    'num_rows': row['row_count'],
+                    'created': row['created'].isoformat() if row['created'] else None,
+                    'modified': row['modified'].isoformat() if row['modified'] else None
+                }
+            if row['column_name'] is None:
+                continue
+
+            data_type = row['data_type']
+            if data_type.startswith('ARRAY<'):
+                mode = 'REPEATED'
+            else:
+                mode = 'NULLABLE' if row['is_nullable'] == 'YES' else 'REQUIRED'
+            field_type = self._bigquery_legacy_type(data_type)
+            entry['columns'].append({
+                'name': row['column_name'],
+                'type': field_type,
+                'mode': mode,
+                'description': row['description'] or ''
+            })
+
+            if entry['fields'] is None or '<' in data_type:
+                entry['fields'] = None
+            else:
+                entry['fields'].append(bigquery.SchemaField(row['column_name'], field_type, mode=mode))
+
+        if selection is not None:
+            catalog = {table_id: catalog[table_id] for table_id in selection.select(catalog)}
+        return catalog
+
+    @staticmethod
+    def _bigquery_legacy_type(data_type):
+        """Legacy name of a BigQuery type, as ``SchemaField.field_type`` reports it
+
+        Both catalog paths return these names so the schema does not depend on
+        which one ran: ``INT64`` becomes ``INTEGER``, ``STRUCT<...>`` becomes
+        ``RECORD``, ``ARRAY<T>`` the name of ``T`` (its mode is ``REPEATED``)
+        and parameters such as ``NUMERIC(10, 2)`` are dropped.
+        """
+        base = data_type.strip().upper()
+        if base.startswith('ARRAY<'):
+            base = base[len('ARRAY<'):-1]
+        base = base.split('<')[0].split('(')[0].strip()
+        return BIGQUERY_LEGACY_TYPES.get(base, base)
+
+    def _get_bigquery_catalog_per_table(self, client, dataset, tables=None, selection=None):
+        """Same result as ``_get_bigquery_catalog`` from one get_table call per table"""
+        if tables is None:
+            table_ids = sorted(table.table_id for table in client.list_tables(dataset))
+        else:
+            table_ids = sorted(tables)
+        if selection is not None:
+            table_ids = selection.select(table_ids)
+        table_refs = [client.get_table(dataset.table(table_id)) for table_id in table_ids]
+
+        return {
+            table_ref.table_id: {
+                'columns': [
                     {
                         'name': field.name,
-                        'type': field.field_type,
+                        'type': self._bigquery_legacy_type(field.field_type),
                         'mode': field.mode,
                         'description': field.description or ''
                     }
                     for field in table_ref.schema
-                ]
-
-                sample_rows = []
-                try:
-                    query_job = client.query(
-                        f"SELECT * FROM `{dataset.project}.{dataset.dataset_id}.{table.table_id}` LIMIT 3"
-                    )
-                    results = query_job.result()
-
-                    for row in results:
-                        row_dict = {}
-                        for field in table_ref.schema:
-                            row_dict[field.name] = row.get(field.name)
-                        sample_rows.append(row_dict)
-                except Exception as e:
-                    sample_rows = f"Failed to retrieve sample data: {str(e)}"
-
-                schema_info['tables'][table.table_id] = {
-                    'columns': columns,
-                    'sample_rows': sample_rows,
-                    'num_rows': table_ref.num_rows,
-                    'created': table_ref.created.isoformat(),
-                    'modified': table_ref.modified.isoformat()
-                }
-
-            return schema_info
-
-            r
-
-        except ImportError:
-            raise Exception("Google Cloud BigQuery client not installed. Run: pip install google-cloud-bigquery")
-        except Exception as e:
-            raise Exception(f"BigQuery schema retrieval failed: {str(e)}")
+                ],
+                'fields': table_ref.schema,
+                'table_type': 'BASE TABLE' if table_ref.table_type == 'TABLE' else table_ref.table_type,
+                'num_rows': table_ref.num_rows,
+                'created': table_ref.created.isoformat(),
+                'modified': table_ref.modified.isoformat()
+            }
+            for table_ref in table_refs
+        }
 
-    def _get_snowflake_schema(self, db_metadata):
+    def _get_snowflake_schema(self, db_metadata, project_id=None, tables=None, on_table=None, selection=None):
         """
         Retrieve schema details from Snowflake
         Args:
@@ -386,6 +1486,10 @@ class ProjectService:
                 - database: Database name
                 - schema: Schema name (defaults to 'PUBLIC')
                 - role: Optional role name
+            project_id: Project whose pooled connections should be used
+            tables: Optional list of table names to restrict introspection to
+            on_table: Optional callable invoked with each table as soon as it is complete
+            selection: Optional SchemaSelection pushed down into the catalog queries
         Returns:
             Dictionary with schema information
         """
@@ -393,15 +1497,6 @@ class ProjectService:
 
         try:
 
-            conn = snowflake.connector.connect(
-                user=db_metadata['user'],
-                password=db_metadata['password'],
-                account=db_metadata['account'],
-                warehouse=db_metadata.get('warehouse'),
-                database=db_metadata['database'],
-                schema=db_metadata.get('schema', 'PUBLIC')
-            )
-
             schema_info = {
                 'database': db_metadata['database'],
                 'schema': db_metadata.get('schema', 'PUBLIC'),
@@ -409,130 +1504,157 @@ class ProjectService:
             }
 
 
-            with conn.cursor() as cur:
-
-                cur.execute(f"""
-                    SELECT table_name 
-                    FROM information_schema.tables 
-                    WHERE table_schema = '{db_metadata.get('schema', 'PUBLIC')}'
-                    AND table_type = 'BASE TABLE'
-                    ORDER BY table_name
-                """)
-
-                tables = [row[0] for row in cur.fetchall()]
-
+            with self._connection(project_id, 'snowflake', db_metadata) as conn:
+                table_columns = {}
+                with conn.cursor() as cur:
 
-                for table in tables:
+                    table_name = "COLLATE(table_name, 'utf8')"
+                    conditions, params, limit = self._selection_conditions(selection, table_name)
                     cur.execute(f"""
-                        SELECT 
-                            column_name,
-                            data_type,
-                            is_nullable,
-                            comment
-                        FROM information_schema.columns
-                        WHERE table_schema = '{db_metadata.get('schema', 'PUBLIC')}'
-                        AND table_name = '{table}'
-                        ORDER BY ordinal_position
-                    """)
-
-                    columns = [
-                        {
-                            'name': row[0],
-                            'type': row[1],
-                            'nullable': row[2] == 'YES',
-                            'description': row[3] or ''
-                        }
-                        for row in cur.fetchall()
+                        SELECT table_name 
+                        FROM information_schema.tables 
+                        WHERE table_schema = %s
+                        AND table_type = 'BASE TABLE'
+                        {conditions}
+                        ORDER BY {table_name}
+                        {limit}
+                    """, [db_metadata.get('schema', 'PUBLIC'), *params])
+
+                    table_names = [
+                        row[0] for row in cur.fetchall()
+                        if tables is None or row[0] in tables
                     ]
+                    if selection is not None:
+                        table_names = selection.select(table_names)
 
-                    sample_rows = []
-                    try:
-                        cur.execute(f"SELECT * FROM {table} LIMIT 3")
-                        column_names = [col[0] for col in cur.description]
-                        rows = cur.fetchall()
-
-                        for row in rows:
-                            sample_rows.append(dict(zip(column_names, row)))
-                    except Exception as e:
-                        sample_rows = f"Failed to retrieve sample data: {str(e)}"
 
-                    schema_info['tables'][table] = {
-                        'columns': columns ,
+                    for table in table_names:
+                        cur.execute(f"""
+                            SELECT 
+                                column_name,
+                                data_type,
+                                is_nullable,
+                                comment
+                            FROM information_schema.columns
+                            WHERE table_schema = '{db_metadata.get('schema', 'PUBLIC')}'
+                            AND table_name = '{table}'
+                            ORDER BY ordinal_position
+                        """)
+
+                        table_columns[table] = [
+                            {
+                                'name': row[0],
+                                'type': row[1],
+                                'nullable': row[2] == 'YES',
+                                'description': row[3] or ''
+                            }
+                            for row in cur.fetchall()
+                        ]
+
+                fetcher = self._get_sample_fetcher(
+                    db_metadata,
+                    connect=lambda timeout: self._acquire_connection(
+                        project_id, 'snowflake', db_metadata, statement_timeout=timeout
+                    ),
+                    fetch=lambda sample_conn, table: self._fetch_snowflake_sample(
+                        sample_conn, table, self._get_max_sample_rows(db_metadata, selection)
+                    ),
+                    close=self.connection_manager.release,
+                    selection=selection
+                )
+                schema_info['tables'] = self._collect_tables(
+                    fetcher, table_columns,
+                    lambda table, sample_rows: {
+                        'columns': table_columns[table],
                         'sample_rows': sample_rows
-                    }
+                    },
+                    on_table
+                )
 
             return schema_info
 
         except Exception as e:
             raise Exception(f"Snowflake operation failed: {str(e)}")
 
-        finally:
-            if 'conn' in locals():
-                conn.close()
+    def _fetch_snowflake_sample(self, conn, table, max_sample_rows=3):
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT * FROM {self._quote_identifier(table)} LIMIT {int(max_sample_rows)}")
+            column_names = [col[0] for col in cur.description]
+            return rows_to_record_batch(column_names, cur.fetchall())
 
-    def _get_mysql_schema(self, db_metadata):
+    def _get_mysql_schema(self, db_metadata, project_id=None, tables=None, on_table=None, selection=None):
 
 
-        conn = None
         try:
-            conn = mysql.connector.connect(
-                host='localhost',
-                port=db_metadata.get('port', 3306),
-                user=db_metadata['user'],
-                password=db_metadata['password'],
-                database=db_metadata['database']
-            )
-
             schema_info = {
                 'database': db_metadata['database'],
                 'tables': {}
             }
 
-            with conn.cursor() as cursor:
-                cursor.execute("""
-                    SELECT table_name 
-                    FROM information_schema.tables 
-                    WHERE table_schema = %s
-                    ORDER BY table_name
-                """, [db_metadata['database']])
-                tables = [row[0] for row in cursor.fetchall()]
-
-            for table in tables:
+            with self._connection(project_id, 'mysql', db_metadata) as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute("""
-                        SELECT 
-                            column_name,
-                            data_type,
-                            is_nullable,
-                            column_comment
-                        FROM information_schema.columns
+                    table_name = "CAST(table_name AS BINARY)"
+                    conditions, params, limit = self._selection_conditions(selection, table_name)
+                    cursor.execute(f"""
+                        SELECT table_name 
+                        FROM information_schema.tables 
                         WHERE table_schema = %s
-                        AND table_name = %s
-                        ORDER BY ordinal_position
-                    """, [db_metadata['database'], table])
-
-                    columns = []
-                    for row in cursor.fetchall():
-                        column_name, data_type, is_nullable, column_comment = row
-                        columns.append({
-                            'name': column_name,
-                            'type': data_type,
-                            'nullable': is_nullable == 'YES',
-                            'description': column_comment or ''
-                        })
-
-                    sample_rows = []
-
-                    cursor.execute(f"SELECT * FROM `{table}` LIMIT 3")
-                    sample_rows = cursor.fetchall()
-
-
+                        {conditions}
+                        ORDER BY {table_name}
+                        {limit}
+                    """, [db_metadata['database'], *params])
+                    table_names = [
+                        row[0] for row in cursor.fetchall()
+                        if tables is None or row[0] in tables
+                    ]
+                    if selection is not None:
+                        table_names = selection.select(table_names)
 
+                table_columns = {}
+                for table in table_names:
+                    with conn.cursor() as cursor:
+                        cursor.execute("""
+                            SELECT 
+                                column_name,
+                                data_type,
+                                is_nullable,
+                                column_comment
+                            FROM information_schema.columns
+                            WHERE table_schema = %s
+                            AND table_name = %s
+                            ORDER BY ordinal_position
+                        """, [db_metadata['database'], table])
 
-                    schema_info['tables'][table] = {
-                        'columns': columns,
+                        columns = []
+                        for row in cursor.fetchall():
+                            column_name, data_type, is_nullable, column_comment = row
+                            columns.append({
+                                'name': column_name,
+                                'type': data_type,
+                                'nullable': is_nullable == 'YES',
+                                'description': column_comment or ''
+                            })
+                        table_columns[table] = columns
+
+                fetcher = self._get_sample_fetcher(
+                    db_metadata,
+                    connect=lambda timeout: self._acquire_connection(
+                        project_id, 'mysql', db_metadata, statement_timeout=timeout
+                    ),
+                    fetch=lambda sample_conn, table: self._fetch_mysql_sample(
+                        sample_conn, table, self._get_max_sample_rows(db_metadata, selection)
+                    ),
+                    close=self.connection_manager.release,
+                    selection=selection
+                )
+                schema_info['tables'] = self._collect_tables(
+                    fetcher, table_columns,
+                    lambda table, sample_rows: {
+                        'columns': table_columns[table],
                         'sample_rows': sample_rows
-                    }
+                    },
+                    on_table
+                )
 
             return schema_info
 
@@ -540,6 +1662,208 @@ class ProjectService:
             raise Exception(f"MySQL operation failed (code {e.errno}): {e.msg}")
         except Exception as e:
             raise Exception(f"Schema retrieval failed: Unexpected error: {str(e)}")
-        finally:
-            if conn and conn.is_connected():
-                conn.close()
+
+    def _fetch_mysql_sample(self, conn, table, max_sample_rows=3):
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT * FROM {self._quote_mysql_identifier(table)} LIMIT {int(max_sample_rows)}")
+            rows = cursor.fetchall()
+            return rows_to_record_batch(cursor.column_names, rows)
+
+    def _profile_with_aggregates(self, db_metadata, tables, connect, profile_table, close=None):
+        """Profile tables concurrently with one aggregate query each
+
+        Args:
+            db_metadata: Project database metadata (``profile_timeout`` overrides the default)
+            tables: Dictionary of table name to table info with ``columns``
+            connect: Callable ``connect(timeout)`` borrowing a connection
+            profile_table: Callable ``profile_table(conn, table, table_info)`` returning a profile
+            close: Callable handing a connection back
+
+        Returns:
+            Dictionary of table name to profile, or to ``{'error': str}``
+        """
+        timeout = db_metadata.get('profile_timeout', getattr(settings, 'SCHEMA_PROFILE_TIMEOUT', 60))
+        fetcher = SampleFetcher(
+            connect=lambda: connect(timeout),
+            fetch=lambda conn, table: profile_table(conn, table, tables[table]),
+            close=close,
+            max_workers=db_metadata.get(
+                'sample_max_workers', getattr(settings, 'SCHEMA_SAMPLE_MAX_WORKERS', 8)
+            ),
+            timeout=timeout,
+            label='column statistics'
+        )
+        return {
+            table: result if isinstance(result, dict) else {'error': result}
+            for table, result in fetcher.iter_fetch(tables)
+        }
+
+    def _profile_postgres_tables(self, db_metadata, project_id, tables):
+        """Column statistics from pg_stats, with an aggregate query for tables never analyzed"""
+        schema_name = db_metadata.get('schema', 'public')
+        try:
+            with self._connection(project_id, 'postgres', db_metadata) as conn:
+                profiles = self._read_postgres_stats(conn, schema_name, tables)
+        except Exception as e:
+            logger.warning(f"Reading pg_stats failed for project {project_id}: {str(e)}")
+            profiles = {}
+
+        missing = {table: table_info for table, table_info in tables.items() if table not in profiles}
+        if missing:
+            profiles.update(self._profile_with_aggregates(
+                db_metadata, missing,
+                connect=lambda timeout: self._acquire_connection(
+                    project_id, 'postgres', db_metadata, statement_timeout=timeout
+                ),
+                close=self.connection_manager.release,
+                profile_table=lambda conn, table, table_info: self._run_postgres_profile(
+                    conn, schema_name, table, table_info
+                )
+            ))
+        return profiles
+
+    def _read_postgres_stats(self, conn, schema_name, tables):
+        """Profiles of the tables whose every column has planner statistics
+
+        ``n_distinct`` and the histogram bounds are estimates from the last
+        ANALYZE, and the bounds leave out the most common values, so these
+        profiles are marked approximate.
+        """
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT DISTINCT ON (s.tablename, s.attname)
+                    s.tablename,
+                    c.reltuples,
+                    s.attname,
+                    s.null_frac,
+                    s.n_distinct,
+                    (s.histogram_bounds::text::text[])[1],
+                    (s.histogram_bounds::text::text[])[cardinality(s.histogram_bounds::text::text[])]
+                FROM pg_catalog.pg_stats s
+                JOIN pg_catalog.pg_namespace n ON n.nspname = s.schemaname
+                JOIN pg_catalog.pg_class c ON c.relnamespace = n.oid AND c.relname = s.tablename
+                WHERE s.schemaname = %s
+                AND s.tablename = ANY(%s)
+                ORDER BY s.tablename, s.attname, s.inherited DESC
+            """, [schema_name, list(tables)])
+            rows = cursor.fetchall()
+
+        stats = {}
+        for table, reltuples, column, null_frac, n_distinct, low, high in rows:
+            stats.setdefault(table, (reltuples, {}))[1][column] = (null_frac, n_distinct, low, high)
+
+        profiles = {}
+        for table, (reltuples, columns) in stats.items():
+            table_columns = tables[table].get('columns', [])
+            # reltuples is -1 until the table is first vacuumed or analyzed
+            if reltuples < 0 or any(column['name'] not in columns for column in table_columns):
+                continue
+
+            profile = {'row_count': int(reltuples), 'source': 'pg_stats', 'approximate': True, 'columns': {}}
+            for column in table_columns:
+                null_frac, n_distinct, low, high = columns[column['name']]
+                with_min_max = column_metrics(column.get('type'))[1]
+                profile['columns'][column['name']] = {
+                    'null_fraction': round(null_frac, 6),
+                    # Negative n_distinct is a fraction of the row count
+                    'distinct_count': int(n_distinct) if n_distinct >= 0 else int(round(-n_distinct * reltuples)),
+                    'min': low if with_min_max else None,
+                    'max': high if with_min_max else None
+                }
+            profiles[table] = profile
+        return profiles
+
+    def _run_postgres_profile(self, conn, schema_name, table, table_info):
+        query, plan = build_profile_query(
+            f"{self._quote_identifier(schema_name)}.{self._quote_identifier(table)}",
+            table_info.get('columns', []),
+            quote=self._quote_identifier
+        )
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(query)
+                return parse_profile_row(plan, cursor.fetchone())
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _profile_bigquery_tables(self, db_metadata, project_id, tables):
+        """Column statistics with APPROX_COUNT_DISTINCT; empty tables are answered from table metadata"""
+        with self._connection(project_id, 'bigquery', db_metadata) as client:
+            dataset = client.get_dataset(db_metadata['dataset'])
+
+            def profile_table(query_client, table, table_info):
+                if table_info.get('num_rows') == 0:
+                    return empty_profile(table_info.get('columns', []))
+                # Repeated columns are arrays of their type, which MIN/MAX/DISTINCT do not apply to
+                columns = [
+                    {**column, 'type': f"ARRAY<{column.get('type')}>"} if column.get('mode') == 'REPEATED' else column
+                    for column in table_info.get('columns', [])
+                ]
+                query, plan = build_profile_query(
+                    f"`{dataset.project}.{dataset.dataset_id}.{table}`",
+                    columns,
+                    quote=lambda name: f"`{name}`",
+                    distinct='APPROX_COUNT_DISTINCT({})'
+                )
+                row = next(iter(query_client.query(query).result()))
+                return parse_profile_row(plan, list(row.values()), approximate_distinct=True)
+
+            # The BigQuery client is thread-safe, so workers share it
+            return self._profile_with_aggregates(
+                db_metadata, tables,
+                connect=lambda timeout: client,
+                close=lambda query_client: None,
+                profile_table=profile_table
+            )
+
+    def _profile_snowflake_tables(self, db_metadata, project_id, tables):
+        """Column statistics with APPROX_COUNT_DISTINCT (HyperLogLog)"""
+        def profile_table(conn, table, table_info):
+            query, plan = build_profile_query(
+                self._quote_identifier(table),
+                table_info.get('columns', []),
+                quote=self._quote_identifier,
+                distinct='APPROX_COUNT_DISTINCT({})'
+            )
+            with conn.cursor() as cur:
+                cur.execute(query)
+                return parse_profile_row(plan, cur.fetchone(), approximate_distinct=True)
+
+        return self._profile_with_aggregates(
+            db_metadata, tables,
+            connect=lambda timeout: self._acquire_connection(
+                project_id, 'snowflake', db_metadata, statement_timeout=timeout
+            ),
+            close=self.connection_manager.release,
+            profile_table=profile_table
+        )
+
+    def _profile_mysql_tables(self, db_metadata, project_id, tables):
+        """Column statistics with exact COUNT(DISTINCT), MySQL has no approximate variant"""
+        def profile_table(conn, table, table_info):
+            query, plan = build_profile_query(
+                self._quote_mysql_identifier(table),
+                table_info.get('columns', []),
+                quote=self._quote_mysql_identifier
+            )
+            with conn.cursor() as cursor:
+                cursor.execute(query)
+                return parse_profile_row(plan, cursor.fetchone())
+
+        return self._profile_with_aggregates(
+            db_metadata, tables,
+            connect=lambda timeout: self._acquire_connection(
+                project_id, 'mysql', db_metadata, statement_timeout=timeout
+            ),
+            close=self.connection_manager.release,
+            profile_table=profile_table
+        )
+
+    @staticmethod
+    def _quote_identifier(name):
+        return '"' + name.replace('"', '""') + '"'
+
+    @staticmethod
+    def _quote_mysql_identifier(name):
+        return "`" + name.replace("`", "``") + "`"
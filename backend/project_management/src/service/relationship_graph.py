@@ -0,0 +1,120 @@
+import networkx as nx
+from networkx.algorithms.approximation import steiner_tree
+
+
+def empty_relationships():
+    return {'primary_keys': {}, 'foreign_keys': []}
+
+
+def build_relationship_graph(relationships, tables=None):
+    """Undirected graph of the tables of a schema joined by their foreign keys
+
+    Every node carries the table's ``primary_key`` column list. Every edge
+    carries ``foreign_keys``, the list of foreign key dicts joining the two
+    tables (usually one, several when a table references another twice).
+
+    Args:
+        relationships: ``{'primary_keys': {table: [column]}, 'foreign_keys': [dict]}``
+            as read by the schema retrievers
+        tables: Optional iterable of table names to add as nodes even when they
+            have no key
+    """
+    graph = nx.Graph()
+    for table in tables or ():
+        graph.add_node(table, primary_key=[])
+    for table, columns in relationships.get('primary_keys', {}).items():
+        graph.add_node(table, primary_key=list(columns))
+
+    for foreign_key in relationships.get('foreign_keys', []):
+        table, referenced_table = foreign_key['table'], foreign_key['referenced_table']
+        for node in (table, referenced_table):
+            if node not in graph:
+                graph.add_node(node, primary_key=[])
+        if graph.has_edge(table, referenced_table):
+            graph.edges[table, referenced_table]['foreign_keys'].append(foreign_key)
+        else:
+            graph.add_edge(table, referenced_table, foreign_keys=[foreign_key])
+    return graph
+
+
+def join_path(graph, tables):
+    """Foreign keys connecting ``tables`` through as few intermediate tables as possible
+
+    Tables that are not connected to each other at all are joined per
+    connected component. Two tables use their shortest path; more tables use
+    an approximate Steiner tree, the smallest tree spanning all of them.
+
+    Returns:
+        Dictionary with the ``tables`` on the path (requested and intermediate,
+        sorted), the ``foreign_keys`` to join them with and the requested tables
+        the graph does not know as ``unknown_tables``
+    """
+    requested = list(dict.fromkeys(tables))
+    terminals = [table for table in requested if table in graph]
+
+    edges = []
+    for component in nx.connected_components(graph.subgraph(_reachable(graph, terminals))):
+        component_terminals = [table for table in terminals if table in component]
+        if len(component_terminals) == 2:
+            path = nx.shortest_path(graph, *component_terminals)
+            edges.extend(zip(path, path[1:]))
+        elif len(component_terminals) > 2:
+            edges.extend(steiner_tree(graph.subgraph(component), component_terminals).edges)
+
+    path_tables = set(terminals)
+    foreign_keys = []
+    for left, right in edges:
+        path_tables.update((left, right))
+        foreign_keys.extend(graph.edges[left, right]['foreign_keys'])
+
+    return {
+        'tables': sorted(path_tables),
+        'foreign_keys': _sorted_keys(foreign_keys),
+        'unknown_tables': [table for table in requested if table not in graph]
+    }
+
+
+def subset_relationships(relationships, tables):
+    """Keys of ``tables`` and the foreign keys referencing or referenced by them"""
+    tables = set(tables)
+    return {
+        'primary_keys': {
+            table: columns for table, columns in relationships.get('primary_keys', {}).items() if table in tables
+        },
+        'foreign_keys': [
+            foreign_key for foreign_key in relationships.get('foreign_keys', [])
+            if foreign_key['table'] in tables or foreign_key['referenced_table'] in tables
+        ]
+    }
+
+
+def join_conditions(foreign_keys):
+    """``a.x = b.y`` join conditions of foreign keys, one line per key"""
+    return [
+        ' AND '.join(
+            f"{foreign_key['table']}.{column} = {foreign_key['referenced_table']}.{referenced_column}"
+            for column, referenced_column in zip(foreign_key['columns'], foreign_key['referenced_columns'])
+        )
+        for foreign_key in foreign_keys
+    ]
+
+
+def graph_to_json(graph):
+    return {
+        'tables': {table: {'primary_key': data['primary_key']} for table, data in sorted(graph.nodes(data=True))},
+        'foreign_keys': _sorted_keys(
+            foreign_key for _, _, data in graph.edges(data=True) for foreign_key in data['foreign_keys']
+        )
+    }
+
+
+def _sorted_keys(foreign_keys):
+    return sorted(foreign_keys, key=lambda key: (key['table'], key['referenced_table'], key['name'] or ''))
+
+
+def _reachable(graph, terminals):
+    nodes = set()
+    for table in terminals:
+        if table not in nodes:
+            nodes.update(nx.node_connected_component(graph, table))
+    return nodes
@@ -0,0 +1,132 @@
+import json
+
+import pyarrow as pa
+from rest_framework.utils.encoders import JSONEncoder
+
+ARROW_STREAM_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+
+_ARROW_CONVERSION_ERRORS = (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError)
+
+
+def rows_to_record_batch(column_names, rows):
+    """Build a RecordBatch column by column from DB-API result rows
+
+    Column types are inferred by Arrow from the driver's Python values, so
+    timestamps, decimals and binary data keep their types. A column Arrow
+    cannot represent (e.g. mixed types) is stored as strings instead.
+    """
+    columns = list(zip(*rows)) if rows else [()] * len(column_names)
+    arrays = []
+    for values in columns:
+        values = [bytes(value) if isinstance(value, memoryview) else value for value in values]
+        try:
+            arrays.append(pa.array(values))
+        except _ARROW_CONVERSION_ERRORS:
+            arrays.append(pa.array([None if value is None else str(value) for value in values], pa.string()))
+    return pa.RecordBatch.from_arrays(arrays, names=list(column_names))
+
+
+def table_to_record_batch(table):
+    """Collapse an Arrow Table (e.g. from BigQuery's ``to_arrow``) into one RecordBatch"""
+    batches = table.combine_chunks().to_batches()
+    if not batches:
+        return pa.RecordBatch.from_pylist([], schema=table.schema)
+    return batches[0]
+
+
+def to_record_batch(sample_rows):
+    """Sample rows as a RecordBatch, converting lists of dicts read back from storage"""
+    if isinstance(sample_rows, pa.RecordBatch):
+        return sample_rows
+    try:
+        return pa.RecordBatch.from_pylist(sample_rows)
+    except _ARROW_CONVERSION_ERRORS:
+        names = list(dict.fromkeys(key for row in sample_rows for key in row))
+        return rows_to_record_batch(names, [[row.get(name) for name in names] for row in sample_rows])
+
+
+def sample_rows_to_json(sample_rows):
+    """Sample rows as a list of JSON-friendly dicts; error strings and lists pass through"""
+    if not isinstance(sample_rows, pa.RecordBatch):
+        return sample_rows
+
+    rows = sample_rows.to_pylist()
+    for row in rows:
+        for key, value in row.items():
+            if hasattr(value, 'isoformat'):
+                row[key] = value.isoformat()
+            elif isinstance(value, bytes):
+                row[key] = str(value)
+    return rows
+
+
+def jsonable_table(table_info):
+    if 'sample_rows' not in table_info:
+        return table_info
+    return {**table_info, 'sample_rows': sample_rows_to_json(table_info['sample_rows'])}
+
+
+def jsonable_schema(schema_info):
+    """Copy of a schema with every table's sample rows converted for JSON"""
+    return {
+        **schema_info,
+        'tables': {name: jsonable_table(table_info) for name, table_info in schema_info['tables'].items()}
+    }
+
+
+def schema_to_arrow_stream(schema_info, metadata=None):
+    """Serialize a schema as one Arrow IPC stream with a row per table
+
+    Columns are ``table_name``, ``columns`` and ``properties`` (JSON text),
+    ``sample_rows`` (the table's samples as a nested Arrow IPC stream, so each
+    table keeps its own column types) and ``sample_error``. Schema-level
+    fields and ``metadata`` are stored as JSON in the stream's schema metadata.
+    """
+    names, columns, properties, samples, errors = [], [], [], [], []
+    for table_name, table_info in schema_info['tables'].items():
+        names.append(table_name)
+        columns.append(json.dumps(table_info.get('columns', []), cls=JSONEncoder))
+        properties.append(json.dumps(
+            {key: value for key, value in table_info.items() if key not in ('columns', 'sample_rows')},
+            cls=JSONEncoder
+        ))
+
+        sample_rows = table_info.get('sample_rows')
+        if sample_rows is None or isinstance(sample_rows, str):
+            samples.append(None)
+            errors.append(sample_rows)
+        else:
+            samples.append(_serialize_batch(to_record_batch(sample_rows)))
+            errors.append(None)
+
+    schema_metadata = {key: value for key, value in schema_info.items() if key != 'tables'}
+    batch = pa.RecordBatch.from_arrays(
+        [
+            pa.array(names, pa.string()),
+            pa.array(columns, pa.string()),
+            pa.array(properties, pa.string()),
+            pa.array(samples, pa.binary()),
+            pa.array(errors, pa.string()),
+        ],
+        schema=pa.schema(
+            [
+                ('table_name', pa.string()),
+                ('columns', pa.string()),
+                ('properties', pa.string()),
+                ('sample_rows', pa.binary()),
+                ('sample_error', pa.string()),
+            ],
+            metadata={
+                key: json.dumps(value, cls=JSONEncoder)
+                for key, value in {**(metadata or {}), 'schema': schema_metadata}.items()
+            }
+        )
+    )
+    return _serialize_batch(batch)
+
+
+def _serialize_batch(batch):
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,121 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+
+class SampleFetcher:
+    """Fetch sample rows for many tables concurrently with bounded parallelism.
+
+    Every worker borrows its own connection, so drivers that are not thread-safe
+    (psycopg2 cursors, mysql-connector, snowflake) never share one. At most
+    ``max_workers`` connections are opened per call and all of them are closed
+    before ``fetch_all`` returns, except for ones still busy with a table that
+    timed out; those are closed by their worker once the statement returns.
+
+    A table that fails or runs longer than ``timeout`` seconds gets an error
+    string in place of its rows instead of failing the whole schema.
+    """
+
+    def __init__(self, connect, fetch, close=None, max_workers=8, timeout=10, label='sample data'):
+        """
+        Args:
+            connect: Callable returning a new connection for one worker
+            fetch: Callable ``fetch(conn, table)`` returning the table's sample rows
+            close: Optional callable closing a connection (defaults to ``conn.close()``)
+            max_workers: Maximum number of concurrent fetches
+            timeout: Seconds a single table may run before it is reported as failed
+            label: What is fetched, used in error messages
+        """
+        self.connect = connect
+        self.fetch = fetch
+        self.close = close or (lambda conn: conn.close())
+        self.max_workers = max(1, int(max_workers))
+        self.timeout = timeout
+        self.label = label
+
+    def fetch_all(self, tables):
+        """
+        Args:
+            tables: Iterable of table names
+
+        Returns:
+            Dictionary mapping each table to its sample rows, or to an error string
+        """
+        tables = list(tables)
+        results = dict(self.iter_fetch(tables))
+        return {table: results[table] for table in tables}
+
+    def iter_fetch(self, tables):
+        """Yield ``(table, sample_rows_or_error)`` pairs in completion order
+
+        Args:
+            tables: Iterable of table names
+        """
+        tables = list(tables)
+        if not tables:
+            return
+
+        idle = []
+        lock = threading.Lock()
+        closed = threading.Event()
+        started = {}
+
+        def run(table):
+            with lock:
+                conn = idle.pop() if idle else None
+                started[table] = time.monotonic()
+            if conn is None:
+                conn = self.connect()
+            try:
+                return self.fetch(conn, table)
+            finally:
+                with lock:
+                    keep = not closed.is_set()
+                    if keep:
+                        idle.append(conn)
+                if not keep:
+                    self._safe_close(conn)
+
+        executor = ThreadPoolExecutor(
+            max_workers=min(self.max_workers, len(tables)),
+            thread_name_prefix='schema-sample'
+        )
+        try:
+            pending = {executor.submit(run, table): table for table in tables}
+
+            while pending:
+                done, _ = wait(pending, timeout=min(self.timeout, 1), return_when=FIRST_COMPLETED)
+                for future in done:
+                    table = pending.pop(future)
+                    try:
+                        rows = future.result()
+                    except Exception as e:
+                        rows = f"Failed to retrieve {self.label}: {str(e)}"
+                    yield table, rows
+
+                now = time.monotonic()
+                with lock:
+                    expired = [
+                        future for future, table in pending.items()
+                        if table in started and now - started[table] > self.timeout
+                    ]
+                for future in expired:
+                    table = pending.pop(future)
+                    logger.warning(f"Fetching {self.label} for table {table} timed out after {self.timeout}s")
+                    yield table, f"Failed to retrieve {self.label}: timed out after {self.timeout}s"
+        finally:
+            with lock:
+                closed.set()
+                to_close, idle[:] = list(idle), []
+            executor.shutdown(wait=False, cancel_futures=True)
+            for conn in to_close:
+                self._safe_close(conn)
+
+    def _safe_close(self, conn):
+        try:
+            self.close(conn)
+        except Exception as e:
+            logger.warning(f"Failed to close sample connection: {str(e)}")
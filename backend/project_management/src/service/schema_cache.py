@@ -0,0 +1,121 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaCache:
+    """In-process LRU cache of warehouse schemas keyed by project ID.
+
+    An entry is served as-is for ``recheck_interval`` seconds after it was last
+    validated. Past that, the backend fingerprint is recomputed and the entry is
+    kept only if the fingerprint is unchanged. Entries are always reloaded once
+    they are older than ``ttl`` seconds, and the least recently used entry is
+    evicted when more than ``max_entries`` projects are cached.
+
+    A stale entry is not thrown away: it is handed to ``load`` as the previous
+    snapshot so the loader can refresh it incrementally.
+    """
+
+    def __init__(self, ttl=3600, max_entries=128, recheck_interval=30):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.recheck_interval = recheck_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def metadata_key(database_type, database_metadata):
+        """Hash of the connection settings, so edited projects never hit stale entries"""
+        payload = json.dumps([database_type, database_metadata], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get_or_load(self, project_id, metadata_key, load, fingerprint, refresh=False):
+        """Return the cached schema for a project, reloading it when stale
+
+        Args:
+            project_id: Project the schema belongs to
+            metadata_key: Result of ``metadata_key`` for the project's connection
+            load: Callable ``load(previous)`` returning the schema from the warehouse,
+                where ``previous`` is the stale cached schema or None
+            fingerprint: Callable returning a cheap change marker for the schema
+            refresh: Skip the cache and call ``load`` without a previous schema
+
+        Returns:
+            The schema returned by ``load``, possibly from cache
+        """
+        if not refresh:
+            schema = self.get(project_id, metadata_key, fingerprint)
+            if schema is not None:
+                return schema
+
+        entry = None if refresh else self._get_entry(project_id, metadata_key)
+
+        # Fingerprint before loading so a change made during the load forces a reload next time
+        current = self._safe_fingerprint(project_id, fingerprint)
+        schema = load(entry['schema'] if entry is not None else None)
+        loaded_at = time.monotonic()
+
+        with self._lock:
+            self._entries[project_id] = {
+                'metadata_key': metadata_key,
+                'fingerprint': current,
+                'schema': schema,
+                'loaded_at': loaded_at,
+                'checked_at': loaded_at
+            }
+            self._entries.move_to_end(project_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return schema
+
+    def get(self, project_id, metadata_key, fingerprint):
+        """Return the cached schema if it is still valid, without ever loading it
+
+        Returns:
+            The cached schema, or None when there is no valid entry
+        """
+        now = time.monotonic()
+        entry = self._get_entry(project_id, metadata_key)
+        if entry is None or now - entry['loaded_at'] >= self.ttl:
+            return None
+        if now - entry['checked_at'] < self.recheck_interval:
+            return entry['schema']
+
+        current = self._safe_fingerprint(project_id, fingerprint)
+        if current is None or current == entry['fingerprint']:
+            entry['checked_at'] = now
+            return entry['schema']
+        return None
+
+    def invalidate(self, project_id):
+        with self._lock:
+            self._entries.pop(project_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _get_entry(self, project_id, metadata_key):
+        with self._lock:
+            entry = self._entries.get(project_id)
+            if entry is None:
+                return None
+            if entry['metadata_key'] != metadata_key:
+                del self._entries[project_id]
+                return None
+            self._entries.move_to_end(project_id)
+            return entry
+
+    @staticmethod
+    def _safe_fingerprint(project_id, fingerprint):
+        try:
+            return fingerprint()
+        except Exception as e:
+            logger.warning(f"Schema fingerprint failed for project {project_id}: {str(e)}")
+            return None
@@ -0,0 +1,157 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from ..repo.models import ProjectMetadata, SchemaRefreshRun
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaRefreshScheduler:
+    """Keep the schemas of active projects warm by refreshing them in the background.
+
+    A project is due once the ``next_run_at`` of its latest SchemaRefreshRun has
+    passed, or if it was never refreshed. After each run the next one is
+    scheduled ``interval`` seconds later, spread by +/- ``jitter`` (a fraction of
+    the interval) so projects added together drift apart. The interval can be
+    set per project with ``schema_refresh_interval`` in its database metadata.
+
+    At most ``max_concurrency`` refreshes run at once and at most
+    ``type_limits[database_type]`` of them against the same warehouse type.
+    """
+
+    def __init__(self, project_service, interval=900, jitter=0.1, max_concurrency=4,
+                 type_limits=None, full=False):
+        """
+        Args:
+            project_service: ProjectService used to load the schemas
+            interval: Default seconds between two refreshes of a project
+            jitter: Fraction of the interval the next run is randomly moved by
+            max_concurrency: Maximum number of refreshes running at once
+            type_limits: Optional dict of maximum concurrent refreshes per database type
+            full: Re-read every table instead of refreshing incrementally
+
+        Raises:
+            ValueError: If a per-type limit is below 1
+        """
+        self.project_service = project_service
+        self.interval = interval
+        self.jitter = jitter
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.type_limits = {db_type.lower(): int(limit) for db_type, limit in (type_limits or {}).items()}
+        for db_type, limit in self.type_limits.items():
+            if limit < 1:
+                raise ValueError(f"Schema refresh limit of '{db_type}' must be at least 1, got {limit}")
+        self.full = full
+
+    def due_projects(self, project_ids=None):
+        """Active projects whose next refresh is due, most overdue first
+
+        Args:
+            project_ids: Optional list of projects to refresh regardless of schedule
+        """
+        projects = ProjectMetadata.objects.filter(is_active=True).select_related('database_type')
+        if project_ids:
+            return list(projects.filter(pk__in=project_ids))
+
+        latest_run = SchemaRefreshRun.objects.filter(project=OuterRef('pk')).order_by('-started_at')
+        projects = projects.annotate(next_run_at=Subquery(latest_run.values('next_run_at')[:1]))
+
+        now = timezone.now()
+        due = [project for project in projects if project.next_run_at is None or project.next_run_at <= now]
+        return sorted(due, key=lambda project: project.next_run_at or now)
+
+    def run_once(self, project_ids=None):
+        """Refresh every due project within the concurrency limits
+
+        Returns:
+            List of the SchemaRefreshRun records created
+        """
+        pending = self.due_projects(project_ids)
+        if not pending:
+            return []
+
+        runs = []
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='schema-refresh') as executor:
+            while pending or running:
+                for project in list(pending):
+                    if len(running) >= self.max_concurrency:
+                        break
+                    db_type = self._database_type(project)
+                    limit = self.type_limits.get(db_type, self.max_concurrency)
+                    if sum(1 for active in running.values() if active == db_type) >= limit:
+                        continue
+                    pending.remove(project)
+                    running[executor.submit(self.refresh_project, project)] = db_type
+
+                if not running:
+                    # Nothing could be started, so waiting would never end
+                    logger.error(f"{len(pending)} schema refreshes could not be scheduled and are skipped")
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del running[future]
+                    try:
+                        runs.append(future.result())
+                    except Exception as e:
+                        logger.error(f"Recording schema refresh failed: {str(e)}")
+
+        return runs
+
+    def run_forever(self, poll_interval=30, stop_event=None):
+        """Run ``run_once`` every ``poll_interval`` seconds until ``stop_event`` is set"""
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            try:
+                runs = self.run_once()
+                if runs:
+                    failed = sum(1 for run in runs if run.status == 'failed')
+                    logger.info(f"Refreshed {len(runs)} project schemas ({failed} failed)")
+            except Exception as e:
+                logger.exception(f"Schema refresh cycle failed: {str(e)}")
+            stop_event.wait(poll_interval)
+
+    def refresh_project(self, project):
+        """Refresh one project's schema and record the run"""
+        started_at = timezone.now()
+        started = time.monotonic()
+        status, error_message, snapshot_version = 'success', None, None
+
+        try:
+            self.project_service.get_schema_details(project.project_id, refresh=self.full)
+            snapshot = self.project_service.catalog_repository.get_current_snapshot(project.project_id)
+            snapshot_version = snapshot.version if snapshot is not None else None
+        except Exception as e:
+            status, error_message = 'failed', str(e)
+            logger.warning(f"Schema refresh failed for project {project.project_id}: {error_message}")
+
+        duration_ms = int((time.monotonic() - started) * 1000)
+        try:
+            return SchemaRefreshRun.objects.create(
+                project=project,
+                started_at=started_at,
+                duration_ms=duration_ms,
+                status=status,
+                error_message=error_message,
+                snapshot_version=snapshot_version,
+                next_run_at=started_at + timedelta(seconds=self._next_delay(project))
+            )
+        finally:
+            # Worker threads get their own database connection from Django
+            connection.close()
+
+    def _next_delay(self, project):
+        interval = project.database_metadata.get('schema_refresh_interval', self.interval)
+        return interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    @staticmethod
+    def _database_type(project):
+        return project.database_type.database_type.lower()
@@ -0,0 +1,225 @@
+import base64
+import binascii
+import re
+
+from .relationship_graph import subset_relationships
+
+
+def glob_to_regex(pattern):
+    """Translate a table-name glob (``*`` and ``?``) into an anchored Python regular expression"""
+    parts = []
+    for char in pattern:
+        if char == '*':
+            parts.append('.*')
+        elif char == '?':
+            parts.append('.')
+        else:
+            parts.append(re.escape(char))
+    return '^' + ''.join(parts) + '$'
+
+
+def glob_to_like(pattern, escape='\\'):
+    """Translate a table-name glob (``*`` and ``?``) into a LIKE pattern using ``escape``"""
+    parts = []
+    for char in pattern:
+        if char == '*':
+            parts.append('%')
+        elif char == '?':
+            parts.append('_')
+        elif char in ('%', '_', escape):
+            parts.append(escape + char)
+        else:
+            parts.append(char)
+    return ''.join(parts)
+
+
+class SchemaSelection:
+    """Which tables, and which parts of them, a schema request asks for.
+
+    Tables are selected by include/exclude globs and regular expressions and
+    paged by name, in code point order, with an opaque cursor. ``apply`` does
+    this in memory for schemas that are already cached. The retrievers push
+    the globs (as LIKE patterns), ``after`` and ``pushdown_limit`` down into
+    their catalog queries, comparing and ordering names with a binary
+    collation, and run ``select`` on the names read. Regular expressions are
+    only ever evaluated by Python's ``re``, since every warehouse has its own
+    dialect, so both paths select the same tables.
+    """
+
+    def __init__(self, include=None, exclude=None, samples=True, max_sample_rows=None,
+                 fields=None, limit=None, cursor=None, include_globs=None, exclude_globs=None):
+        """
+        Args:
+            include: List of regular expressions, a table must match one of them
+                or one of ``include_globs``
+            exclude: List of regular expressions, a table must match none of them
+            samples: Whether sample rows are wanted
+            max_sample_rows: Optional number of sample rows per table
+            fields: Optional list of table keys to return, e.g. ['columns']
+            limit: Optional page size in tables
+            cursor: Cursor returned with the previous page
+            include_globs: List of globs, a table must match one of them or one
+                of ``include``
+            exclude_globs: List of globs, a table must match none of them
+        """
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+        self.include_globs = list(include_globs or [])
+        self.exclude_globs = list(exclude_globs or [])
+        self.fields = list(fields) if fields is not None else None
+        self.samples = samples and (self.fields is None or 'sample_rows' in self.fields)
+        self.max_sample_rows = max_sample_rows
+        self.limit = limit
+        self.after = self.decode_cursor(cursor) if cursor else None
+
+        for pattern in self.include + self.exclude:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                raise ValueError(f"Invalid table pattern '{pattern}': {str(e)}")
+        self._include = [re.compile(pattern) for pattern in self.include + list(map(glob_to_regex, self.include_globs))]
+        self._exclude = [re.compile(pattern) for pattern in self.exclude + list(map(glob_to_regex, self.exclude_globs))]
+
+    @classmethod
+    def from_query_params(cls, params):
+        """Build a selection from request query parameters
+
+        Supported parameters: ``include``/``exclude`` (comma-separated globs),
+        ``include_regex``/``exclude_regex`` (repeatable regular expressions),
+        ``samples``, ``max_sample_rows``, ``fields`` (comma-separated), ``limit``
+        and ``cursor``.
+
+        Raises:
+            ValueError: If a parameter is invalid
+        """
+        def globs(name):
+            return [
+                pattern.strip()
+                for value in params.getlist(name)
+                for pattern in value.split(',')
+                if pattern.strip()
+            ]
+
+        def positive_int(name):
+            value = params.get(name)
+            if value in (None, ''):
+                return None
+            try:
+                number = int(value)
+            except ValueError:
+                raise ValueError(f"'{name}' must be an integer")
+            if number < 1:
+                raise ValueError(f"'{name}' must be positive")
+            return number
+
+        fields = params.get('fields')
+        return cls(
+            include=params.getlist('include_regex'),
+            exclude=params.getlist('exclude_regex'),
+            include_globs=globs('include'),
+            exclude_globs=globs('exclude'),
+            samples=params.get('samples', 'true').lower() != 'false',
+            max_sample_rows=positive_int('max_sample_rows'),
+            fields=[field.strip() for field in fields.split(',') if field.strip()] if fields is not None else None,
+            limit=positive_int('limit'),
+            cursor=params.get('cursor')
+        )
+
+    @property
+    def is_everything(self):
+        """True when the selection asks for the full schema as stored in the cache"""
+        return (
+            not self._include and not self._exclude and self.samples and self.max_sample_rows is None
+            and self.fields is None and self.limit is None and self.after is None
+        )
+
+    @property
+    def fetch_limit(self):
+        """Number of tables to select: one more than a page, to detect the next page"""
+        return self.limit + 1 if self.limit is not None else None
+
+    @property
+    def pushdown_limit(self):
+        """``fetch_limit`` when a catalog query can apply it, None when regular expressions filter afterwards"""
+        return None if self.include or self.exclude else self.fetch_limit
+
+    def include_like(self, escape='\\'):
+        """LIKE patterns a table must match one of, or None when the include filter cannot be pushed down"""
+        if not self.include_globs or self.include:
+            return None
+        return [glob_to_like(pattern, escape) for pattern in self.include_globs]
+
+    def exclude_like(self, escape='\\'):
+        """LIKE patterns a table must match none of, or None"""
+        return [glob_to_like(pattern, escape) for pattern in self.exclude_globs] or None
+
+    def matches(self, table_name):
+        if self.after is not None and table_name <= self.after:
+            return False
+        if self._include and not any(pattern.search(table_name) for pattern in self._include):
+            return False
+        return not any(pattern.search(table_name) for pattern in self._exclude)
+
+    def select(self, table_names):
+        """The names of ``table_names``, in the order given, this selection reads"""
+        selected = [table_name for table_name in table_names if self.matches(table_name)]
+        return selected[:self.fetch_limit] if self.fetch_limit is not None else selected
+
+    def apply(self, schema_info):
+        """Select tables of an already loaded schema, in name order"""
+        tables = {}
+        for table_name in sorted(schema_info['tables']):
+            if not self.matches(table_name):
+                continue
+            table_info = dict(schema_info['tables'][table_name])
+            sample_rows = table_info.get('sample_rows')
+            if not self.samples:
+                table_info.pop('sample_rows', None)
+            elif self.max_sample_rows is not None and sample_rows is not None and not isinstance(sample_rows, str):
+                # Lists and Arrow RecordBatches both support slicing
+                table_info['sample_rows'] = sample_rows[:self.max_sample_rows]
+            tables[table_name] = table_info
+            if self.fetch_limit is not None and len(tables) >= self.fetch_limit:
+                break
+        return {**schema_info, 'tables': tables}
+
+    def page(self, schema_info):
+        """Trim a selected schema to one page and project its fields
+
+        ``relationships`` are reduced to the keys of the page's tables and the
+        foreign keys referencing or referenced by them.
+
+        Returns:
+            Tuple of the schema and the cursor of the next page (None on the last page)
+        """
+        names = list(schema_info['tables'])
+        next_cursor = None
+        if self.limit is not None and len(names) > self.limit:
+            names = names[:self.limit]
+            next_cursor = self.encode_cursor(names[-1])
+
+        tables = {}
+        for table_name in names:
+            table_info = schema_info['tables'][table_name]
+            if self.fields is not None:
+                table_info = {key: value for key, value in table_info.items() if key in self.fields}
+            tables[table_name] = table_info
+
+        schema_info = {**schema_info, 'tables': tables}
+        if schema_info.get('relationships') is not None:
+            schema_info['relationships'] = subset_relationships(schema_info['relationships'], tables)
+        return schema_info, next_cursor
+
+    @staticmethod
+    def encode_cursor(table_name):
+        return base64.urlsafe_b64encode(table_name.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            table_name = base64.b64decode(cursor.encode(), altchars=b'-_', validate=True).decode()
+        except (binascii.Error, UnicodeDecodeError):
+            raise ValueError("Invalid cursor")
+        if not table_name:
+            raise ValueError("Invalid cursor")
+        return table_name
@@ -1,3 +1,584 @@
-from django.test import TestCase
+import threading
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import pyarrow as pa
+from django.db import connection
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from project_management.src.repo.models import (
+    CatalogColumn, CatalogTable, DatabaseConfiguration, ProjectMetadata, SchemaSnapshot
+)
+from project_management.src.repo.repository import SchemaCatalogRepository
+from project_management.src.service.column_profile import build_profile_query, parse_profile_row
+from project_management.src.service.connection_manager import ConnectionManager
+from project_management.src.api.renderers import ArrowStreamRenderer
+from project_management.src.service.project_service import ProjectService
+from project_management.src.service.relationship_graph import build_relationship_graph, join_path
+from project_management.src.service.sample_data import rows_to_record_batch, sample_rows_to_json
+from project_management.src.service.sample_fetcher import SampleFetcher
+from project_management.src.service.schema_cache import SchemaCache
+from project_management.src.service.schema_refresh_scheduler import SchemaRefreshScheduler
+from project_management.src.service.schema_selection import SchemaSelection
+
+
+class SchemaCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.loads = 0
+        self.fingerprint = 'v1'
+
+    def load(self, previous):
+        self.loads += 1
+        self.previous = previous
+        return {'tables': {'orders': {}}, 'load': self.loads}
+
+    def get(self, cache, refresh=False, metadata_key='key'):
+        return cache.get_or_load(1, metadata_key, self.load, lambda: self.fingerprint, refresh=refresh)
+
+    def test_repeat_loads_are_served_from_cache(self):
+        cache = SchemaCache(recheck_interval=0)
+        self.get(cache)
+        schema = self.get(cache)
+        self.assertEqual(self.loads, 1)
+        self.assertEqual(schema['load'], 1)
+
+    def test_fingerprint_change_reloads(self):
+        cache = SchemaCache(recheck_interval=0)
+        self.get(cache)
+        self.fingerprint = 'v2'
+        self.assertEqual(self.get(cache)['load'], 2)
+        self.assertEqual(self.previous['load'], 1)
+
+    def test_refresh_and_metadata_change_bypass_cache(self):
+        cache = SchemaCache()
+        self.get(cache)
+        self.get(cache, refresh=True)
+        self.assertIsNone(self.previous)
+        self.get(cache, metadata_key='other')
+        self.assertIsNone(self.previous)
+        self.assertEqual(self.loads, 3)
+
+    def test_least_recently_used_project_is_evicted(self):
+        cache = SchemaCache(max_entries=2)
+        for project_id in (1, 2, 1, 3):
+            cache.get_or_load(project_id, 'key', self.load, lambda: 'v1')
+        self.assertEqual(list(cache._entries), [1, 3])
+
+
+class SampleFetcherTests(SimpleTestCase):
+    def test_slow_and_failing_tables_get_error_entries(self):
+        release = threading.Event()
+        closed = []
+
+        def fetch(conn, table):
+            if table == 'slow':
+                release.wait(5)
+            if table == 'broken':
+                raise RuntimeError('permission denied')
+            return [{'table': table}]
+
+        fetcher = SampleFetcher(connect=object, fetch=fetch, close=closed.append, max_workers=2, timeout=0.2)
+        started = time.monotonic()
+        samples = fetcher.fetch_all(['a', 'slow', 'broken', 'b'])
+        release.set()
+
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(list(samples), ['a', 'slow', 'broken', 'b'])
+        self.assertEqual(samples['a'], [{'table': 'a'}])
+        self.assertIn('timed out', samples['slow'])
+        self.assertIn('permission denied', samples['broken'])
+        self.assertGreaterEqual(len(closed), 1)
+
+
+class FakeClient:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionManagerTests(SimpleTestCase):
+    metadata = {'project': 'demo', 'dataset': 'analytics'}
+
+    def acquire(self, manager, project_id=1, metadata=None):
+        return manager.acquire(project_id, 'bigquery', metadata or self.metadata, FakeClient)
+
+    def test_released_connections_are_reused(self):
+        manager = ConnectionManager()
+        conn = self.acquire(manager)
+        manager.release(conn)
+        self.assertIs(self.acquire(manager), conn)
+        self.assertIsNot(self.acquire(manager, metadata={'project': 'other'}), conn)
+
+    def test_invalidate_closes_idle_and_in_use_connections(self):
+        manager = ConnectionManager()
+        idle, busy = self.acquire(manager), self.acquire(manager)
+        manager.release(idle)
+        manager.invalidate(1)
+        self.assertTrue(idle.closed)
+        manager.release(busy)
+        self.assertTrue(busy.closed)
+        self.assertIsNot(self.acquire(manager), busy)
+
+    def test_idle_connections_are_evicted(self):
+        manager = ConnectionManager(idle_timeout=0)
+        conn = self.acquire(manager)
+        manager.release(conn)
+        time.sleep(0.01)
+        self.assertEqual(manager.evict_idle(), 1)
+        self.assertTrue(conn.closed)
+
+    def test_idle_connections_are_evicted_in_the_background(self):
+        manager = ConnectionManager(idle_timeout=0, eviction_interval=0.01)
+        conn = self.acquire(manager)
+        manager.release(conn)
+        for _ in range(100):
+            if conn.closed:
+                break
+            time.sleep(0.01)
+        self.assertTrue(conn.closed)
+
+    def test_changed_connection_settings_close_pooled_connections(self):
+        before = SimpleNamespace(database_type_id='postgres', database_metadata={'host': 'a'})
+        after = SimpleNamespace(database_type_id='postgres', database_metadata={'host': 'b'})
+        repository = mock.Mock(**{'get_project_by_id.side_effect': [before, after]})
+        service = ProjectService(project_repository=repository)
+        service.connection_manager = mock.Mock()
+
+        service.update_project({'database_metadata': {'host': 'b'}}, 1)
+        service.connection_manager.invalidate.assert_called_once_with(1)
+
+
+class IncrementalSchemaRefreshTests(SimpleTestCase):
+    def setUp(self):
+        self.service = ProjectService(project_repository=None)
+        self.markers = {'customers': '1', 'orders': '1', 'payments': '1'}
+        self.requested = []
+        self.service.table_marker_readers['postgres'] = lambda db_metadata, project_id: dict(self.markers)
+        self.service.relationship_readers['postgres'] = lambda db_metadata, project_id: {
+            'primary_keys': {}, 'foreign_keys': []
+        }
+        self.service.schema_retrievers['postgres'] = self.retrieve
+
+    def retrieve(self, db_metadata, project_id=None, tables=None, on_table=None):
+        self.requested.append(tables)
+        names = tables if tables is not None else list(self.markers)
+        schema = {
+            'schema': 'public',
+            'tables': {name: {'columns': [], 'marker': self.markers[name]} for name in names}
+        }
+        for name, table_info in schema['tables'].items():
+            if on_table is not None:
+                on_table(name, table_info)
+        return schema
+
+    def test_only_changed_and_new_tables_are_reintrospected(self):
+        previous = self.service._load_schema_snapshot('postgres', {}, 1)
+        self.markers = {'customers': '1', 'orders': '2', 'refunds': '1'}
+
+        snapshot = self.service._load_schema_snapshot('postgres', {}, 1, previous)
+
+        self.assertEqual(self.requested, [None, ['orders', 'refunds']])
+        self.assertEqual(list(snapshot['schema']['tables']), ['customers', 'orders', 'refunds'])
+        self.assertEqual(snapshot['schema']['tables']['orders']['marker'], '2')
+        self.assertIs(snapshot['schema']['tables']['customers'], previous['schema']['tables']['customers'])
+
+    def test_tables_are_reported_as_soon_as_known(self):
+        previous = self.service._load_schema_snapshot('postgres', {}, 1)
+        self.markers = {'customers': '1', 'orders': '2', 'payments': '1'}
+        seen = []
+
+        self.service._load_schema_snapshot('postgres', {}, 1, previous, on_table=lambda name, info: seen.append(name))
+
+        self.assertEqual(seen, ['customers', 'payments', 'orders'])
+
+    def test_stored_catalog_seeds_incremental_refresh(self):
+        stored = self.service._load_schema_snapshot('postgres', {}, 1)
+        catalog_repository = mock.Mock()
+        catalog_repository.get_current_snapshot.return_value = SimpleNamespace(
+            config_hash=SchemaCache.metadata_key('postgres', {}), table_markers=stored['markers']
+        )
+        catalog_repository.to_schema.return_value = stored['schema']
+        self.service.catalog_repository = catalog_repository
+        self.markers['orders'] = '2'
+
+        self.service._schema_loader('postgres', {}, 1)(None)
+
+        self.assertEqual(self.requested, [None, ['orders']])
+        catalog_repository.save_snapshot.assert_called_once()
+
+    def test_catalog_version_ignores_data_dependent_fields(self):
+        schema = {'tables': {'orders': {'columns': [{'name': 'id', 'type': 'int'}], 'sample_rows': [{'id': 1}],
+                                        'num_rows': 1, 'modified': '2025-01-01'}}}
+        refreshed = {'tables': {'orders': {**schema['tables']['orders'], 'sample_rows': [{'id': 2}],
+                                           'num_rows': 2, 'modified': '2025-01-02'}}}
+        altered = {'tables': {'orders': {**schema['tables']['orders'], 'columns': [{'name': 'id', 'type': 'text'}]}}}
+
+        self.assertEqual(SchemaCatalogRepository.content_hash(schema), SchemaCatalogRepository.content_hash(refreshed))
+        self.assertNotEqual(SchemaCatalogRepository.content_hash(schema), SchemaCatalogRepository.content_hash(altered))
+
+    def test_unchanged_schema_reuses_previous_snapshot(self):
+        previous = self.service._load_schema_snapshot('postgres', {}, 1)
+        snapshot = self.service._load_schema_snapshot('postgres', {}, 1, previous)
+        self.assertEqual(self.requested, [None])
+        self.assertEqual(snapshot['schema'], previous['schema'])
+
+
+@override_settings(SCHEMA_CATALOG_KEEP_VERSIONS=2)
+class SchemaCatalogRepositoryTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # The app has no migrations; the tables are dropped again when the class transaction rolls back
+        with connection.schema_editor() as editor:
+            for model in (DatabaseConfiguration, ProjectMetadata, SchemaSnapshot, CatalogTable, CatalogColumn):
+                editor.create_model(model)
+
+    def setUp(self):
+        DatabaseConfiguration.objects.create(database_type='postgres', config_parameters={})
+        self.project = ProjectMetadata.objects.create(
+            project_name='catalog', database_type_id='postgres', database_metadata={}, tool='dbt', user_id=1
+        )
+        self.repository = SchemaCatalogRepository()
+
+    def schema(self, columns, num_rows=1, sample_rows=None):
+        return {'schema': 'public', 'tables': {
+            'orders': {'columns': [{'name': name, 'type': 'integer'} for name in columns],
+                       'num_rows': num_rows, 'sample_rows': sample_rows or [{'id': 1}]}
+        }}
+
+    def save(self, schema_info):
+        return self.repository.save_snapshot(self.project.project_id, 'postgres', 'config', schema_info)
+
+    def test_versions_volatile_updates_and_pruning(self):
+        first = self.save(self.schema(['id']))
+        self.assertEqual(first.version, 1)
+
+        # Only data changed: same version, table row updated in place
+        same = self.save(self.schema(['id'], num_rows=5, sample_rows=[{'id': 2}]))
+        self.assertEqual(same.snapshot_id, first.snapshot_id)
+        table = CatalogTable.objects.get(snapshot=first)
+        self.assertEqual((table.row_count, table.sample_rows), (5, [{'id': 2}]))
+
+        second = self.save(self.schema(['id', 'total']))
+        third = self.save(self.schema(['id', 'total', 'status']))
+        self.assertEqual((second.version, third.version), (2, 3))
+        self.assertEqual(self.repository.get_current_snapshot(self.project.project_id).version, 3)
+
+        # Only the latest SCHEMA_CATALOG_KEEP_VERSIONS versions are kept, with their tables
+        versions = SchemaSnapshot.objects.filter(project=self.project).values_list('version', flat=True)
+        self.assertEqual(sorted(versions), [2, 3])
+        self.assertFalse(CatalogTable.objects.filter(snapshot_id=first.snapshot_id).exists())
+        self.assertEqual(
+            [column.column_name for column in CatalogTable.objects.get(snapshot=third).columns.all()],
+            ['id', 'total', 'status']
+        )
+
+
+class PostgresColumnsTests(SimpleTestCase):
+    def test_catalog_rows_become_ordered_column_dicts(self):
+        cursor = mock.MagicMock()
+        cursor.fetchall.return_value = [
+            ('empty', None, None, None, None, None, None, None),
+            ('orders', 'id', 'integer', False, "nextval('orders_id_seq'::regclass)", None, 32, 0),
+            ('orders', 'status', 'USER-DEFINED', True, None, None, None, None),
+            ('orders', 'tags', 'ARRAY', True, None, None, None, None),
+            ('orders', 'code', 'character varying', True, None, 20, None, None),
+        ]
+        conn = mock.MagicMock()
+        conn.cursor.return_value.__enter__.return_value = cursor
+
+        columns = ProjectService(project_repository=None)._get_postgres_columns(conn, 'public', tables=['orders'])
+
+        self.assertEqual(columns['empty'], [])
+        self.assertEqual([column['type'] for column in columns['orders']],
+                         ['integer', 'USER-DEFINED', 'ARRAY', 'character varying'])
+        self.assertEqual(columns['orders'][0], {
+            'name': 'id', 'type': 'integer', 'nullable': False, 'default': "nextval('orders_id_seq'::regclass)",
+            'max_length': None, 'precision': 32, 'scale': 0
+        })
+        self.assertEqual(columns['orders'][3]['max_length'], 20)
+        self.assertEqual(cursor.execute.call_args.args[1][:3], ['public', ['orders'], ['orders']])
+
+
+class BigQueryFastPathTests(SimpleTestCase):
+    def catalog_row(self, table, column, data_type, table_type='BASE TABLE'):
+        created = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        return {
+            'table_name': table, 'table_type': table_type, 'column_name': column,
+            'data_type': data_type, 'is_nullable': 'YES', 'description': None,
+            'row_count': 10, 'created': created, 'modified': created
+        }
+
+    def test_catalog_comes_from_one_query_and_samples_from_list_rows(self):
+        client = mock.Mock(project='demo')
+        client.get_dataset.return_value = SimpleNamespace(project='demo', dataset_id='shop', location='EU')
+        catalog_job = mock.Mock()
+        catalog_job.result.return_value = [
+            self.catalog_row('orders', 'id', 'INT64'),
+            self.catalog_row('orders', 'amount', 'NUMERIC(10, 2)'),
+            self.catalog_row('orders_view', 'id', 'INT64', table_type='VIEW'),
+        ]
+        view_job = mock.Mock()
+        view_job.result.return_value.to_arrow.return_value = pa.table({'id': [2]})
+        client.query.side_effect = [catalog_job, view_job]
+        client.list_rows.return_value.to_arrow.return_value = pa.table({'id': [1], 'amount': [9.5]})
+
+        schema = ProjectService(project_repository=None)._read_bigquery_schema(client, {'dataset': 'shop'})
+
+        client.get_table.assert_not_called()
+        client.list_rows.assert_called_once()
+        self.assertEqual(client.list_rows.call_args.args[0], 'demo.shop.orders')
+        self.assertEqual(client.list_rows.call_args.kwargs['max_results'], 3)
+        self.assertEqual(
+            [field.field_type for field in client.list_rows.call_args.kwargs['selected_fields']],
+            ['INTEGER', 'NUMERIC']
+        )
+        self.assertEqual(schema['tables']['orders']['sample_rows'].to_pylist(), [{'id': 1, 'amount': 9.5}])
+        self.assertEqual(schema['tables']['orders_view']['sample_rows'].to_pylist(), [{'id': 2}])
+        self.assertEqual(
+            schema['tables']['orders']['columns'][1],
+            {'name': 'amount', 'type': 'NUMERIC', 'mode': 'NULLABLE', 'description': ''}
+        )
+
+    def test_both_catalog_paths_use_the_legacy_type_names(self):
+        legacy_type = ProjectService._bigquery_legacy_type
+        self.assertEqual(
+            [legacy_type(data_type) for data_type in (
+                'INT64', 'FLOAT64', 'BOOL', 'STRUCT<a INT64, b STRING>', 'ARRAY<STRUCT<a INT64>>', 'ARRAY<INT64>',
+                'NUMERIC(10, 2)', 'STRING(20)', 'TIMESTAMP'
+            )],
+            ['INTEGER', 'FLOAT', 'BOOLEAN', 'RECORD', 'RECORD', 'INTEGER', 'NUMERIC', 'STRING', 'TIMESTAMP']
+        )
+        self.assertEqual([legacy_type(data_type) for data_type in ('INTEGER', 'RECORD')], ['INTEGER', 'RECORD'])
+
+
+class SchemaRefreshSchedulerTests(SimpleTestCase):
+    def test_global_and_per_type_concurrency_limits(self):
+        projects = [
+            SimpleNamespace(project_id=project_id, database_type=SimpleNamespace(database_type=db_type))
+            for project_id, db_type in enumerate(['bigquery'] * 4 + ['postgres'] * 4)
+        ]
+        lock = threading.Lock()
+        active, peaks = {}, {'total': 0, 'bigquery': 0}
+
+        def refresh_project(project):
+            db_type = project.database_type.database_type
+            with lock:
+                active[db_type] = active.get(db_type, 0) + 1
+                peaks['total'] = max(peaks['total'], sum(active.values()))
+                peaks['bigquery'] = max(peaks['bigquery'], active.get('bigquery', 0))
+            time.sleep(0.02)
+            with lock:
+                active[db_type] -= 1
+            return SimpleNamespace(project_id=project.project_id, status='success')
+
+        scheduler = SchemaRefreshScheduler(None, max_concurrency=3, type_limits={'bigquery': 1})
+        with mock.patch.object(scheduler, 'due_projects', return_value=projects), \
+                mock.patch.object(scheduler, 'refresh_project', side_effect=refresh_project):
+            runs = scheduler.run_once()
+
+        self.assertEqual(len(runs), 8)
+        self.assertEqual(peaks['total'], 3)
+        self.assertEqual(peaks['bigquery'], 1)
+
+    def test_limits_below_one_are_rejected(self):
+        with self.assertRaises(ValueError):
+            SchemaRefreshScheduler(None, type_limits={'postgres': 0})
+
+
+class SchemaSelectionTests(SimpleTestCase):
+    schema = {
+        'schema': 'public',
+        'tables': {
+            name: {'columns': [{'name': 'id'}], 'sample_rows': [{'id': 1}, {'id': 2}]}
+            for name in ['orders', 'order_items', 'orders_tmp', 'customers', 'payments']
+        }
+    }
+
+    def select(self, query):
+        return SchemaSelection.from_query_params(QueryDict(query))
+
+    def test_filters_and_cursor_pagination(self):
+        selection = self.select('include=order*,pay?ents&exclude=*_tmp&fields=columns&limit=2')
+        first, cursor = selection.page(selection.apply(self.schema))
+        self.assertEqual(list(first['tables']), ['order_items', 'orders'])
+        self.assertEqual(first['tables']['orders'], {'columns': [{'name': 'id'}]})
+        self.assertFalse(selection.samples)
+
+        selection = self.select(f'include=order*,pay?ents&exclude=*_tmp&limit=2&cursor={cursor}')
+        second, cursor = selection.page(selection.apply(self.schema))
+        self.assertEqual(list(second['tables']), ['payments'])
+        self.assertIsNone(cursor)
+
+    def test_globs_are_pushed_down_as_like(self):
+        selection = self.select('include=ord*,a_b&exclude=*!tmp&max_sample_rows=1&limit=10')
+        conditions, params, limit = ProjectService(project_repository=None)._selection_conditions(
+            selection, "CAST(table_name AS BINARY)"
+        )
+        self.assertEqual(
+            conditions,
+            "AND (CAST(table_name AS BINARY) LIKE %s ESCAPE '!' OR CAST(table_name AS BINARY) LIKE %s ESCAPE '!') "
+            "AND CAST(table_name AS BINARY) NOT LIKE %s ESCAPE '!'"
+        )
+        self.assertEqual(params, ['ord%', 'a!_b', '%!!tmp'])
+        self.assertEqual(limit, 'LIMIT 11')
+        self.assertEqual(selection.apply(self.schema)['tables']['orders']['sample_rows'], [{'id': 1}])
+
+    def test_regular_expressions_are_only_matched_in_python(self):
+        selection = self.select('include=ord*&exclude_regex=_tmp$&limit=1')
+        conditions, params, limit = ProjectService(project_repository=None)._selection_conditions(
+            selection, 'table_name'
+        )
+        self.assertEqual((conditions, params, limit), ("AND (table_name LIKE %s ESCAPE '!')", ['ord%'], ''))
+        # An include regex could match what the include globs do not
+        self.assertIsNone(self.select('include=ord*&include_regex=^pay').include_like())
+
+        # The names a warehouse returns for the pushed-down part, in binary order
+        names = ['Orders', 'order_items', 'orders', 'orders_tmp']
+        self.assertEqual(selection.select(names), ['order_items', 'orders'])
+        self.assertEqual(list(selection.apply({'tables': dict.fromkeys(names, {})})['tables']),
+                         selection.select(sorted(names)))
+
+    def test_invalid_parameters_are_rejected(self):
+        for query in ('limit=0', 'include_regex=(', 'cursor=%%%'):
+            with self.assertRaises(ValueError):
+                self.select(query)
+
+
+class SampleDataTests(SimpleTestCase):
+    def test_sample_queries_quote_the_table(self):
+        service = ProjectService(project_repository=None)
+        conn = mock.MagicMock()
+        cursor = conn.cursor.return_value.__enter__.return_value
+        cursor.description, cursor.column_names, cursor.fetchall.return_value = [], [], []
+
+        service._fetch_snowflake_sample(conn, 'odd"name', 2)
+        service._fetch_mysql_sample(conn, 'odd`name', 2)
+
+        self.assertEqual([call.args[0] for call in cursor.execute.call_args_list], [
+            'SELECT * FROM "odd""name" LIMIT 2',
+            'SELECT * FROM `odd``name` LIMIT 2',
+        ])
+
+    def test_samples_keep_types_and_round_trip_through_arrow_ipc(self):
+        created = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        batch = rows_to_record_batch(
+            ['id', 'amount', 'created', 'payload', 'mixed'],
+            [(1, Decimal('9.50'), created, memoryview(b'ab'), 1), (2, None, None, None, 'x')]
+        )
+        self.assertEqual(batch.schema.field('amount').type, pa.decimal128(3, 2))
+        self.assertEqual(batch.schema.field('mixed').type, pa.string())
+        self.assertEqual(sample_rows_to_json(batch)[0]['created'], created.isoformat())
+
+        body = ArrowStreamRenderer().render({
+            'project_id': 1,
+            'schema': {'schema': 'public', 'tables': {
+                'orders': {'columns': [{'name': 'id'}], 'sample_rows': batch},
+                'broken': {'columns': [], 'sample_rows': 'Failed to retrieve sample data: denied'}
+            }}
+        })
+        tables = pa.ipc.open_stream(body).read_all().to_pylist()
+        self.assertEqual([table['table_name'] for table in tables], ['orders', 'broken'])
+        self.assertEqual(pa.ipc.open_stream(tables[0]['sample_rows']).read_next_batch(), batch)
+        self.assertIn('denied', tables[1]['sample_error'])
+
+
+class ColumnProfileTests(SimpleTestCase):
+    columns = [
+        {'name': 'id', 'type': 'integer'},
+        {'name': 'active', 'type': 'boolean'},
+        {'name': 'payload', 'type': 'jsonb'},
+    ]
+
+    def test_one_aggregate_query_per_table(self):
+        query, plan = build_profile_query(
+            '"public"."orders"', self.columns, quote=lambda name: f'"{name}"', distinct='APPROX_COUNT_DISTINCT({})'
+        )
+        self.assertEqual(
+            query,
+            'SELECT COUNT(*), COUNT("id"), APPROX_COUNT_DISTINCT("id"), MIN("id"), MAX("id"), '
+            'COUNT("active"), APPROX_COUNT_DISTINCT("active"), COUNT("payload") FROM "public"."orders"'
+        )
+        profile = parse_profile_row(plan, [4, 4, 4, 1, 9, 2, 2, 0], approximate_distinct=True)
+        self.assertEqual(profile['row_count'], 4)
+        self.assertEqual(profile['columns']['id'], {'null_fraction': 0, 'distinct_count': 4, 'min': 1, 'max': 9})
+        self.assertEqual(profile['columns']['active']['null_fraction'], 0.5)
+        self.assertIsNone(profile['columns']['payload']['distinct_count'])
+
+    def test_profiles_are_cached_with_the_snapshot(self):
+        service = ProjectService(project_repository=None)
+        profiler = mock.Mock(return_value={'orders': {'row_count': 4, 'columns': {}}})
+        service.table_profilers['postgres'] = profiler
+        snapshot = {'schema': {'tables': {'orders': {'columns': self.columns}}}, 'markers': None}
+
+        for _ in range(2):
+            schema = service._attach_profiles('postgres', {}, 1, snapshot, snapshot['schema'])
+
+        profiler.assert_called_once()
+        self.assertEqual(schema['tables']['orders']['profile']['row_count'], 4)
+
+    def test_selection_profiles_only_its_tables_without_loading_the_full_schema(self):
+        service = ProjectService(project_repository=None)
+        project = SimpleNamespace(database_type=SimpleNamespace(database_type='postgres'), database_metadata={})
+        profiler = mock.Mock(side_effect=lambda db_metadata, project_id, tables: {
+            table: {'row_count': 4, 'columns': {}} for table in tables
+        })
+        service.table_profilers['postgres'] = profiler
+        service.schema_retrievers['postgres'] = mock.Mock(return_value={
+            'tables': {'orders': {'columns': self.columns}}
+        })
+        selection = SchemaSelection.from_query_params(QueryDict('include=orders&fields=columns'))
+
+        with mock.patch('project_management.src.service.project_service.ProjectMetadata') as model, \
+                mock.patch.object(service, '_read_relationships', return_value=None), \
+                mock.patch.object(service, '_get_snapshot') as full_snapshot:
+            model.objects.get.return_value = project
+            for _ in range(2):
+                details = service.get_schema_details(1, selection=selection, profile=True)
+
+        full_snapshot.assert_not_called()
+        profiler.assert_called_once()
+        self.assertEqual(list(profiler.call_args.args[2]), ['orders'])
+        self.assertEqual(details['schema']['tables']['orders']['profile']['row_count'], 4)
+
+
+class RelationshipGraphTests(SimpleTestCase):
+    rows = [
+        ('customers_pkey', 'p', 'customers', 'id', None, None),
+        ('order_items_order_fkey', 'f', 'order_items', 'order_id', 'orders', 'id'),
+        ('order_items_product_fkey', 'f', 'order_items', 'product_id', 'products', 'id'),
+        ('orders_customer_fkey', 'f', 'orders', 'customer_id', 'customers', 'id'),
+        ('orders_pkey', 'p', 'orders', 'id', None, None),
+    ]
+
+    def test_key_rows_are_grouped_into_relationships(self):
+        relationships = ProjectService._relationships_from_rows(self.rows)
+        self.assertEqual(relationships['primary_keys'], {'customers': ['id'], 'orders': ['id']})
+        self.assertEqual(relationships['foreign_keys'][2], {
+            'name': 'orders_customer_fkey',
+            'table': 'orders',
+            'columns': ['customer_id'],
+            'referenced_table': 'customers',
+            'referenced_columns': ['id']
+        })
+
+    def test_join_path_goes_through_intermediate_tables(self):
+        graph = build_relationship_graph(
+            ProjectService._relationships_from_rows(self.rows), tables=['customers', 'audit_log']
+        )
+
+        path = join_path(graph, ['customers', 'products', 'missing'])
+
+        self.assertEqual(path['tables'], ['customers', 'order_items', 'orders', 'products'])
+        self.assertEqual(
+            [key['name'] for key in path['foreign_keys']],
+            ['order_items_order_fkey', 'order_items_product_fkey', 'orders_customer_fkey']
+        )
+        self.assertEqual(path['unknown_tables'], ['missing'])
+        self.assertEqual(join_path(graph, ['customers', 'audit_log'])['foreign_keys'], [])
@@ -1,14 +1,42 @@
 from django.contrib import admin
-from django.utils.html import format_html
-from .src.repo.models import GeneratedQuery,LLMModel
+from django.db import transaction
+from django.utils.html import format_html, format_html_join
+from .src.repo.models import GeneratedQuery, GenerationCacheEntry, HedgedGeneration, LLMCallMetric, LLMModel
+from .src.service.llm_registry import llm_registry
+from .src.service.telemetry import get_llm_metrics
 
 @admin.register(GeneratedQuery)
 class GeneratedQueryAdmin(admin.ModelAdmin):
-    list_display = ('query_id', 'llm_provider', 'status', 'is_valid', 'created_at')
+    list_display = ('query_id', 'llm_provider', 'status', 'is_valid', 'cache_hit', 'created_at')
     search_fields = ('raw_query', 'prepared_prompt')
-    list_filter = ('llm_provider', 'status', 'is_valid')
+    list_filter = ('llm_provider', 'status', 'is_valid', 'cache_hit')
 
 
+@admin.register(GenerationCacheEntry)
+class GenerationCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ('normalized_prompt', 'model_code', 'temperature', 'hit_count', 'created_at', 'last_used_at')
+    search_fields = ('normalized_prompt', 'generated_query')
+    list_filter = ('model_code',)
+    readonly_fields = ('cache_key', 'schema_hash', 'created_at', 'last_used_at')
+
+
+@admin.register(HedgedGeneration)
+class HedgedGenerationAdmin(admin.ModelAdmin):
+    list_display = (
+        'primary_model', 'hedge_model', 'threshold_ms', 'primary_outcome', 'primary_latency_ms',
+        'hedge_outcome', 'hedge_latency_ms', 'winner', 'created_at'
+    )
+    list_filter = ('primary_model', 'winner', 'primary_outcome', 'hedge_outcome')
+
+
+@admin.register(LLMCallMetric)
+class LLMCallMetricAdmin(admin.ModelAdmin):
+    list_display = (
+        'model_code', 'call_time_ms', 'time_to_first_token_ms', 'prompt_tokens', 'completion_tokens',
+        'retries', 'succeeded', 'created_at'
+    )
+    list_filter = ('model_code', 'provider', 'succeeded')
+    search_fields = ('error',)
 
 
 @admin.register(LLMModel)
@@ -22,12 +50,13 @@ class LLMModelAdmin(admin.ModelAdmin):
         'is_active',
         'is_default',
         'status_badge',
+        'latency',
         'created_at'
     )
     list_filter = ('provider', 'model_type', 'is_active')
     search_fields = ('name', 'model_code', 'api_model_name')
     list_editable = ('is_active', 'is_default')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at', 'telemetry')
     fieldsets = (
         ('Basic Information', {
             'fields': (
@@ -57,6 +86,11 @@ class LLMModelAdmin(admin.ModelAdmin):
                 'default_top_p'
             )
         }),
+        ('Telemetry', {
+            'fields': (
+                'telemetry',
+            )
+        }),
         ('Metadata', {
             'fields': (
                 'notes',
@@ -67,6 +101,14 @@ class LLMModelAdmin(admin.ModelAdmin):
     )
     actions = ['activate_models', 'deactivate_models']
 
+    def get_changelist_instance(self, request):
+        changelist = super().get_changelist_instance(request)
+        # One telemetry summary for the page instead of one per row
+        metrics = get_llm_metrics()
+        for obj in changelist.result_list:
+            obj.call_metrics = metrics.get(obj.model_code)
+        return changelist
+
     def provider_badge(self, obj):
         colors = {
             'groq': 'blue',
@@ -115,14 +157,62 @@ class LLMModelAdmin(admin.ModelAdmin):
         )
     status_badge.short_description = "Status"
 
+    def latency(self, obj):
+        metrics = obj.call_metrics if hasattr(obj, 'call_metrics') else get_llm_metrics().get(obj.model_code)
+        if not metrics:
+            return "-"
+        call_time = metrics['call_time_ms']
+        return format_html(
+            "{} / {} / {} ms<br><small>{} calls, {}% errors</small>",
+            call_time['p50'], call_time['p95'], call_time['p99'],
+            metrics['calls'], round(metrics['error_rate'] * 100, 1)
+        )
+    latency.short_description = "Latency p50 / p95 / p99"
+
+    def telemetry(self, obj):
+        metrics = get_llm_metrics().get(obj.model_code)
+        if not metrics:
+            return "No calls recorded"
+        rows = [
+            (label, metrics[key]) for label, key in (
+                ("Call time (ms)", 'call_time_ms'),
+                ("Time to first token (ms)", 'time_to_first_token_ms'),
+                ("Prompt tokens", 'prompt_tokens'),
+                ("Completion tokens", 'completion_tokens'),
+                ("Completion tokens/s", 'completion_tokens_per_second'),
+            )
+        ]
+        return format_html(
+            "<table><tr><th></th><th>p50</th><th>p95</th><th>p99</th></tr>{}</table>"
+            "{} calls, {} errors, {} retries",
+            format_html_join(
+                '', "<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>",
+                ((label, values['p50'], values['p95'], values['p99']) for label, values in rows)
+            ),
+            metrics['calls'], metrics['errors'], metrics['retries']
+        )
+    telemetry.short_description = "Latency and tokens"
+
     def activate_models(self, request, queryset):
         updated = queryset.update(is_active=True)
+        transaction.on_commit(llm_registry.invalidate)
         self.message_user(request, f"Activated {updated} models")
 
     def deactivate_models(self, request, queryset):
         updated = queryset.update(is_active=False)
+        transaction.on_commit(llm_registry.invalidate)
         self.message_user(request, f"Deactivated {updated} models")
 
+    # Cached models and clients are dropped once the change is committed
     def save_model(self, request, obj, form, change):
         super().save_model(request, obj, form, change)
+        transaction.on_commit(llm_registry.invalidate)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        transaction.on_commit(llm_registry.invalidate)
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        transaction.on_commit(llm_registry.invalidate)
 
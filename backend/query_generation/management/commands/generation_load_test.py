@@ -0,0 +1,165 @@
+import asyncio
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from query_generation.src.repo.models import LLMModel
+from query_generation.src.service.llm_registry import llm_registry
+
+SCHEMA = {
+    'database_type': 'postgres',
+    'schema': {
+        'tables': {
+            'customers': {'columns': [{'name': 'id', 'type': 'integer'}, {'name': 'name', 'type': 'text'}]},
+            'orders': {'columns': [{'name': 'id', 'type': 'integer'}, {'name': 'customer_id', 'type': 'integer'},
+                                   {'name': 'total', 'type': 'numeric'}]}
+        }
+    }
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare how many concurrent POST /query/generate/ requests a threaded WSGI worker and a single ASGI "
+        "event loop sustain, offline against the stub LLM provider. Requests go through Django's request "
+        "handlers, middleware and the DRF view, and every query is saved and validated in the given project. "
+        "The model must be answered by the stub: its provider is in LLM_STUB_PROVIDERS, or LLM_STUB_ALL=1 is "
+        "set. The stub's latency and speed come from the LLM_STUB_* settings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, required=True, help="Project the generated queries are saved in")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per run")
+        parser.add_argument('--threads', type=int, default=16, help="Worker threads of the WSGI run")
+        parser.add_argument('--model', help="Name of the LLMModel to use; by default the first active model "
+                                            "answered by the stub")
+
+    def handle(self, *args, **options):
+        requests, threads = options['requests'], options['threads']
+        llmmodel = self._stub_model(options['model'])
+        path = reverse('generate-query')
+        bodies = [self._body(index, llmmodel.name, options['project']) for index in range(requests)]
+
+        wsgi_seconds, wsgi_failed = self._run_wsgi(path, bodies, threads)
+        asgi_seconds, asgi_failed = asyncio.run(self._run_asgi(path, bodies))
+
+        self.stdout.write(
+            f"{requests} requests with {llmmodel.name}, "
+            f"stub latency {getattr(settings, 'LLM_STUB_LATENCY_MS', 300)} ms"
+        )
+        self._report(f"WSGI, {threads} threads", requests, wsgi_seconds, wsgi_failed)
+        self._report("ASGI, one event loop", requests, asgi_seconds, asgi_failed)
+        self.stdout.write(self.style.SUCCESS(f"Speed-up: {wsgi_seconds / asgi_seconds:.1f}x"))
+
+    @staticmethod
+    def _stub_model(name):
+        if name:
+            try:
+                llmmodel = llm_registry.get_model(name)
+            except LLMModel.DoesNotExist:
+                raise CommandError(f"No LLM model named '{name}'")
+            if not llm_registry.uses_stub(llmmodel):
+                raise CommandError(
+                    f"'{name}' is a {llmmodel.provider} model, which would call the provider: "
+                    f"set LLM_STUB_ALL=1 or pick a model of one of {list(getattr(settings, 'LLM_STUB_PROVIDERS', []))}"
+                )
+            return llmmodel
+
+        for llmmodel in llm_registry.get_active_models():
+            if llm_registry.uses_stub(llmmodel):
+                return llmmodel
+        raise CommandError(
+            "No active model is answered by the stub: add one whose provider is in LLM_STUB_PROVIDERS "
+            "or set LLM_STUB_ALL=1"
+        )
+
+    @staticmethod
+    def _body(index, model, project_id):
+        return json.dumps({
+            'user_requirements': f"orders of customer {index}",
+            'dataset_metadata': SCHEMA,
+            'llm_provider': model,
+            'project_id': project_id,
+            'use_cache': False
+        }).encode()
+
+    def _run_wsgi(self, path, bodies, threads):
+        handler = WSGIHandler()
+
+        def post(body):
+            statuses = []
+            environ = {
+                'REQUEST_METHOD': 'POST',
+                'PATH_INFO': path,
+                'SERVER_NAME': 'localhost',
+                'SERVER_PORT': '80',
+                'CONTENT_TYPE': 'application/json',
+                'CONTENT_LENGTH': str(len(body)),
+                'wsgi.input': io.BytesIO(body),
+                'wsgi.url_scheme': 'http',
+            }
+            response = handler(environ, lambda status, headers: statuses.append(status))
+            b''.join(response)
+            response.close()
+            return int(statuses[0].split()[0])
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            codes = list(executor.map(post, bodies))
+        return time.perf_counter() - start, self._failed(codes)
+
+    async def _run_asgi(self, path, bodies):
+        handler = ASGIHandler()
+
+        async def post(body):
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': '1.1',
+                'method': 'POST',
+                'scheme': 'http',
+                'path': path,
+                'query_string': b'',
+                'headers': [(b'host', b'localhost'), (b'content-type', b'application/json'),
+                            (b'content-length', str(len(body)).encode())],
+                'server': ('localhost', 80),
+            }
+            messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+            disconnected = asyncio.Event()
+            statuses = []
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                # The client stays connected until the response is sent
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+
+            await handler(scope, receive, send)
+            disconnected.set()
+            return statuses[0]
+
+        start = time.perf_counter()
+        codes = await asyncio.gather(*(post(body) for body in bodies))
+        return time.perf_counter() - start, self._failed(codes)
+
+    @staticmethod
+    def _failed(codes):
+        return sum(code != 201 for code in codes)
+
+    def _report(self, label, requests, seconds, failed):
+        line = f"  {label}: {seconds:.2f}s, {requests / seconds:.1f} requests/s"
+        if failed:
+            line += f", {failed} failed"
+        self.stdout.write(line)
@@ -1,11 +1,42 @@
+from django.conf import settings
 from rest_framework import serializers
 
+from ..repo.models import LLMModel
+from ..service.model_router import ModelRouter
 
-class GenerateQuerySerializer(serializers.Serializer):
+
+MODEL_CLASS_CHOICES = [model_type for model_type, _ in LLMModel.MODEL_TYPE_CHOICES] + [ModelRouter.ANY]
+
+
+class ModelChoiceMixin:
+    """``llm_provider`` names a model; ``model_class`` lets the router pick one instead"""
+
+    def validate(self, attrs):
+        if not attrs.get('llm_provider') and not attrs.get('model_class'):
+            raise serializers.ValidationError("Either llm_provider or model_class is required")
+        return attrs
+
+
+class GenerateQuerySerializer(ModelChoiceMixin, serializers.Serializer):
     user_requirements = serializers.CharField()
     dataset_metadata = serializers.JSONField()
-    llm_provider = serializers.CharField()
+    llm_provider = serializers.CharField(required=False)
+    model_class = serializers.ChoiceField(choices=MODEL_CLASS_CHOICES, required=False)
+    project_id = serializers.IntegerField()
+    use_cache = serializers.BooleanField(required=False, default=True)
+    hedge = serializers.BooleanField(required=False, default=False)
+
+class GenerateQueryBatchSerializer(ModelChoiceMixin, serializers.Serializer):
+    prompts = serializers.ListField(
+        child=serializers.CharField(),
+        allow_empty=False,
+        max_length=getattr(settings, 'QUERY_BATCH_MAX_PROMPTS', 100)
+    )
+    dataset_metadata = serializers.JSONField()
+    llm_provider = serializers.CharField(required=False)
+    model_class = serializers.ChoiceField(choices=MODEL_CLASS_CHOICES, required=False)
     project_id = serializers.IntegerField()
+    use_cache = serializers.BooleanField(required=False, default=True)
 
 class GeneratedQueryResponseSerializer(serializers.Serializer):
     generated_query = serializers.CharField()
@@ -17,4 +48,5 @@ class GeneratedQueryResponseSerializer(serializers.Serializer):
     llm_provider = serializers.CharField()
     generation_time = serializers.CharField()
     status = serializers.CharField()
-    query_id = serializers.IntegerField()
\ No newline at end of file
+    query_id = serializers.IntegerField()
+    cache_hit = serializers.BooleanField(default=False)
\ No newline at end of file
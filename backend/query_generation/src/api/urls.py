@@ -1,7 +1,10 @@
 from django.urls import path
-from .views import generate_query
+from .views import generate_query, generate_query_batch, llm_metrics, stream_generate_query
 
 urlpatterns = [
     path('query/generate/', generate_query, name='generate-query'),
+    path('query/generate/stream/', stream_generate_query, name='stream-generate-query'),
+    path('query/generate/batch/', generate_query_batch, name='generate-query-batch'),
+    path('query/metrics/', llm_metrics, name='llm-metrics'),
 
 ]
\ No newline at end of file
@@ -1,25 +1,48 @@
+import json
+import logging
+
+from adrf.decorators import api_view as async_api_view
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connection
+from django.http import StreamingHttpResponse
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from .serializers import GenerateQuerySerializer, GeneratedQueryResponseSerializer
+from rest_framework.utils.encoders import JSONEncoder
+from .serializers import GenerateQueryBatchSerializer, GenerateQuerySerializer, GeneratedQueryResponseSerializer
 from ..service.generation_service import QueryGenerationService
 from ..service.validation_service import QueryValidationService
+from ..repo.models import LLMModel
 from ..repo.repository import GenerationRepository
+from ..service.telemetry import get_llm_metrics
 import time
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
 
-@api_view(['POST'])
-def generate_query(request):
+
+@async_api_view(['POST'])
+async def generate_query(request):
     """
     API endpoint for generating SQL queries from natural language prompts.
 
+    Async end to end, so an in-flight LLM call does not hold a worker thread
+    under ASGI; adrf runs DRF's authentication, throttling and content
+    negotiation for it.
+
     Args:
-        request (HttpRequest): Contains:
+        request (Request): Contains:
             - user_requirements (str): Natural language prompt
             - dataset_metadata (dict): Schema/metadata about the dataset
             - llm_provider (str): Which LLM provider to use
+            - model_class (str): Instead of llm_provider, let the router pick the
+              fastest fitting active model of this type ('chat', 'code',
+              'general' or 'any')
             - project_id (int): Associated project ID
+            - use_cache (bool): Optional, set to false to bypass the generation cache
+            - hedge (bool): Optional, race a second model when the requested one is slow
 
     Returns:
         Response: Contains generated query and metadata or error
@@ -30,59 +53,302 @@ def generate_query(request):
 
     try:
         start_time = time.time()
-        data = serializer.validated_data
-        repo = GenerationRepository()
+        data = await _aresolve_model(serializer.validated_data, [serializer.validated_data['user_requirements']])
 
 
-        result = QueryGenerationService.generate_query(
+        generate = QueryGenerationService.agenerate_hedged if data['hedge'] else QueryGenerationService.agenerate_query
+        result = await generate(
             data['user_requirements'],
             data['dataset_metadata'],
-            data['llm_provider']
+            data['llm_provider'],
+            use_cache=data['use_cache']
         )
 
 
         generation_time_ms = int((time.time() - start_time) * 1000)
+        result = await _arecord_generation(data, result, generation_time_ms, request)
 
+        response_serializer = GeneratedQueryResponseSerializer(result)
+        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
 
-        query = repo.save_query_metadata({
-            'raw_query': result['generated_query'],
-            'prepared_prompt': str(result['prepared_prompt']),
-            'llm_provider': data['llm_provider'],
-            'generation_time_ms': generation_time_ms,
-            'project_id': data['project_id']
-        }, request=request)
+    except ValueError as e:
+        return Response(
+            {'detail': f"Database error: {str(e)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    except Exception as e:
+        return Response(
+            {'detail': f"Generation failed: {str(e)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
 
 
-        validation_result = QueryValidationService.validate_query(result['generated_query'])
+@api_view(['POST'])
+def stream_generate_query(request):
+    """
+    Streaming variant of ``generate_query`` as Server-Sent Events.
 
-        updated_query = repo.update_validation_status(
-            query_id=query.query_id,
-            is_valid=validation_result['is_valid']
+    Takes the same body as ``generate_query``. Every chunk of the completion
+    is sent as a ``token`` event as soon as the LLM produces it. Once the
+    completion is complete, the query is extracted, validated and saved, and a
+    ``complete`` event carries the same payload as ``generate_query``,
+    including ``query_id``. Failures after streaming started are sent as an
+    ``error`` event.
+    """
+    serializer = GenerateQuerySerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    start_time = time.time()
+    try:
+        data = _resolve_model(serializer.validated_data, [serializer.validated_data['user_requirements']])
+        events = QueryGenerationService.stream_query(
+            data['user_requirements'],
+            data['dataset_metadata'],
+            data['llm_provider'],
+            use_cache=data['use_cache']
+        )
+    except Exception as e:
+        return Response(
+            {'detail': f"Generation failed: {str(e)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+    is_asgi = isinstance(request._request, ASGIRequest)
 
-        result = {
-            'generated_query': result['generated_query'],
-            'is_valid': validation_result['is_valid'],
-            'validation_errors': validation_result.get('errors', []),
-            'llm_provider': data['llm_provider'],
-            'generation_time': datetime.now().isoformat(),
-            'status': 'success',
-            'query_id': query.query_id
-        }
+    def stream():
+        try:
+            for event in events:
+                if event['type'] == 'token':
+                    yield _sse_event('token', {'text': event['text']})
+                else:
+                    generation_time_ms = int((time.time() - start_time) * 1000)
+                    result = _record_generation(data, event, generation_time_ms, request)
+                    yield _sse_event('complete', GeneratedQueryResponseSerializer(result).data)
+        except Exception as e:
+            logger.exception("Streaming query generation failed")
+            yield _sse_event('error', {'detail': f"Generation failed: {str(e)}"})
+        finally:
+            # Under ASGI the events are produced in a worker thread with its own connection
+            if is_asgi:
+                connection.close()
 
-        response_serializer = GeneratedQueryResponseSerializer(result)
-        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+    response = StreamingHttpResponse(
+        _async_iterator(stream()) if is_asgi else stream(),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
-    except ValueError as e:
+
+@async_api_view(['POST'])
+async def generate_query_batch(request):
+    """
+    Generate one query per prompt for a project, streamed back per item as Server-Sent Events.
+
+    Takes ``prompts`` (list of natural language prompts) instead of
+    ``user_requirements`` and otherwise the same body as ``generate_query``.
+    The prompts share one model lookup and schema index and are generated
+    concurrently within the provider's rate limits. Every query is saved and
+    validated as soon as it is generated and sent as an ``item`` event with
+    the ``generate_query`` payload, or an ``item_error`` event; both carry the
+    prompt's ``index``. A final ``complete`` event carries the counts.
+    """
+    serializer = GenerateQueryBatchSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    prompts = serializer.validated_data['prompts']
+    start_time = time.time()
+    try:
+        data = await _aresolve_model(serializer.validated_data, prompts)
+        results = QueryGenerationService.agenerate_batch(
+            prompts, data['dataset_metadata'], data['llm_provider'], use_cache=data['use_cache']
+        )
+        # Fail the whole request before streaming when the model or schema is unusable
+        first = await anext(results)
+    except Exception as e:
         return Response(
-            {'detail': f"Database error: {str(e)}"},
+            {'detail': f"Generation failed: {str(e)}"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+    async def stream():
+        succeeded = 0
+        try:
+            item = first
+            while item is not None:
+                index, result, error = item
+                if error is None:
+                    try:
+                        item_data = {**data, 'user_requirements': prompts[index]}
+                        generation_time_ms = int((time.time() - start_time) * 1000)
+                        result = await _arecord_generation(item_data, result, generation_time_ms, request)
+                    except Exception as e:
+                        error = f"Database error: {str(e)}"
+                if error is None:
+                    succeeded += 1
+                    yield _sse_event('item', {'index': index, **GeneratedQueryResponseSerializer(result).data})
+                else:
+                    yield _sse_event('item_error', {'index': index, 'detail': error})
+                item = await anext(results, None)
+        except Exception as e:
+            logger.exception("Batch query generation failed")
+            yield _sse_event('error', {'detail': f"Generation failed: {str(e)}"})
+        finally:
+            await results.aclose()
+
+        yield _sse_event('complete', {
+            'total': len(prompts),
+            'succeeded': succeeded,
+            'failed': len(prompts) - succeeded,
+            'generation_time_ms': int((time.time() - start_time) * 1000)
+        })
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api_view(['GET'])
+def llm_metrics(request):
+    """
+    Rolling per-model LLM call telemetry
+
+    p50/p95/p99 of provider call time, time to first token, prompt and
+    completion tokens and completion speed, with call, error and retry counts,
+    over the last LLM_METRICS_WINDOW_HOURS. ``?model=<model_code>`` limits the
+    response to one model; ``?refresh=true`` bypasses the short-lived cache.
+    """
+    try:
+        summary = get_llm_metrics(refresh=request.query_params.get('refresh', 'false').lower() == 'true')
+        names = dict(LLMModel.objects.values_list('model_code', 'name'))
     except Exception as e:
         return Response(
-            {'detail': f"Generation failed: {str(e)}"},
+            {'detail': f"Database error: {str(e)}"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+    model_code = request.query_params.get('model')
+    if model_code:
+        summary = {model_code: summary[model_code]} if model_code in summary else {}
+    return Response({
+        'window_hours': getattr(settings, 'LLM_METRICS_WINDOW_HOURS', 24),
+        'models': {code: {'name': names.get(code), **metrics} for code, metrics in summary.items()}
+    })
+
+
+def _resolve_model(data, prompts):
+    """Request data naming the model to use, routed when only ``model_class`` is given"""
+    if data.get('llm_provider'):
+        return data
+    try:
+        llmmodel = QueryGenerationService.route_model(data['model_class'], prompts, data['dataset_metadata'])
+    except Exception as e:
+        raise Exception(f"Model routing failed: {str(e)}")
+    return {**data, 'llm_provider': llmmodel.name}
+
+
+async def _aresolve_model(data, prompts):
+    """Async variant of ``_resolve_model``"""
+    if data.get('llm_provider'):
+        return data
+    try:
+        llmmodel = await QueryGenerationService.aroute_model(data['model_class'], prompts, data['dataset_metadata'])
+    except Exception as e:
+        raise Exception(f"Model routing failed: {str(e)}")
+    return {**data, 'llm_provider': llmmodel.name}
+
+
+def _record_generation(data, result, generation_time_ms, request):
+    """Save and validate a generated query, returning the ``generate_query`` response payload"""
+    repo = GenerationRepository()
+    query = repo.save_query_metadata(
+        _query_metadata(data, result, generation_time_ms), request=request
+    )
+
+
+    validation_result = QueryValidationService.validate_query(result['generated_query'])
+
+    repo.update_validation_status(
+        query_id=query.query_id,
+        is_valid=validation_result['is_valid']
+    )
+    if not validation_result['is_valid']:
+        # Do not serve an invalid query again
+        QueryGenerationService.discard_generation(result['cache_key'])
+
+    return _generation_payload(data, result, query, validation_result)
+
+
+async def _arecord_generation(data, result, generation_time_ms, request):
+    """Async variant of ``_record_generation``"""
+    repo = GenerationRepository()
+    query = await repo.asave_query_metadata(
+        _query_metadata(data, result, generation_time_ms), request=request
+    )
+
+    validation_result = QueryValidationService.validate_query(result['generated_query'])
+
+    await repo.aupdate_validation_status(
+        query_id=query.query_id,
+        is_valid=validation_result['is_valid']
+    )
+    if not validation_result['is_valid']:
+        await QueryGenerationService.adiscard_generation(result['cache_key'])
 
+    return _generation_payload(data, result, query, validation_result)
+
+
+def _query_metadata(data, result, generation_time_ms):
+    llm_parameters = {'prompt_stats': result['prompt_stats']}
+    if result.get('hedge'):
+        llm_parameters['hedge'] = result['hedge']
+    if result.get('coalesced'):
+        llm_parameters['coalesced'] = True
+    if result.get('telemetry'):
+        llm_parameters['telemetry'] = result['telemetry']
+    return {
+        'raw_query': result['generated_query'],
+        'prepared_prompt': str(result['prepared_prompt']),
+        # A hedged generation may have been answered by another model
+        'llm_provider': result.get('llm_provider', data['llm_provider']),
+        'llm_parameters': llm_parameters,
+        'generation_time_ms': generation_time_ms,
+        'project_id': data['project_id'],
+        'cache_hit': result['cache_hit']
+    }
+
+
+def _generation_payload(data, result, query, validation_result):
+    return {
+        'generated_query': result['generated_query'],
+        'is_valid': validation_result['is_valid'],
+        'validation_errors': validation_result.get('errors', []),
+        'llm_provider': result.get('llm_provider', data['llm_provider']),
+        'generation_time': datetime.now().isoformat(),
+        'status': 'success',
+        'query_id': query.query_id,
+        'cache_hit': result['cache_hit']
+    }
+
+
+def _sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, cls=JSONEncoder)}\n\n"
+
+
+async def _async_iterator(iterator):
+    """Consume a blocking iterator one item at a time in a worker thread
+
+    Django buffers synchronous streaming responses completely under ASGI, so
+    the events would only be sent once the completion is done.
+    """
+    next_item = sync_to_async(next, thread_sensitive=False)
+    done = object()
+    while True:
+        item = await next_item(iterator, done)
+        if item is done:
+            return
+        yield item
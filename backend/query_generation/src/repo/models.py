@@ -13,6 +13,7 @@ class GeneratedQuery(models.Model):
     generation_time_ms = models.IntegerField()
     status = models.CharField(max_length=20)
     is_valid = models.BooleanField(default=False)
+    cache_hit = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     user_id = models.IntegerField()
     project = models.ForeignKey(ProjectMetadata, on_delete=models.CASCADE)
@@ -22,6 +23,87 @@ class GeneratedQuery(models.Model):
         app_label = 'query_generation'
 
 
+class GenerationCacheEntry(models.Model):
+    """Generated query reused for the same prompt, pruned schema, model and temperature"""
+    cache_key = models.CharField(max_length=64, unique=True)
+    normalized_prompt = models.TextField()
+    schema_hash = models.CharField(max_length=64)
+    model_code = models.CharField(max_length=50)
+    temperature = models.FloatField()
+    generated_query = models.TextField()
+    prepared_prompt = models.TextField()
+    prompt_stats = JSONField(default=dict)
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'generation_cache'
+        app_label = 'query_generation'
+        indexes = [
+            models.Index(fields=['last_used_at']),
+            models.Index(fields=['created_at']),
+        ]
+
+
+class HedgedGeneration(models.Model):
+    """Outcome of a generation raced against a second model after the hedge threshold"""
+    OUTCOME_CHOICES = [
+        ('valid', 'Valid'),
+        ('invalid', 'Invalid'),
+        ('error', 'Error'),
+        ('cancelled', 'Cancelled'),
+        ('not_started', 'Not started'),
+    ]
+    WINNER_CHOICES = [
+        ('primary', 'Primary'),
+        ('hedge', 'Hedge'),
+        ('none', 'None'),
+    ]
+
+    primary_model = models.CharField(max_length=50)
+    hedge_model = models.CharField(max_length=50, blank=True)
+    threshold_ms = models.IntegerField()
+    primary_outcome = models.CharField(max_length=20, choices=OUTCOME_CHOICES)
+    hedge_outcome = models.CharField(max_length=20, choices=OUTCOME_CHOICES, default='not_started')
+    # Time until the call answered, or until it was cancelled
+    primary_latency_ms = models.IntegerField(null=True)
+    hedge_latency_ms = models.IntegerField(null=True)
+    winner = models.CharField(max_length=10, choices=WINNER_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'hedged_generations'
+        app_label = 'query_generation'
+        indexes = [
+            models.Index(fields=['primary_model', 'created_at']),
+        ]
+
+
+class LLMCallMetric(models.Model):
+    """Timing, token usage and retries of one LLM provider call"""
+    model_code = models.CharField(max_length=50)
+    provider = models.CharField(max_length=20)
+    # Whole call including retries / first token of the attempt that answered
+    call_time_ms = models.IntegerField()
+    time_to_first_token_ms = models.IntegerField(null=True)
+    prompt_tokens = models.IntegerField()
+    completion_tokens = models.IntegerField()
+    tokens_estimated = models.BooleanField(default=False)
+    retries = models.PositiveSmallIntegerField(default=0)
+    succeeded = models.BooleanField(default=True)
+    error = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'llm_call_metrics'
+        app_label = 'query_generation'
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['model_code', 'created_at']),
+        ]
+
+
 class LLMModel(models.Model):
     """Table to store and manage available LLM models"""
 
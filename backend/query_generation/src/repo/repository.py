@@ -1,7 +1,12 @@
 from logging import exception
 
+import random
+from datetime import timedelta
+
 from django.core.exceptions import ObjectDoesNotExist
-from .models import GeneratedQuery
+from django.db.models import F
+from django.utils import timezone
+from .models import GeneratedQuery, GenerationCacheEntry, HedgedGeneration, LLMCallMetric
 
 
 class GenerationRepository:
@@ -17,6 +22,7 @@ class GenerationRepository:
                 - llm_provider (str): The LLM provider used
                 - generation_time_ms (int): Time taken to generate in ms
                 - project_id (int): Associated project ID
+                - cache_hit (bool): Optional, whether the query came from the generation cache
             request (HttpRequest): Optional request object for user context
 
         Returns:
@@ -28,17 +34,7 @@ class GenerationRepository:
         try:
 
 
-            query = GeneratedQuery.objects.create(
-                raw_query=query_metadata_data['raw_query'],
-                prepared_prompt=query_metadata_data['prepared_prompt'],
-                llm_provider=query_metadata_data['llm_provider'],
-                llm_parameters=query_metadata_data.get('llm_parameters', {}),
-                generation_time_ms=query_metadata_data['generation_time_ms'],
-                status='success',
-                is_valid=False,
-                user_id=1,
-                project_id=query_metadata_data['project_id']
-            )
+            query = GeneratedQuery.objects.create(**self._query_fields(query_metadata_data))
             return query
 
         except KeyError as e:
@@ -46,6 +42,29 @@ class GenerationRepository:
         except Exception as e:
             raise exception(f"Failed to save query metadata: {str(e)}")
 
+    async def asave_query_metadata(self, query_metadata_data, request=None):
+        """Async variant of ``save_query_metadata``"""
+        try:
+            fields = self._query_fields(query_metadata_data)
+        except KeyError as e:
+            raise ValueError(f"Missing required field: {str(e)}")
+        return await GeneratedQuery.objects.acreate(**fields)
+
+    @staticmethod
+    def _query_fields(query_metadata_data):
+        return {
+            'raw_query': query_metadata_data['raw_query'],
+            'prepared_prompt': query_metadata_data['prepared_prompt'],
+            'llm_provider': query_metadata_data['llm_provider'],
+            'llm_parameters': query_metadata_data.get('llm_parameters', {}),
+            'generation_time_ms': query_metadata_data['generation_time_ms'],
+            'status': 'success',
+            'is_valid': False,
+            'cache_hit': query_metadata_data.get('cache_hit', False),
+            'user_id': 1,
+            'project_id': query_metadata_data['project_id']
+        }
+
     def update_validation_status(self, query_id, is_valid):
         """
         Updates the validation status of a generated query
@@ -68,4 +87,150 @@ class GenerationRepository:
         except ObjectDoesNotExist:
             raise exception(f"Query with ID {query_id} not found")
         except Exception as e:
-            raise exception(f"Failed to update validation status: {str(e)}")
\ No newline at end of file
+            raise exception(f"Failed to update validation status: {str(e)}")
+
+    async def aupdate_validation_status(self, query_id, is_valid):
+        """Async variant of ``update_validation_status`` with a single UPDATE
+
+        Raises:
+            ValueError: If there is no such query
+        """
+        updated = await GeneratedQuery.objects.filter(query_id=query_id).aupdate(is_valid=is_valid)
+        if not updated:
+            raise ValueError(f"Query with ID {query_id} not found")
+
+
+class GenerationCacheRepository:
+    """Generated queries stored by generation key, expiring after ``ttl`` seconds
+
+    Expired entries and the least recently used ones above ``max_entries``
+    are deleted by one in ``evict_every`` stores on average, so a store does
+    not scan the table; in between the cache can briefly exceed
+    ``max_entries``.
+    """
+
+    def __init__(self, ttl=86400, max_entries=10000, evict_every=100):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+
+    def get(self, cache_key):
+        """The live entry for a key, counted as a hit, or None"""
+        now = timezone.now()
+        entry = GenerationCacheEntry.objects.filter(
+            cache_key=cache_key, created_at__gte=now - timedelta(seconds=self.ttl)
+        ).first()
+        if entry is None:
+            return None
+        GenerationCacheEntry.objects.filter(pk=entry.pk).update(hit_count=F('hit_count') + 1, last_used_at=now)
+        return entry
+
+    async def aget(self, cache_key):
+        """Async variant of ``get``"""
+        now = timezone.now()
+        entry = await GenerationCacheEntry.objects.filter(
+            cache_key=cache_key, created_at__gte=now - timedelta(seconds=self.ttl)
+        ).afirst()
+        if entry is None:
+            return None
+        await GenerationCacheEntry.objects.filter(pk=entry.pk).aupdate(hit_count=F('hit_count') + 1, last_used_at=now)
+        return entry
+
+    def put(self, cache_key, entry_data):
+        """Store or replace the entry for a key
+
+        Args:
+            cache_key: Generation key
+            entry_data: Dictionary with ``normalized_prompt``, ``schema_hash``,
+                ``model_code``, ``temperature``, ``generated_query``,
+                ``prepared_prompt`` and ``prompt_stats``
+        """
+        now = timezone.now()
+        entry, _ = GenerationCacheEntry.objects.update_or_create(
+            cache_key=cache_key,
+            defaults={**entry_data, 'hit_count': 0, 'created_at': now, 'last_used_at': now}
+        )
+        if self._should_evict():
+            self.evict()
+        return entry
+
+    async def aput(self, cache_key, entry_data):
+        """Async variant of ``put``"""
+        now = timezone.now()
+        entry, _ = await GenerationCacheEntry.objects.aupdate_or_create(
+            cache_key=cache_key,
+            defaults={**entry_data, 'hit_count': 0, 'created_at': now, 'last_used_at': now}
+        )
+        if self._should_evict():
+            await self.aevict()
+        return entry
+
+    def delete(self, cache_key):
+        GenerationCacheEntry.objects.filter(cache_key=cache_key).delete()
+
+    async def adelete(self, cache_key):
+        await GenerationCacheEntry.objects.filter(cache_key=cache_key).adelete()
+
+    def evict(self):
+        """Delete expired entries and the least recently used ones above ``max_entries``"""
+        GenerationCacheEntry.objects.filter(
+            created_at__lt=timezone.now() - timedelta(seconds=self.ttl)
+        ).delete()
+        cutoff = self._lru_cutoff().first()
+        if cutoff is not None:
+            GenerationCacheEntry.objects.filter(last_used_at__lte=cutoff).delete()
+
+    async def aevict(self):
+        """Async variant of ``evict``"""
+        await GenerationCacheEntry.objects.filter(
+            created_at__lt=timezone.now() - timedelta(seconds=self.ttl)
+        ).adelete()
+        cutoff = await self._lru_cutoff().afirst()
+        if cutoff is not None:
+            await GenerationCacheEntry.objects.filter(last_used_at__lte=cutoff).adelete()
+
+    def _should_evict(self):
+        return self.evict_every <= 1 or random.random() < 1 / self.evict_every
+
+    def _lru_cutoff(self):
+        """``last_used_at`` of the newest entry beyond ``max_entries``, read from the index"""
+        return GenerationCacheEntry.objects.order_by('-last_used_at').values_list(
+            'last_used_at', flat=True
+        )[self.max_entries:self.max_entries + 1]
+
+
+class HedgeRepository:
+    """Outcomes of hedged generations, the latency history the hedge threshold is tuned on"""
+
+    async def arecord(self, outcome_data):
+        return await HedgedGeneration.objects.acreate(**outcome_data)
+
+    async def arecent_latencies(self, model_code, limit=200):
+        """Latest call latencies (ms) of ``model_code``, oldest first, as primary or as hedge"""
+        primary = HedgedGeneration.objects.filter(
+            primary_model=model_code, primary_latency_ms__isnull=False
+        ).order_by('-created_at').values_list('created_at', 'primary_latency_ms')[:limit]
+        hedge = HedgedGeneration.objects.filter(
+            hedge_model=model_code, hedge_latency_ms__isnull=False
+        ).order_by('-created_at').values_list('created_at', 'hedge_latency_ms')[:limit]
+        rows = [row async for row in primary] + [row async for row in hedge]
+        return [latency for _, latency in sorted(rows)[-limit:]]
+
+
+class LLMMetricsRepository:
+    """Per-call LLM telemetry"""
+
+    def record(self, metrics):
+        return LLMCallMetric.objects.create(**metrics)
+
+    async def arecord(self, metrics):
+        return await LLMCallMetric.objects.acreate(**metrics)
+
+    def recent_calls(self, since, limit=10000):
+        """Latest calls since ``since``, at most ``limit``, as dictionaries"""
+        return list(
+            LLMCallMetric.objects.filter(created_at__gte=since).order_by('-created_at').values(
+                'model_code', 'call_time_ms', 'time_to_first_token_ms', 'prompt_tokens', 'completion_tokens',
+                'retries', 'succeeded'
+            )[:limit]
+        )
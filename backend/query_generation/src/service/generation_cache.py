@@ -0,0 +1,17 @@
+import hashlib
+import re
+
+
+def normalize_prompt(prompt):
+    """Request text with whitespace collapsed and trailing punctuation removed
+
+    Case is kept, since literals in a request (``status 'Paid'``) end up in
+    the generated SQL.
+    """
+    return re.sub(r'\s+', ' ', prompt or '').strip().rstrip('.?!; ').strip()
+
+
+def generation_key(prompt, schema_hash, model_code, temperature):
+    """Fingerprint of a generation: identical keys produce interchangeable queries"""
+    material = '\x1f'.join([normalize_prompt(prompt), schema_hash, model_code, repr(float(temperature))])
+    return hashlib.sha256(material.encode()).hexdigest()
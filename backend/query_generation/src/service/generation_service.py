@@ -1,27 +1,57 @@
-import os
+import asyncio
+import hashlib
+import logging
 import re
+import time
 from typing import Dict, Any
 
 from OpenSSL.rand import status
-from langchain_groq import ChatGroq
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from project_management.src.service.relationship_graph import join_conditions
 from ..repo.models import LLMModel
+from ..repo.repository import GenerationCacheRepository, HedgeRepository, LLMMetricsRepository
+from .generation_cache import generation_key, normalize_prompt
+from .latency_tracker import latency_tracker, percentile
+from .llm_registry import llm_registry
+from .model_router import model_router
+from .schema_prompt import estimate_tokens, serialize_schema
+from .rate_limiter import get_rate_limiter
+from .schema_ranking import get_schema_index, prune_schema
+from .single_flight import SingleFlight
+from .telemetry import CallTelemetry, generation_telemetry, is_retryable, retry_delay
+from .validation_service import QueryValidationService
+
+logger = logging.getLogger(__name__)
+
+# Identical generations in flight in this process, keyed by generation key
+single_flight = SingleFlight(timeout=getattr(settings, 'QUERY_COALESCE_TIMEOUT', 120))
 
 
 class QueryGenerationService:
 
     @staticmethod
-    def generate_query( prompt: str, metadata: Dict[str, Any], model: str) -> dict:
+    def generate_query( prompt: str, metadata: Dict[str, Any], model: str, use_cache: bool = True) -> dict:
         """
         Generate SQL query using Groq's API with specified LLM
 
+        A query generated before for the same request, pruned schema, model
+        and temperature is served from the generation cache instead of calling
+        the LLM again. While one is being generated, identical requests wait
+        for it instead of calling the LLM themselves (``coalesced`` is then set
+        in their result).
+
         Args:
             prompt: Natural language description of the query
             metadata: Dataset schema information
             model: One of 'mixtral-8x7b-32768', 'llama3-70b-8192', 'gemma-7b-it'...
+            use_cache: Look the query up in, and store it to, the generation cache
 
 
         Returns:
-            Generated SQL query string
+            Dictionary with ``generated_query``, ``prepared_prompt``,
+            ``prompt_stats``, ``cache_hit``, ``cache_key`` and, when the LLM
+            was called, the call's ``telemetry``
 
         Raises:
             LLMGenerationError: If query generation fails
@@ -29,51 +59,654 @@ class QueryGenerationService:
 
 
         try:
+            generation = QueryGenerationService._start_generation(prompt, metadata, model, use_cache)
+            if generation['cached'] is not None:
+                return generation['cached']
 
-            llmmodel = LLMModel.objects.get(name=model)
+            def call_llm():
+                content, metrics = QueryGenerationService._call_llm(generation)
 
-            schema_info = metadata.get('schema', {})
-            database_type = metadata.get('database_type', '')
 
-            system_prompt = f"""
-            You are an expert SQL developer specialized in {database_type}. 
-            Generate a syntactically correct SQL query based on the following context:
-            1.Schema:{schema_info}
-            2. User Request:{prompt}
-            Guidelines:
-            - Return ONLY the SQL query (no explanations or comments)
-            - Use proper indentation and formatting
-            - Use fully qualified table names if necessary (e.g., schema.table)
-            - Follow {database_type} SQL syntax strictly
-            - Include relevant WHERE, JOIN, GROUP BY, and ORDER BY clauses as appropriate
-            - Ensure query is complete, accurate, and logically sound
-            """
+                return QueryGenerationService._finish_generation(generation, content, metrics)
+
+            return QueryGenerationService._coalesced(*single_flight.do(generation['cache_key'], call_llm))
+
+        except Exception as e:
+            raise Exception(f"Query generation failed with {model}: {str(e)}")
+
+    @staticmethod
+    def stream_query(prompt: str, metadata: Dict[str, Any], model: str, use_cache: bool = True):
+        """
+        Streaming variant of ``generate_query`` yielding completion tokens as they arrive
+
+        The model lookup, prompt preparation and cache lookup happen eagerly, so
+        failures there raise before anything is streamed. A cached query is
+        yielded as a single token.
+
+        Returns:
+            Iterator of event dictionaries:
+                {'type': 'token', 'text': str} for every chunk of the completion
+                {'type': 'done', **generate_query result} once it is complete
+        """
+        try:
+            generation = QueryGenerationService._start_generation(prompt, metadata, model, use_cache)
+        except Exception as e:
+            raise Exception(f"Query generation failed with {model}: {str(e)}")
+
+        def stream():
+            if generation['cached'] is not None:
+                yield {'type': 'token', 'text': generation['cached']['generated_query']}
+                yield {'type': 'done', **generation['cached']}
+                return
+
+            telemetry = CallTelemetry(generation['llmmodel'], generation['system_prompt'])
+            buffer = []
+            try:
+                for text in QueryGenerationService._stream_llm(generation, telemetry):
+                    buffer.append(text)
+                    yield {'type': 'token', 'text': text}
+            except Exception as e:
+                QueryGenerationService._save_call(telemetry.finish(error=e))
+                raise
+            content = ''.join(buffer)
+            metrics = telemetry.finish(content)
+            QueryGenerationService._save_call(metrics)
+
+            yield {'type': 'done', **QueryGenerationService._finish_generation(generation, content, metrics)}
+
+        return stream()
+
+    @staticmethod
+    async def agenerate_query(prompt: str, metadata: Dict[str, Any], model: str, use_cache: bool = True) -> dict:
+        """
+        Async variant of ``generate_query`` for async views and batch callers
+
+        The event loop is never blocked: the model and cache lookups use the
+        async ORM, the CPU-bound prompt preparation runs in a worker thread and
+        the LLM call awaits the provider, so one worker serves many concurrent
+        generations while they wait on the network. LLM calls wait for the
+        provider's rate limiter (LLM_PROVIDER_RATE_LIMITS) first.
+
+        Raises:
+            LLMGenerationError: If query generation fails
+        """
+        try:
+            llmmodel = await llm_registry.aget_model(model)
+            return await QueryGenerationService._agenerate(prompt, metadata, llmmodel, use_cache)
+
+        except Exception as e:
+            raise Exception(f"Query generation failed with {model}: {str(e)}")
+
+    @staticmethod
+    async def agenerate_batch(prompts, metadata: Dict[str, Any], model: str, use_cache: bool = True,
+                              concurrency: int = None):
+        """
+        Generate one query per prompt against the same schema, concurrently
+
+        The model is looked up and the schema relevance index built once for the
+        whole batch. At most ``concurrency`` generations (QUERY_BATCH_CONCURRENCY
+        by default) run at a time, and every LLM call also waits for the
+        provider's rate limiter (see ``agenerate_query``).
 
-            llm = ChatGroq(
-                model_name=llmmodel.model_code,
-                temperature=llmmodel.default_temperature,
-                api_key=os.getenv("GROQ_API_KEY"),
+        Returns:
+            Async iterator of ``(index, result, error)`` tuples in completion
+            order, ``index`` being the prompt's position, ``result`` the
+            ``generate_query`` result or None and ``error`` None or the failure
+            message of that prompt
 
+        Raises:
+            LLMGenerationError: If the model or the schema cannot be loaded
+        """
+        try:
+            llmmodel = await llm_registry.aget_model(model)
+            schema_index = await sync_to_async(get_schema_index, thread_sensitive=False)(
+                metadata.get('schema', {}), metadata.get('schema_hash')
             )
+        except Exception as e:
+            raise Exception(f"Query generation failed with {model}: {str(e)}")
 
+        semaphore = asyncio.Semaphore(concurrency or getattr(settings, 'QUERY_BATCH_CONCURRENCY', 8))
+
+        async def generate(position, prompt):
+            async with semaphore:
+                try:
+                    result = await QueryGenerationService._agenerate(
+                        prompt, metadata, llmmodel, use_cache, schema_index
+                    )
+                    return position, result, None
+                except Exception as e:
+                    return position, None, f"Query generation failed with {model}: {str(e)}"
+
+        tasks = [asyncio.ensure_future(generate(position, prompt)) for position, prompt in enumerate(prompts)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            # The client went away: do not keep calling the LLM for nobody. A coalesced
+            # call keeps running while another request still waits for it (see SingleFlight)
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    async def _agenerate(prompt, metadata, llmmodel, use_cache, schema_index=None):
+        generation = await QueryGenerationService._astart_generation(
+            prompt, metadata, llmmodel, use_cache, schema_index
+        )
+        if generation['cached'] is not None:
+            return generation['cached']
 
-            response = llm.invoke(system_prompt)
+        async def call_llm():
+            content, metrics = await QueryGenerationService._acall_llm(generation)
+            return await QueryGenerationService._afinish_generation(generation, content, metrics)
 
+        return QueryGenerationService._coalesced(*await single_flight.ado(generation['cache_key'], call_llm))
 
+    @staticmethod
+    def _call_llm(generation):
+        """Completion of a prepared generation and the LLMCallMetric fields of the call"""
+        telemetry = CallTelemetry(generation['llmmodel'], generation['system_prompt'])
+        try:
+            content = ''.join(QueryGenerationService._stream_llm(generation, telemetry))
+        except Exception as e:
+            QueryGenerationService._save_call(telemetry.finish(error=e))
+            raise
+        metrics = telemetry.finish(content)
+        QueryGenerationService._save_call(metrics)
+        return content, metrics
 
-            generated_query = QueryGenerationService.extract_sql(response.content)
+    @staticmethod
+    async def _acall_llm(generation):
+        """Async variant of ``_call_llm``"""
+        telemetry = CallTelemetry(generation['llmmodel'], generation['system_prompt'])
+        try:
+            content = ''.join([text async for text in QueryGenerationService._astream_llm(generation, telemetry)])
+        except Exception as e:
+            await QueryGenerationService._asave_call(telemetry.finish(error=e))
+            raise
+        metrics = telemetry.finish(content)
+        await QueryGenerationService._asave_call(metrics)
+        return content, metrics
 
+    @staticmethod
+    def _stream_llm(generation, telemetry):
+        """
+        Text of a prepared generation's completion, chunk by chunk
 
+        Completions are always streamed so the time to first token is known.
+        Retryable failures (timeouts, connection errors, 429 and 5xx) are
+        retried up to QUERY_LLM_MAX_RETRIES times with exponential backoff, as
+        long as nothing was received yet.
+        """
+        llm = QueryGenerationService._create_llm(generation['llmmodel'])
+        while True:
+            telemetry.attempt()
+            received = False
+            try:
+                for chunk in llm.stream(generation['system_prompt']):
+                    telemetry.chunk(chunk)
+                    if chunk.content:
+                        received = True
+                        yield chunk.content
+                return
+            except Exception as e:
+                if received or not QueryGenerationService._retry(telemetry, e):
+                    raise
+                time.sleep(retry_delay(telemetry.retries))
 
+    @staticmethod
+    async def _astream_llm(generation, telemetry):
+        """Async variant of ``_stream_llm``, every attempt waiting for the provider's rate limiter"""
+        llmmodel = generation['llmmodel']
+        llm = llm_registry.get_async_client(llmmodel)
+        while True:
+            if not llm_registry.uses_stub(llmmodel):
+                await get_rate_limiter(llmmodel.provider).acquire(estimate_tokens(generation['system_prompt']))
+            telemetry.attempt()
+            received = False
+            try:
+                async for chunk in llm.astream(generation['system_prompt']):
+                    telemetry.chunk(chunk)
+                    if chunk.content:
+                        received = True
+                        yield chunk.content
+                return
+            except Exception as e:
+                if received or not QueryGenerationService._retry(telemetry, e):
+                    raise
+                await asyncio.sleep(retry_delay(telemetry.retries))
 
-            return {
-                'generated_query': generated_query,
-                'prepared_prompt': system_prompt
-            }
+    @staticmethod
+    def _retry(telemetry, error):
+        if telemetry.retries >= getattr(settings, 'QUERY_LLM_MAX_RETRIES', 2) or not is_retryable(error):
+            return False
+        telemetry.retry()
+        logger.warning(f"Retrying {telemetry.llmmodel.model_code} after {str(error)}")
+        return True
+
+    @staticmethod
+    def _save_call(metrics):
+        if not getattr(settings, 'LLM_CALL_METRICS_ENABLED', True):
+            return
+        try:
+            LLMMetricsRepository().record(metrics)
+        except Exception as e:
+            logger.warning(f"Recording LLM call metrics failed: {str(e)}")
+
+    @staticmethod
+    async def _asave_call(metrics):
+        if not getattr(settings, 'LLM_CALL_METRICS_ENABLED', True):
+            return
+        try:
+            await LLMMetricsRepository().arecord(metrics)
+        except Exception as e:
+            logger.warning(f"Recording LLM call metrics failed: {str(e)}")
+
+    @staticmethod
+    async def agenerate_hedged(prompt: str, metadata: Dict[str, Any], model: str, use_cache: bool = True) -> dict:
+        """
+        Async generation raced against a second model when the first one is slow
+
+        The request goes to ``model`` first. When it has not answered within
+        the QUERY_HEDGE_PERCENTILE of its recorded latencies, or answered with
+        an error or an invalid query, the request is also sent to the fastest
+        other active model (or QUERY_HEDGE_MODEL). The first query passing
+        ``QueryValidationService`` wins and the other call is cancelled. Every
+        hedged generation is saved as a HedgedGeneration and its latencies feed
+        the threshold of later ones.
+
+        Returns:
+            ``generate_query`` result with ``llm_provider``, the name of the
+            model that answered, and ``hedge``, the recorded outcome
+
+        Raises:
+            LLMGenerationError: If query generation fails on every model
+        """
+        try:
+            primary = await llm_registry.aget_model(model)
+            generation = await QueryGenerationService._astart_generation(prompt, metadata, primary, use_cache)
+            if generation['cached'] is not None:
+                return generation['cached']
+
+            async def race():
+                threshold_ms = await QueryGenerationService.hedge_threshold(primary)
+                hedge = await QueryGenerationService._hedge_model(primary)
+                return await QueryGenerationService._arace(prompt, metadata, generation, hedge, threshold_ms, use_cache)
+
+            return QueryGenerationService._coalesced(*await single_flight.ado(('hedge', generation['cache_key']), race))
 
         except Exception as e:
             raise Exception(f"Query generation failed with {model}: {str(e)}")
 
+    @staticmethod
+    async def hedge_threshold(llmmodel) -> int:
+        """Milliseconds to wait for ``llmmodel`` before hedging"""
+        model_code = llmmodel.model_code
+        if not latency_tracker.is_seeded(model_code):
+            try:
+                latency_tracker.seed(model_code, await HedgeRepository().arecent_latencies(
+                    model_code, latency_tracker.window
+                ))
+            except Exception as e:
+                logger.warning(f"Loading the latency history of {model_code} failed: {str(e)}")
+
+        samples = latency_tracker.samples(model_code)
+        if len(samples) < getattr(settings, 'QUERY_HEDGE_MIN_SAMPLES', 20):
+            return getattr(settings, 'QUERY_HEDGE_DEFAULT_DELAY_MS', 3000)
+        return percentile(samples, getattr(settings, 'QUERY_HEDGE_PERCENTILE', 0.95))
+
+    @staticmethod
+    async def _hedge_model(primary):
+        candidates = [
+            llmmodel for llmmodel in await llm_registry.aget_active_models()
+            if llmmodel.model_code != primary.model_code
+        ]
+        configured = getattr(settings, 'QUERY_HEDGE_MODEL', None)
+        if configured:
+            return next((llmmodel for llmmodel in candidates if llmmodel.name == configured), None)
+
+        def median_latency(llmmodel):
+            median = latency_tracker.percentile(llmmodel.model_code, 0.5)
+            return (median is None, median or 0, not llmmodel.is_default, llmmodel.name)
+
+        return min(candidates, key=median_latency, default=None)
+
+    @staticmethod
+    async def _arace(prompt, metadata, generation, hedge, threshold_ms, use_cache):
+        calls = {}
+
+        def launch(role, role_generation):
+            calls[role] = {
+                'generation': role_generation,
+                'task': asyncio.ensure_future(QueryGenerationService._acall_llm(role_generation)),
+                'started': time.monotonic(),
+                'outcome': 'cancelled',
+                'latency_ms': None,
+                'content': None,
+                'metrics': None,
+                'error': None
+            }
+
+        def settle(role):
+            call = calls[role]
+            try:
+                call['content'], metrics = call['task'].result()
+                call['latency_ms'] = metrics['call_time_ms']
+                call['metrics'] = metrics
+            except Exception as e:
+                call['outcome'], call['error'] = 'error', e
+                return False
+            query = QueryGenerationService.extract_sql(call['content'])
+            call['outcome'] = 'valid' if QueryValidationService.validate_query(query)['is_valid'] else 'invalid'
+            return call['outcome'] == 'valid'
+
+        launch('primary', generation)
+        winner = None
+        try:
+            done, _ = await asyncio.wait([calls['primary']['task']], timeout=threshold_ms / 1000)
+            if done and settle('primary'):
+                winner = 'primary'
+            elif hedge is not None:
+                hedge_generation = await QueryGenerationService._astart_generation(prompt, metadata, hedge, False)
+                hedge_generation['use_cache'] = use_cache
+                launch('hedge', hedge_generation)
+
+            pending = {call['task'] for call in calls.values() if not call['task'].done()}
+            while winner is None and pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for role, call in calls.items():
+                    if call['task'] in done and settle(role) and winner is None:
+                        winner = role
+        finally:
+            for call in calls.values():
+                if not call['task'].done():
+                    call['task'].cancel()
+                    call['latency_ms'] = int((time.monotonic() - call['started']) * 1000)
+                    # Only a lower bound, but it keeps slow calls in the percentile
+                    latency_tracker.record(call['generation']['llmmodel'].model_code, call['latency_ms'])
+
+        hedge_call = calls.get('hedge', {})
+        outcome = {
+            'primary_model': generation['llmmodel'].model_code,
+            'hedge_model': hedge_call['generation']['llmmodel'].model_code if hedge_call else '',
+            'threshold_ms': int(threshold_ms),
+            'primary_outcome': calls['primary']['outcome'],
+            'hedge_outcome': hedge_call.get('outcome', 'not_started'),
+            'primary_latency_ms': calls['primary']['latency_ms'],
+            'hedge_latency_ms': hedge_call.get('latency_ms'),
+            'winner': winner or 'none'
+        }
+        try:
+            await HedgeRepository().arecord(outcome)
+        except Exception as e:
+            logger.warning(f"Recording the hedged generation failed: {str(e)}")
+
+        if winner is None:
+            # No valid query: answer like an unhedged generation would, primary first
+            winner = next((role for role in ('primary', 'hedge') if calls.get(role, {}).get('content') is not None), None)
+            if winner is None:
+                raise calls['primary']['error'] or calls.get('hedge', {}).get('error') or Exception("No completion")
+
+        call = calls[winner]
+        result = await QueryGenerationService._afinish_generation(call['generation'], call['content'], call['metrics'])
+        result['llm_provider'] = call['generation']['llmmodel'].name
+        result['hedge'] = outcome
+        return result
+
+    @staticmethod
+    def _start_generation(prompt, metadata, model, use_cache):
+        """Look up the model, prepare the prompt and check the generation cache"""
+        llmmodel = llm_registry.get_model(model)
+        generation = QueryGenerationService._prepare_generation(prompt, metadata, llmmodel, use_cache)
+
+        if use_cache:
+            entry = QueryGenerationService._cached_generation(
+                QueryGenerationService.generation_cache(), generation['cache_key']
+            )
+            generation['cached'] = QueryGenerationService._cached_result(entry, generation['cache_key'])
+        return generation
+
+    @staticmethod
+    async def _astart_generation(prompt, metadata, llmmodel, use_cache, schema_index=None):
+        """Async variant of ``_start_generation``, for an already looked up model"""
+        generation = await sync_to_async(QueryGenerationService._prepare_generation, thread_sensitive=False)(
+            prompt, metadata, llmmodel, use_cache, schema_index
+        )
+
+        if use_cache:
+            try:
+                entry = await QueryGenerationService.generation_cache().aget(generation['cache_key'])
+            except Exception as e:
+                logger.warning(f"Generation cache lookup failed: {str(e)}")
+                entry = None
+            generation['cached'] = QueryGenerationService._cached_result(entry, generation['cache_key'])
+        return generation
+
+    @staticmethod
+    def _prepare_generation(prompt, metadata, llmmodel, use_cache, schema_index=None):
+        system_prompt, prompt_stats = QueryGenerationService.prepare_prompt(prompt, metadata, llmmodel, schema_index)
+        cache_key = generation_key(
+            prompt, prompt_stats['schema_hash'], llmmodel.model_code, llmmodel.default_temperature
+        )
+        return {
+            'prompt': prompt,
+            'llmmodel': llmmodel,
+            'system_prompt': system_prompt,
+            'prompt_stats': prompt_stats,
+            'cache_key': cache_key,
+            'use_cache': use_cache,
+            'cached': None
+        }
+
+    @staticmethod
+    def _cached_result(entry, cache_key):
+        if entry is None:
+            return None
+        return {
+            'generated_query': entry.generated_query,
+            'prepared_prompt': entry.prepared_prompt,
+            'prompt_stats': entry.prompt_stats,
+            'cache_hit': True,
+            'cache_key': cache_key
+        }
+
+    @staticmethod
+    def required_tokens(prompt: str, metadata: Dict[str, Any]) -> int:
+        """Estimated size of a request's prompt with its relevant schema in full"""
+        system_prompt, _ = QueryGenerationService.prepare_prompt(prompt, metadata)
+        return estimate_tokens(system_prompt)
+
+    @staticmethod
+    def route_model(model_class: str, prompts, metadata: Dict[str, Any]) -> LLMModel:
+        """
+        Active model to answer ``prompts`` when the caller asks for a model class
+
+        Args:
+            model_class: An LLMModel ``model_type`` or ``'any'``
+            prompts: The requests to answer; the largest one must fit the model
+
+        Raises:
+            ValueError: If no active model is of the class
+        """
+        required = max(QueryGenerationService.required_tokens(prompt, metadata) for prompt in prompts)
+        return model_router.choose(llm_registry.get_active_models(), model_class, required)
+
+    @staticmethod
+    async def aroute_model(model_class: str, prompts, metadata: Dict[str, Any]) -> LLMModel:
+        """Async variant of ``route_model``"""
+        required = await sync_to_async(
+            lambda: max(QueryGenerationService.required_tokens(prompt, metadata) for prompt in prompts),
+            thread_sensitive=False
+        )()
+        return model_router.choose(await llm_registry.aget_active_models(), model_class, required)
+
+    @staticmethod
+    def _coalesced(result, coalesced):
+        """Result of a single-flight call, copied for followers since every caller records its own"""
+        return {**result, 'coalesced': True} if coalesced else result
+
+    @staticmethod
+    def _create_llm(llmmodel):
+        return llm_registry.get_client(llmmodel)
+
+    @staticmethod
+    def _finish_generation(generation, content, metrics=None):
+        """Extract the query from a completion and store it in the generation cache"""
+        generated_query = QueryGenerationService.extract_sql(content)
+
+        if generation['use_cache'] and generated_query:
+            QueryGenerationService._store_generation(
+                QueryGenerationService.generation_cache(), generation['cache_key'],
+                QueryGenerationService._cache_entry(generation, generated_query)
+            )
+
+        return QueryGenerationService._generation_result(generation, generated_query, metrics)
+
+    @staticmethod
+    async def _afinish_generation(generation, content, metrics=None):
+        """Async variant of ``_finish_generation``"""
+        generated_query = QueryGenerationService.extract_sql(content)
+
+        if generation['use_cache'] and generated_query:
+            try:
+                await QueryGenerationService.generation_cache().aput(
+                    generation['cache_key'], QueryGenerationService._cache_entry(generation, generated_query)
+                )
+            except Exception as e:
+                logger.warning(f"Storing generation cache entry failed: {str(e)}")
+
+        return QueryGenerationService._generation_result(generation, generated_query, metrics)
+
+    @staticmethod
+    def _cache_entry(generation, generated_query):
+        llmmodel = generation['llmmodel']
+        return {
+            'normalized_prompt': normalize_prompt(generation['prompt']),
+            'schema_hash': generation['prompt_stats']['schema_hash'],
+            'model_code': llmmodel.model_code,
+            'temperature': llmmodel.default_temperature,
+            'generated_query': generated_query,
+            'prepared_prompt': generation['system_prompt'],
+            'prompt_stats': generation['prompt_stats']
+        }
+
+    @staticmethod
+    def _generation_result(generation, generated_query, metrics=None):
+        result = {
+            'generated_query': generated_query,
+            'prepared_prompt': generation['system_prompt'],
+            'prompt_stats': generation['prompt_stats'],
+            'cache_hit': False,
+            'cache_key': generation['cache_key']
+        }
+        if metrics is not None:
+            result['telemetry'] = generation_telemetry(metrics)
+        return result
+
+    @staticmethod
+    def generation_cache() -> GenerationCacheRepository:
+        return GenerationCacheRepository(
+            ttl=getattr(settings, 'QUERY_GENERATION_CACHE_TTL', 86400),
+            max_entries=getattr(settings, 'QUERY_GENERATION_CACHE_MAX_ENTRIES', 10000),
+            evict_every=getattr(settings, 'QUERY_GENERATION_CACHE_EVICT_EVERY', 100)
+        )
+
+    @staticmethod
+    def discard_generation(cache_key: str) -> None:
+        """Remove a generated query from the cache, e.g. when it failed validation"""
+        try:
+            QueryGenerationService.generation_cache().delete(cache_key)
+        except Exception as e:
+            logger.warning(f"Removing generation cache entry failed: {str(e)}")
+
+    @staticmethod
+    async def adiscard_generation(cache_key: str) -> None:
+        """Async variant of ``discard_generation``"""
+        try:
+            await QueryGenerationService.generation_cache().adelete(cache_key)
+        except Exception as e:
+            logger.warning(f"Removing generation cache entry failed: {str(e)}")
+
+    @staticmethod
+    def _cached_generation(cache, cache_key):
+        try:
+            return cache.get(cache_key)
+        except Exception as e:
+            logger.warning(f"Generation cache lookup failed: {str(e)}")
+            return None
+
+    @staticmethod
+    def _store_generation(cache, cache_key, entry_data):
+        try:
+            cache.put(cache_key, entry_data)
+        except Exception as e:
+            logger.warning(f"Storing generation cache entry failed: {str(e)}")
+
+    @staticmethod
+    def prepare_prompt(prompt: str, metadata: Dict[str, Any], llmmodel: LLMModel = None, schema_index=None) -> tuple:
+        """
+        Build the system prompt for a request within the model's context window
+
+        The schema is pruned to the tables relevant to the request and rendered
+        compactly by ``serialize_schema`` within the tokens left by the model's
+        ``context_window`` after ``max_output_tokens``, the rest of the prompt
+        and ``QUERY_PROMPT_TOKEN_RESERVE``; without ``llmmodel`` it is not
+        reduced. ``schema_index`` is the schema's SchemaIndex when the caller
+        already has it; otherwise it is looked up by the ``schema_hash`` the
+        project service sends with the schema.
+
+        Returns:
+            Tuple of the prompt text and the serializer's report, with the
+            ``schema_hash`` of the schema part of the prompt
+        """
+        database_type = metadata.get('database_type', '')
+        full_schema = metadata.get('schema', {})
+        # Only the tables relevant to the request, and the keys joining them
+        schema_info, foreign_keys, index = prune_schema(
+            full_schema, prompt, index=schema_index, key=metadata.get('schema_hash')
+        )
+        relationships = {
+            'primary_keys': (full_schema.get('relationships') or {}).get('primary_keys', {}),
+            'foreign_keys': foreign_keys
+        }
+
+        def build_prompt(schema_text, join_keys):
+            joins = ''
+            if join_keys:
+                joins = "\n            3. Join on:\n" + "\n".join(
+                    f"            - {condition}" for condition in join_conditions(join_keys)
+                )
+            return f"""
+            You are an expert SQL developer specialized in {database_type}. 
+            Generate a syntactically correct SQL query based on the following context:
+            1. Schema (one table per line, table(column type, ...)):
+{schema_text}
+            2. User Request:{prompt}{joins}
+            Guidelines:
+            - Return ONLY the SQL query (no explanations or comments)
+            - Use proper indentation and formatting
+            - Use fully qualified table names if necessary (e.g., schema.table)
+            - Follow {database_type} SQL syntax strictly
+            - Include relevant WHERE, JOIN, GROUP BY, and ORDER BY clauses as appropriate
+            - Ensure query is complete, accurate, and logically sound
+            """
+
+        budget = None
+        if llmmodel is not None:
+            budget = max(0, (
+                llmmodel.context_window - llmmodel.max_output_tokens
+                - estimate_tokens(build_prompt('', foreign_keys))
+                - getattr(settings, 'QUERY_PROMPT_TOKEN_RESERVE', 256)
+            ))
+        schema_text, prompt_stats = serialize_schema(
+            schema_info, budget, relationships, index.column_scores(prompt)
+        )
+        kept = set(prompt_stats['tables'])
+        join_keys = [key for key in foreign_keys if key['table'] in kept and key['referenced_table'] in kept]
+        prompt_stats['schema_hash'] = hashlib.sha256(
+            '\n'.join([schema_text, *join_conditions(join_keys)]).encode()
+        ).hexdigest()
+        return build_prompt(schema_text, join_keys), prompt_stats
+
     @staticmethod
     def extract_sql(response):
         """
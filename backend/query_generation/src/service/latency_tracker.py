@@ -0,0 +1,76 @@
+import math
+import threading
+from collections import deque
+
+from django.conf import settings
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of ``values``, ``fraction`` between 0 and 1"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+class LatencyTracker:
+    """Rolling window of the latest LLM call latencies (ms) and failures per model code"""
+
+    def __init__(self, window=200):
+        self.window = window
+        self._samples = {}
+        self._outcomes = {}
+        self._seeded = set()
+        self._lock = threading.Lock()
+
+    def record(self, model_code, latency_ms):
+        with self._lock:
+            samples = self._samples.get(model_code)
+            if samples is None:
+                samples = self._samples[model_code] = deque(maxlen=self.window)
+            samples.append(latency_ms)
+            self._outcome_window(model_code).append(True)
+
+    def record_error(self, model_code):
+        with self._lock:
+            self._outcome_window(model_code).append(False)
+
+    def calls(self, model_code):
+        """Number of recorded calls, successful or failed, in the window"""
+        with self._lock:
+            return max(len(self._samples.get(model_code, ())), len(self._outcomes.get(model_code, ())))
+
+    def error_rate(self, model_code):
+        """Share of failed calls among the latest ones, None before the first call"""
+        with self._lock:
+            outcomes = list(self._outcomes.get(model_code, ()))
+        return outcomes.count(False) / len(outcomes) if outcomes else None
+
+    def _outcome_window(self, model_code):
+        outcomes = self._outcomes.get(model_code)
+        if outcomes is None:
+            outcomes = self._outcomes[model_code] = deque(maxlen=self.window)
+        return outcomes
+
+    def seed(self, model_code, latencies):
+        """Add older ``latencies`` (oldest first) unless the model already has samples"""
+        with self._lock:
+            self._seeded.add(model_code)
+            if self._samples.get(model_code):
+                return
+            self._samples[model_code] = deque(latencies, maxlen=self.window)
+
+    def is_seeded(self, model_code):
+        with self._lock:
+            return model_code in self._seeded
+
+    def samples(self, model_code):
+        with self._lock:
+            return list(self._samples.get(model_code, ()))
+
+    def percentile(self, model_code, fraction):
+        return percentile(self.samples(model_code), fraction)
+
+
+latency_tracker = LatencyTracker(window=getattr(settings, 'QUERY_HEDGE_LATENCY_WINDOW', 200))
@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+import weakref
+
+from django.conf import settings
+
+from ..repo.models import LLMModel
+from .providers import get_adapter, uses_stub
+
+logger = logging.getLogger(__name__)
+
+
+class LLMRegistry:
+    """Process-wide cache of LLMModel rows and of one LLM client per model configuration.
+
+    Models are looked up by name once and kept for ``ttl`` seconds, so the
+    generation hot path does no database query. Clients keep their HTTP
+    connection pool, so the TCP and TLS setup to the provider is paid once per
+    configuration instead of once per generation. A client is keyed by the
+    model's API settings and API key, so an edited model or a rotated key gets
+    a new client. Clients are created by the adapter of the model's provider
+    (see ``providers``); active models whose provider package is not installed
+    are logged and left out of ``get_active_models``, so routing never picks
+    them.
+
+    ``invalidate`` drops everything; LLMModelAdmin calls it whenever a model is
+    changed, and the ``ttl`` bounds staleness in other processes.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._models = {}
+        self._active_models = None
+        self._clients = {}
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get_model(self, name):
+        """The LLMModel named ``name``
+
+        Raises:
+            LLMModel.DoesNotExist: If there is no such model
+        """
+        llmmodel = self._cached_model(name)
+        if llmmodel is None:
+            llmmodel = self._remember_model(name, LLMModel.objects.get(name=name))
+        return llmmodel
+
+    async def aget_model(self, name):
+        """Async variant of ``get_model``"""
+        llmmodel = self._cached_model(name)
+        if llmmodel is None:
+            llmmodel = self._remember_model(name, await LLMModel.objects.aget(name=name))
+        return llmmodel
+
+    def get_active_models(self):
+        """Every active LLMModel, cached like single models"""
+        llmmodels = self._cached_active_models()
+        if llmmodels is None:
+            llmmodels = self._remember_active_models(self._usable(LLMModel.objects.filter(is_active=True)))
+        return llmmodels
+
+    async def aget_active_models(self):
+        """Async variant of ``get_active_models``"""
+        llmmodels = self._cached_active_models()
+        if llmmodels is None:
+            llmmodels = self._remember_active_models(
+                self._usable([llmmodel async for llmmodel in LLMModel.objects.filter(is_active=True)])
+            )
+        return llmmodels
+
+    def get_client(self, llmmodel):
+        """Long-lived chat client for a model, created on first use"""
+        return self._get_or_create_client(self._clients, llmmodel)
+
+    def get_async_client(self, llmmodel):
+        """Chat client for ``ainvoke``/``astream`` calls from the running event loop
+
+        Async HTTP connections belong to the event loop that opened them, so
+        clients are kept per loop: one for the whole process under ASGI, and
+        dropped together with their loop when each request gets its own.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = self._async_clients.get(loop)
+            if clients is None:
+                clients = self._async_clients[loop] = {}
+        return self._get_or_create_client(clients, llmmodel)
+
+    def invalidate(self):
+        """Forget every cached model and client"""
+        with self._lock:
+            self._models.clear()
+            self._active_models = None
+            self._clients.clear()
+            self._async_clients.clear()
+        logger.info("LLM model registry invalidated")
+
+    @staticmethod
+    def _usable(llmmodels):
+        usable = []
+        for llmmodel in llmmodels:
+            try:
+                get_adapter(llmmodel)
+            except ValueError as e:
+                logger.error(f"Active LLM model '{llmmodel.name}' is skipped: {e}")
+                continue
+            usable.append(llmmodel)
+        return usable
+
+    def _cached_model(self, name):
+        with self._lock:
+            cached = self._models.get(name)
+        if cached is not None and time.monotonic() - cached[0] < self.ttl:
+            return cached[1]
+        return None
+
+    def _cached_active_models(self):
+        with self._lock:
+            cached = self._active_models
+        if cached is not None and time.monotonic() - cached[0] < self.ttl:
+            return cached[1]
+        return None
+
+    def _remember_active_models(self, llmmodels):
+        with self._lock:
+            self._active_models = (time.monotonic(), llmmodels)
+        return llmmodels
+
+    def _remember_model(self, name, llmmodel):
+        with self._lock:
+            self._models[name] = (time.monotonic(), llmmodel)
+        return llmmodel
+
+    def _get_or_create_client(self, clients, llmmodel):
+        adapter = get_adapter(llmmodel)
+        api_key = adapter.api_key()
+        key = (adapter.name, *self.client_key(llmmodel, api_key))
+        with self._lock:
+            client = clients.get(key)
+            if client is None:
+                client = clients[key] = adapter.create_client(llmmodel, api_key)
+        return client
+
+    @staticmethod
+    def client_key(llmmodel, api_key):
+        api_key_hash = hashlib.sha256((api_key or '').encode()).hexdigest()
+        return (
+            llmmodel.provider, llmmodel.model_code, llmmodel.default_temperature,
+            llmmodel.max_output_tokens, llmmodel.base_url, api_key_hash
+        )
+
+    @staticmethod
+    def uses_stub(llmmodel):
+        return uses_stub(llmmodel)
+
+
+llm_registry = LLMRegistry(ttl=getattr(settings, 'LLM_REGISTRY_TTL', 300))
@@ -0,0 +1,66 @@
+from django.conf import settings
+
+from .latency_tracker import latency_tracker
+
+
+class ModelRouter:
+    """Picks the LLMModel answering a request for a model class.
+
+    Candidates are the active models of the class (``model_type``, or every
+    active model for ``any``). Models whose context window cannot hold the
+    prompt and the output are only used when none can, then the largest one
+    wins. Among the others, a model with fewer than QUERY_ROUTER_MIN_SAMPLES
+    recorded calls (failed ones included) is tried first so every model gets
+    measured; otherwise the lowest expected latency wins: the mean of the
+    rolling p50 and p95, inflated by the error rate since a failed call has to
+    be retried. Models failing more often than QUERY_ROUTER_MAX_ERROR_RATE are
+    only used when every fitting model does, then the least failing one wins.
+    """
+
+    ANY = 'any'
+
+    def __init__(self, tracker=None):
+        self.tracker = tracker or latency_tracker
+
+    def choose(self, llmmodels, model_class, required_tokens=0):
+        """The best of ``llmmodels`` for ``model_class`` and a prompt of ``required_tokens``
+
+        Raises:
+            ValueError: If no active model is of the class
+        """
+        candidates = [
+            llmmodel for llmmodel in llmmodels
+            if llmmodel.is_active and model_class in (self.ANY, llmmodel.model_type)
+        ]
+        if not candidates:
+            raise ValueError(f"No active model of class '{model_class}'")
+
+        fitting = [llmmodel for llmmodel in candidates if self.fits(llmmodel, required_tokens)]
+        if not fitting:
+            return max(candidates, key=lambda llmmodel: llmmodel.context_window - llmmodel.max_output_tokens)
+        return min(fitting, key=self.score)
+
+    @staticmethod
+    def fits(llmmodel, required_tokens):
+        available = (
+            llmmodel.context_window - llmmodel.max_output_tokens
+            - getattr(settings, 'QUERY_PROMPT_TOKEN_RESERVE', 256)
+        )
+        return available >= required_tokens
+
+    def score(self, llmmodel):
+        """Sort key of a fitting model, lower is better"""
+        calls = self.tracker.calls(llmmodel.model_code)
+        if calls < getattr(settings, 'QUERY_ROUTER_MIN_SAMPLES', 5):
+            return (0, calls, llmmodel.name)
+
+        error_rate = self.tracker.error_rate(llmmodel.model_code) or 0
+        p50 = self.tracker.percentile(llmmodel.model_code, 0.5)
+        if error_rate > getattr(settings, 'QUERY_ROUTER_MAX_ERROR_RATE', 0.5) or p50 is None:
+            return (2, error_rate, llmmodel.name)
+
+        p95 = self.tracker.percentile(llmmodel.model_code, 0.95)
+        return (1, (p50 + p95) / 2 / (1 - min(error_rate, 0.9)), llmmodel.name)
+
+
+model_router = ModelRouter()
@@ -0,0 +1,147 @@
+import importlib.util
+import os
+
+from django.conf import settings
+from langchain_groq import ChatGroq
+
+from .stub_llm import StubChatModel
+
+
+class ProviderAdapter:
+    """Creates the chat client of an LLMModel for one provider
+
+    Clients answer ``invoke``/``ainvoke``/``stream``/``astream`` with messages
+    carrying ``content``, like the LangChain chat models. They do not retry:
+    QueryGenerationService does, to count retries. ``package`` is the module
+    the client comes from when it is imported on first use.
+    """
+    name = None
+    api_key_env = None
+    package = None
+
+    def is_available(self):
+        """Whether the client's package is installed"""
+        return self.package is None or importlib.util.find_spec(self.package) is not None
+
+    def api_key(self):
+        return os.getenv(self.api_key_env) if self.api_key_env else None
+
+    def create_client(self, llmmodel, api_key):
+        raise NotImplementedError
+
+
+class GroqAdapter(ProviderAdapter):
+    name = 'groq'
+    api_key_env = 'GROQ_API_KEY'
+
+    def create_client(self, llmmodel, api_key):
+        options = {'base_url': llmmodel.base_url} if llmmodel.base_url else {}
+        return ChatGroq(
+            model_name=llmmodel.model_code,
+            temperature=llmmodel.default_temperature,
+            api_key=api_key,
+            max_retries=0,
+            **options
+        )
+
+
+class OpenAIAdapter(ProviderAdapter):
+    name = 'openai'
+    api_key_env = 'OPENAI_API_KEY'
+    package = 'langchain_openai'
+
+    def create_client(self, llmmodel, api_key):
+        from langchain_openai import ChatOpenAI
+
+        options = {'base_url': llmmodel.base_url} if llmmodel.base_url else {}
+        return ChatOpenAI(
+            model=llmmodel.model_code,
+            temperature=llmmodel.default_temperature,
+            max_tokens=llmmodel.max_output_tokens,
+            api_key=api_key,
+            max_retries=0,
+            **options
+        )
+
+
+class AnthropicAdapter(ProviderAdapter):
+    name = 'anthropic'
+    api_key_env = 'ANTHROPIC_API_KEY'
+    package = 'langchain_anthropic'
+
+    def create_client(self, llmmodel, api_key):
+        from langchain_anthropic import ChatAnthropic
+
+        options = {'base_url': llmmodel.base_url} if llmmodel.base_url else {}
+        return ChatAnthropic(
+            model=llmmodel.model_code,
+            temperature=llmmodel.default_temperature,
+            max_tokens=llmmodel.max_output_tokens,
+            api_key=api_key,
+            max_retries=0,
+            **options
+        )
+
+
+class MistralAdapter(ProviderAdapter):
+    name = 'mistral'
+    api_key_env = 'MISTRAL_API_KEY'
+    package = 'langchain_mistralai'
+
+    def create_client(self, llmmodel, api_key):
+        from langchain_mistralai import ChatMistralAI
+
+        options = {'endpoint': llmmodel.base_url} if llmmodel.base_url else {}
+        return ChatMistralAI(
+            model=llmmodel.model_code,
+            temperature=llmmodel.default_temperature,
+            max_tokens=llmmodel.max_output_tokens,
+            api_key=api_key,
+            max_retries=0,
+            **options
+        )
+
+
+class StubAdapter(ProviderAdapter):
+    """Offline StubChatModel, configured by the LLM_STUB_* settings"""
+    name = 'stub'
+
+    def create_client(self, llmmodel, api_key):
+        return StubChatModel(
+            model_name=llmmodel.model_code,
+            latency_ms=getattr(settings, 'LLM_STUB_LATENCY_MS', 300),
+            tokens_per_second=getattr(settings, 'LLM_STUB_TOKENS_PER_SECOND', 250),
+            seed=getattr(settings, 'LLM_STUB_SEED', None),
+            templates=getattr(settings, 'LLM_STUB_TEMPLATES', None)
+        )
+
+
+PROVIDER_ADAPTERS = {
+    adapter.name: adapter
+    for adapter in (GroqAdapter(), OpenAIAdapter(), AnthropicAdapter(), MistralAdapter(), StubAdapter())
+}
+
+
+def uses_stub(llmmodel):
+    """Whether ``llmmodel`` is answered by the offline stub (LLM_STUB_PROVIDERS / LLM_STUB_ALL)"""
+    return getattr(settings, 'LLM_STUB_ALL', False) or llmmodel.provider in getattr(settings, 'LLM_STUB_PROVIDERS', ())
+
+
+def get_adapter(llmmodel):
+    """Adapter creating ``llmmodel``'s client
+
+    Raises:
+        ValueError: If the model's provider has no adapter or its package is
+            not installed
+    """
+    if uses_stub(llmmodel):
+        return PROVIDER_ADAPTERS['stub']
+    adapter = PROVIDER_ADAPTERS.get(llmmodel.provider)
+    if adapter is None:
+        raise ValueError(f"Unsupported LLM provider: {llmmodel.provider}")
+    if not adapter.is_available():
+        raise ValueError(
+            f"LLM provider '{llmmodel.provider}' of model '{llmmodel.name}' requires the "
+            f"'{adapter.package}' package, which is not installed"
+        )
+    return adapter
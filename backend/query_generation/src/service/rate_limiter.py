@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import time
+
+from django.conf import settings
+
+
+class TokenBucket:
+    """Token bucket refilled at ``rate`` tokens per second up to ``capacity``
+
+    Callers reserve tokens up front and the balance may go negative: a caller
+    then waits until the refill has covered its share, so waiters are served
+    in arrival order and nobody polls.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        """Take ``amount`` tokens, returning the seconds to wait before using them"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.rate)
+
+    async def acquire(self, amount=1):
+        delay = self.reserve(amount)
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class ProviderRateLimiter:
+    """Requests-per-minute and optional tokens-per-minute limits of one LLM provider"""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests = TokenBucket(requests_per_minute / 60, requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute) if tokens_per_minute else None
+
+    async def acquire(self, tokens=0):
+        """Wait until a request of ``tokens`` estimated tokens may be sent"""
+        if self.requests:
+            await self.requests.acquire()
+        if self.tokens and tokens:
+            await self.tokens.acquire(tokens)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider):
+    """Process-wide limiter of ``provider`` as configured in LLM_PROVIDER_RATE_LIMITS
+
+    Providers without limits get a limiter that never waits.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            limits = getattr(settings, 'LLM_PROVIDER_RATE_LIMITS', {}).get(provider, {})
+            limiter = _limiters[provider] = ProviderRateLimiter(**limits)
+        return limiter
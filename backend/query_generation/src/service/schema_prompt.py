@@ -0,0 +1,197 @@
+import math
+import re
+
+# Long catalog type names and their usual short forms
+TYPE_ALIASES = {
+    'character varying': 'varchar',
+    'character': 'char',
+    'timestamp without time zone': 'timestamp',
+    'timestamp with time zone': 'timestamptz',
+    'time without time zone': 'time',
+    'time with time zone': 'timetz',
+    'double precision': 'double',
+    'boolean': 'bool',
+    'integer': 'int',
+}
+
+SAMPLE_VALUES_PER_COLUMN = 3
+SAMPLE_VALUE_MAX_CHARS = 24
+DESCRIPTION_MAX_CHARS = 60
+
+_TOKEN_PIECES = re.compile(r'\w+|[^\w\s]')
+
+
+def estimate_tokens(text):
+    """Conservative token count of a text for BPE tokenizers
+
+    Words count one token per four characters and every punctuation mark one
+    token, which slightly overestimates the Llama/Mixtral/GPT tokenizers on
+    SQL and identifiers, so prompts stay under budget without a tokenizer.
+    """
+    return sum(math.ceil(len(piece) / 4) for piece in _TOKEN_PIECES.findall(text or ''))
+
+
+def truncate(value, max_chars):
+    value = ' '.join(str(value).split())
+    return value if len(value) <= max_chars else value[:max_chars - 1] + '…'
+
+
+class _Column:
+    def __init__(self, column, key, score, samples):
+        data_type = str(column.get('type') or '')
+        definition = f"{column.get('name')} {TYPE_ALIASES.get(data_type.lower(), data_type)}".strip()
+        if key:
+            definition += ' PK'
+        if column.get('description'):
+            definition += f' "{truncate(column["description"], DESCRIPTION_MAX_CHARS)}"'
+
+        self.name = column.get('name')
+        self.definition = definition
+        self.samples = f" e.g. {' | '.join(samples)}" if samples else ''
+        self.key = key
+        self.score = score
+        self.kept = True
+        self.tokens = estimate_tokens(definition) + 1
+        self.sample_tokens = estimate_tokens(self.samples)
+
+    def render(self, with_samples):
+        return self.definition + (self.samples if with_samples else '')
+
+
+class _Table:
+    def __init__(self, name, table_info, primary_key, key_columns, column_scores):
+        self.name = name
+        self.with_samples = True
+        self.kept = True
+
+        sample_rows = table_info.get('sample_rows')
+        if not isinstance(sample_rows, list):
+            sample_rows = []
+        self.columns = []
+        for column in table_info.get('columns', []):
+            column_name = column.get('name')
+            samples = []
+            for row in sample_rows:
+                value = row.get(column_name) if isinstance(row, dict) else None
+                if value is None:
+                    continue
+                text = truncate(value, SAMPLE_VALUE_MAX_CHARS)
+                if text not in samples:
+                    samples.append(text)
+                if len(samples) >= SAMPLE_VALUES_PER_COLUMN:
+                    break
+            self.columns.append(_Column(
+                column,
+                key=column_name in primary_key,
+                score=float('inf') if column_name in key_columns else column_scores.get(column_name, 0),
+                samples=samples
+            ))
+        self.header_tokens = estimate_tokens(f"{name}()") + 1
+
+    @property
+    def tokens(self):
+        if not self.kept:
+            return 0
+        return self.header_tokens + sum(self.column_tokens(column) for column in self.columns if column.kept)
+
+    def column_tokens(self, column):
+        return column.tokens + (column.sample_tokens if self.with_samples else 0)
+
+    def render(self):
+        columns = ', '.join(column.render(self.with_samples) for column in self.columns if column.kept)
+        return f"{self.name}({columns})"
+
+
+def serialize_schema(schema_info, budget=None, relationships=None, column_scores=None):
+    """Compact DDL-like rendering of a schema for prompts, fitted into a token budget
+
+    Every table becomes one ``table(column type [PK] ["description"] [e.g.
+    sample | values], ...)`` line, in the order of ``schema_info['tables']``
+    (most relevant first). When the estimated size exceeds ``budget`` the
+    schema is reduced step by step until it fits: sample values are dropped,
+    least relevant table first; then the columns with the lowest relevance,
+    keeping key columns, and a table that loses its last column with them;
+    then whole tables from the least relevant one. The size is kept as a
+    running total, so fitting takes one pass over the tables and columns.
+
+    Args:
+        schema_info: Schema dictionary with ``tables``
+        budget: Optional maximum number of estimated tokens
+        relationships: Optional ``{'primary_keys', 'foreign_keys'}``; key
+            columns are marked and kept as long as their table is
+        column_scores: Optional ``{table: {column: relevance}}``
+
+    Returns:
+        Tuple of the text and a report with ``estimated_tokens``, ``budget``,
+        ``tables`` (the tables rendered), ``samples_dropped`` (tables),
+        ``columns_dropped`` and ``tables_dropped``
+    """
+    relationships = relationships or {}
+    column_scores = column_scores or {}
+    primary_keys = relationships.get('primary_keys', {})
+    key_columns = {}
+    for table, columns in primary_keys.items():
+        key_columns.setdefault(table, set()).update(columns)
+    for foreign_key in relationships.get('foreign_keys', []):
+        key_columns.setdefault(foreign_key['table'], set()).update(foreign_key['columns'])
+        key_columns.setdefault(foreign_key['referenced_table'], set()).update(foreign_key['referenced_columns'])
+
+    header = ' '.join(
+        f"{key}={value}" for key, value in schema_info.items()
+        if key not in ('tables', 'relationships') and isinstance(value, (str, int)) and value != ''
+    )
+    header = f"-- {header}" if header else ''
+    tables = [
+        _Table(name, table_info, set(primary_keys.get(name, [])), key_columns.get(name, set()),
+               column_scores.get(name, {}))
+        for name, table_info in schema_info.get('tables', {}).items()
+    ]
+    report = {'budget': budget, 'samples_dropped': 0, 'columns_dropped': 0, 'tables_dropped': []}
+
+    total = estimate_tokens(header) + sum(table.tokens for table in tables)
+
+    if budget is not None:
+        for table in reversed(tables):
+            if total <= budget:
+                break
+            if table.with_samples and any(column.samples for column in table.columns):
+                total -= sum(column.sample_tokens for column in table.columns if column.kept)
+                table.with_samples = False
+                report['samples_dropped'] += 1
+
+        droppable = sorted(
+            (
+                (column.score, -table_index, -column_index, table, column)
+                for table_index, table in enumerate(tables)
+                for column_index, column in enumerate(table.columns)
+                if column.score != float('inf')
+            ),
+            key=lambda item: item[:3]
+        )
+        for _, _, _, table, column in droppable:
+            if total <= budget:
+                break
+            if not table.kept:
+                continue
+            total -= table.column_tokens(column)
+            column.kept = False
+            report['columns_dropped'] += 1
+            if table is not tables[0] and not any(other.kept for other in table.columns):
+                total -= table.tokens
+                table.kept = False
+                report['tables_dropped'].append(table.name)
+
+        for table in reversed(tables[1:]):
+            if total <= budget:
+                break
+            if not table.kept:
+                continue
+            total -= table.tokens
+            table.kept = False
+            report['tables_dropped'].append(table.name)
+
+    lines = ([header] if header else []) + [table.render() for table in tables if table.kept]
+    text = '\n'.join(lines)
+    report['tables'] = [table.name for table in tables if table.kept]
+    report['estimated_tokens'] = estimate_tokens(text)
+    return text, report
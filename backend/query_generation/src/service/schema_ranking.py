@@ -0,0 +1,214 @@
+import hashlib
+import json
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from project_management.src.service.relationship_graph import build_relationship_graph, empty_relationships, join_path
+
+STOP_WORDS = {
+    'a', 'all', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'each', 'for', 'from', 'get', 'give', 'how',
+    'i', 'in', 'is', 'it', 'list', 'me', 'many', 'much', 'of', 'on', 'or', 'per', 'query', 'show', 'that',
+    'the', 'their', 'them', 'this', 'to', 'what', 'which', 'who', 'with', 'write'
+}
+
+# How many times a table's name counts against its column names and descriptions
+TABLE_NAME_WEIGHT = 3
+COLUMN_NAME_WEIGHT = 2
+
+
+def tokenize(text):
+    """Lower-case terms of a name or sentence, splitting snake_case and camelCase
+
+    Plural ``s`` is stripped so ``orders`` matches a table named ``order``.
+    """
+    text = re.sub(r'([a-z0-9])([A-Z])', r'\1 \2', str(text or ''))
+    terms = []
+    for word in re.findall(r'[a-z0-9]+', text.lower()):
+        if word in STOP_WORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+def schema_hash(schema_info):
+    """Stable hash of what a SchemaIndex is built from
+
+    Only table and column names and descriptions and the relationships are
+    hashed, not sample rows or other table properties, which can be large.
+    """
+    structure = {
+        'tables': [
+            (table, table_info.get('description'),
+             [(column.get('name'), column.get('description')) for column in table_info.get('columns', [])])
+            for table, table_info in schema_info.get('tables', {}).items()
+        ],
+        'relationships': schema_info.get('relationships')
+    }
+    encoded = json.dumps(structure, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class BM25:
+    """Okapi BM25 over a fixed set of documents, each a list of terms"""
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_frequencies = [Counter(document) for document in documents]
+        self.lengths = [len(document) for document in documents]
+        self.average_length = sum(self.lengths) / len(documents) if documents else 0
+
+        document_frequencies = Counter(term for frequencies in self.term_frequencies for term in frequencies)
+        count = len(documents)
+        self.idf = {
+            term: math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequencies.items()
+        }
+
+    def score(self, query_terms, index):
+        frequencies = self.term_frequencies[index]
+        norm = self.k1 * (1 - self.b + self.b * self.lengths[index] / (self.average_length or 1))
+        score = 0.0
+        for term in query_terms:
+            frequency = frequencies.get(term)
+            if frequency:
+                score += self.idf[term] * frequency * (self.k1 + 1) / (frequency + norm)
+        return score
+
+
+class SchemaIndex:
+    """Relevance index of one schema's tables and columns.
+
+    Tables are documents made of their name, column names and descriptions;
+    columns are documents made of their name and description. The index and
+    the schema's foreign key graph are built once and reused for every prompt
+    against the same schema (see ``get_schema_index``).
+    """
+
+    def __init__(self, schema_info):
+        self.tables = list(schema_info.get('tables', {}))
+        relationships = schema_info.get('relationships') or empty_relationships()
+        self.graph = build_relationship_graph(relationships, self.tables)
+
+        table_documents, column_documents, self.columns, self.sizes = [], [], [], {}
+        for table in self.tables:
+            table_info = schema_info['tables'][table]
+            self.sizes[table] = len(table_info.get('columns', []))
+            document = tokenize(table) * TABLE_NAME_WEIGHT + tokenize(table_info.get('description'))
+            for column in table_info.get('columns', []):
+                column_terms = tokenize(column.get('name')) * COLUMN_NAME_WEIGHT + tokenize(column.get('description'))
+                document.extend(column_terms)
+                column_documents.append(column_terms)
+                self.columns.append((table, column.get('name')))
+            table_documents.append(document)
+
+        self.table_index = BM25(table_documents)
+        self.column_index = BM25(column_documents)
+
+    def rank_tables(self, prompt):
+        """Every table with its relevance to ``prompt``, most relevant first"""
+        terms = tokenize(prompt)
+        scores = [(table, self.table_index.score(terms, index)) for index, table in enumerate(self.tables)]
+        return sorted(scores, key=lambda item: -item[1])
+
+    def column_scores(self, prompt):
+        """Relevance of every column to ``prompt`` as ``{table: {column: score}}``"""
+        terms = tokenize(prompt)
+        scores = {table: {} for table in self.tables}
+        for index, (table, column) in enumerate(self.columns):
+            scores[table][column] = self.column_index.score(terms, index)
+        return scores
+
+    def central_tables(self):
+        """Every table, the most connected and then the widest first"""
+        return sorted(self.tables, key=lambda table: (-self.graph.degree(table), -self.sizes[table]))
+
+    def relevant_tables(self, prompt, top_k):
+        """Tables to show the model for ``prompt``
+
+        Returns:
+            Tuple of the kept table names, most relevant first, and the foreign
+            keys joining them. The ``top_k`` best matching tables are kept with
+            the tables on the join path between them and their direct foreign
+            key neighbours. When no table matches at all, the ``top_k`` tables
+            with the most foreign keys (then the most columns) are kept with the
+            join path between them.
+        """
+        ranked = self.rank_tables(prompt)
+        top = [table for table, score in ranked[:top_k] if score > 0]
+        if not top:
+            ranked = [(table, 0) for table in self.central_tables()]
+            kept = set(join_path(self.graph, [table for table, _ in ranked[:top_k]])['tables'])
+        else:
+            kept = set(join_path(self.graph, top)['tables'])
+            for table in top:
+                kept.update(self.graph.neighbors(table))
+
+        foreign_keys = [
+            foreign_key
+            for left, right, data in self.graph.edges(data=True) if left in kept and right in kept
+            for foreign_key in data['foreign_keys']
+        ]
+        return [table for table, _ in ranked if table in kept], foreign_keys
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _cached_index(key):
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+        return index
+
+
+def get_schema_index(schema_info, key=None):
+    """SchemaIndex of a schema, shared by all prompts while the schema is unchanged
+
+    ``key`` identifies the schema's content when the caller knows it (the
+    ``schema_hash`` sent with a project's schema), which spares hashing the
+    schema. An index found under it is only used if it has the same tables.
+    """
+    given = key is not None
+    key = f'given:{key}' if given else schema_hash(schema_info)
+    index = _cached_index(key)
+    if index is not None and given and index.tables != list(schema_info.get('tables', {})):
+        key = schema_hash(schema_info)
+        index = _cached_index(key)
+    if index is not None:
+        return index
+
+    index = SchemaIndex(schema_info)
+    with _indexes_lock:
+        _indexes[key] = index
+        _indexes.move_to_end(key)
+        while len(_indexes) > getattr(settings, 'QUERY_SCHEMA_INDEX_CACHE_SIZE', 64):
+            _indexes.popitem(last=False)
+    return index
+
+
+def prune_schema(schema_info, prompt, top_k=None, index=None, key=None):
+    """Reduce a schema to the tables relevant to ``prompt``
+
+    ``index`` is the schema's SchemaIndex when the caller already has it, e.g.
+    for a batch of prompts against the same schema; otherwise it is looked up
+    with ``key`` (see ``get_schema_index``).
+
+    Returns:
+        Tuple of the pruned schema (without ``relationships``, tables most
+        relevant first), the foreign keys joining its tables and the index used
+    """
+    top_k = top_k or getattr(settings, 'QUERY_SCHEMA_TOP_K', 8)
+    index = index or get_schema_index(schema_info, key)
+    tables, foreign_keys = index.relevant_tables(prompt, top_k)
+
+    pruned = {key: value for key, value in schema_info.items() if key not in ('tables', 'relationships')}
+    pruned['tables'] = {table: schema_info['tables'][table] for table in tables}
+    return pruned, foreign_keys, index
@@ -0,0 +1,128 @@
+import asyncio
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one.
+
+    The first caller of a key (the leader) does the work; callers arriving
+    while it runs (followers) wait for its result instead. Sync and async
+    callers share the same calls through ``concurrent.futures.Future``, so a
+    request served by a worker thread can follow one served by an event loop
+    and the other way around.
+
+    A follower waiting longer than ``timeout`` seconds does the work itself.
+    Every caller of a key counts as a waiter; when the last async waiter is
+    cancelled, the leader's work is cancelled too.
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self._calls = {}
+        self._waiters = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Result of ``fn()``, or of the call already running for ``key``
+
+        Returns:
+            Tuple of the result and whether it came from another caller
+        """
+        future, leader = self._join(key)
+        if not leader:
+            try:
+                return future.result(timeout=self.timeout), True
+            except FutureTimeoutError:
+                self._abandon(key, future)
+                return fn(), False
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result=result)
+        return result, False
+
+    async def ado(self, key, fn):
+        """Async variant of ``do``, ``fn`` returning an awaitable
+
+        The leader's work runs as its own task, so followers still get a result
+        when the leader's caller goes away. It is cancelled once nobody waits
+        for it any more.
+        """
+        future, leader = self._join(key)
+        if not leader:
+            waiter = asyncio.wrap_future(future)
+            try:
+                return await asyncio.wait_for(asyncio.shield(waiter), self.timeout), True
+            except asyncio.TimeoutError:
+                waiter.cancel()
+                self._abandon(key, future)
+                return await fn(), False
+            except asyncio.CancelledError:
+                waiter.cancel()
+                self._abandon(key, future)
+                raise
+
+        task = asyncio.ensure_future(fn())
+        with self._lock:
+            if self._calls.get(key) is future:
+                self._tasks[key] = task
+
+        def settle(task):
+            if task.cancelled():
+                self._settle(key, future, error=Exception("The coalesced call was cancelled"))
+            elif task.exception() is not None:
+                self._settle(key, future, error=task.exception())
+            else:
+                self._settle(key, future, result=task.result())
+
+        task.add_done_callback(settle)
+        try:
+            return await asyncio.shield(task), False
+        except asyncio.CancelledError:
+            self._abandon(key, future)
+            raise
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def _join(self, key):
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self._waiters[key] += 1
+                return future, False
+            future = self._calls[key] = Future()
+            self._waiters[key] = 1
+            # A running future cannot be cancelled by one of its waiters
+            future.set_running_or_notify_cancel()
+            return future, True
+
+    def _abandon(self, key, future):
+        """A waiter of ``key`` stopped waiting; cancel the leader's task if it was the last one"""
+        with self._lock:
+            if self._calls.get(key) is not future:
+                return
+            self._waiters[key] -= 1
+            if self._waiters[key]:
+                return
+            # Later callers start a new call instead of joining the cancelled one
+            del self._calls[key], self._waiters[key]
+            task = self._tasks.pop(key, None)
+        if task is not None and not task.done():
+            task.get_loop().call_soon_threadsafe(task.cancel)
+
+    def _settle(self, key, future, result=None, error=None):
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key], self._waiters[key]
+                self._tasks.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
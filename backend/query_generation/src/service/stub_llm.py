@@ -0,0 +1,177 @@
+import asyncio
+import random
+import re
+import threading
+import time
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from .schema_prompt import estimate_tokens
+
+# SQL answered by the stub, chosen from the request's wording
+TEMPLATES = {
+    'select': "SELECT {columns}\nFROM {table}\nLIMIT {limit}",
+    'count': "SELECT {group_select}COUNT(*) AS row_count\nFROM {table}{group_by}",
+    'aggregate': "SELECT {group_select}{function}({measure}) AS {alias}\nFROM {table}{group_by}",
+    'top': "SELECT {columns}\nFROM {table}\nORDER BY {order_column} DESC\nLIMIT {limit}",
+    'join': "SELECT {table}.*, {joined_table}.*\nFROM {table}\nJOIN {joined_table} ON {condition}\nLIMIT {limit}",
+}
+
+AGGREGATE_WORDS = {'total': 'SUM', 'sum': 'SUM', 'average': 'AVG', 'avg': 'AVG', 'mean': 'AVG',
+                   'maximum': 'MAX', 'max': 'MAX', 'minimum': 'MIN', 'min': 'MIN'}
+NUMERIC_TYPES = {'int', 'integer', 'bigint', 'smallint', 'numeric', 'decimal', 'double', 'float', 'real', 'number',
+                 'int64', 'float64'}
+DEFAULT_LIMIT = 100
+
+_TABLE_LINE = re.compile(r'^\s*([\w.]+)\((.*)\)\s*$')
+_COLUMN = re.compile(r'(?:^|,\s)([A-Za-z_]\w*)\s+([A-Za-z_]\w*)')
+_JOIN_LINE = re.compile(r'^\s*-\s*(\w[\w.]*\.\w+\s*=\s*\w[\w.]*\.\w+.*)$')
+_TOKEN = re.compile(r'\s*\S{1,4}')
+
+
+def sample(spec, rng):
+    """One draw from a distribution spec, never negative
+
+    ``spec`` is a number or a dictionary with ``distribution`` and its
+    parameters: ``constant`` (value), ``uniform`` (low, high), ``normal``
+    (mean, stddev) or ``lognormal`` (median, sigma).
+    """
+    if isinstance(spec, (int, float)):
+        return max(0.0, float(spec))
+    distribution = spec.get('distribution', 'constant')
+    if distribution == 'constant':
+        value = spec['value']
+    elif distribution == 'uniform':
+        value = rng.uniform(spec['low'], spec['high'])
+    elif distribution == 'normal':
+        value = rng.gauss(spec['mean'], spec['stddev'])
+    elif distribution == 'lognormal':
+        value = spec['median'] * rng.lognormvariate(0, spec['sigma'])
+    else:
+        raise ValueError(f"Unknown distribution: {distribution}")
+    return max(0.0, float(value))
+
+
+def parse_prompt(text):
+    """Tables (in prompt order, with their columns and types), request and join conditions of a generation prompt"""
+    tables, joins, request = {}, [], ''
+    for line in text.splitlines():
+        table_line = _TABLE_LINE.match(line)
+        join_line = _JOIN_LINE.match(line)
+        if 'User Request:' in line:
+            request = line.split('User Request:', 1)[1].strip()
+        elif join_line:
+            joins.append(join_line.group(1).strip())
+        elif table_line and not line.strip().startswith('-'):
+            tables[table_line.group(1)] = _COLUMN.findall(table_line.group(2))
+    return tables, request, joins
+
+
+def render_sql(text, templates=None):
+    """Deterministic SQL answering a generation prompt from the templates"""
+    templates = {**TEMPLATES, **(templates or {})}
+    tables, request, joins = parse_prompt(text)
+    if not tables:
+        return "SELECT 1"
+
+    words = re.findall(r'[a-z0-9_]+', request.lower())
+    table, columns = next(iter(tables.items()))
+    names = [name for name, _ in columns] or ['*']
+    numeric = [name for name, data_type in columns if data_type.lower() in NUMERIC_TYPES and name != 'id']
+    limit = next((int(word) for word in words if word.isdigit()), DEFAULT_LIMIT)
+
+    group_column = next(
+        (following for word, following in zip(words, words[1:]) if word in ('per', 'by', 'each') and following in names),
+        None
+    )
+    values = {
+        'table': table,
+        'columns': ', '.join(names[:8]),
+        'limit': limit,
+        'group_select': f"{group_column}, " if group_column else '',
+        'group_by': f"\nGROUP BY {group_column}" if group_column else '',
+    }
+
+    function = next((AGGREGATE_WORDS[word] for word in words if word in AGGREGATE_WORDS), None)
+    if function and numeric:
+        measure = next((name for name in numeric if name in words), numeric[0])
+        template = templates['aggregate']
+        values.update(function=function, measure=measure, alias=f"{function.lower()}_{measure}")
+    elif {'count', 'many', 'number'} & set(words):
+        template = templates['count']
+    elif {'top', 'latest', 'last', 'recent', 'highest'} & set(words):
+        template = templates['top']
+        values['order_column'] = next(
+            (name for name, data_type in columns if 'date' in data_type.lower() or 'time' in data_type.lower()),
+            numeric[0] if numeric else names[0]
+        )
+        values['limit'] = limit if limit != DEFAULT_LIMIT else 10
+    elif joins and len(tables) > 1:
+        condition = joins[0]
+        joined_table = next((name for name in tables if name != table and f"{name}." in condition), None)
+        if joined_table and f"{table}." in condition:
+            template = templates['join']
+            values.update(joined_table=joined_table, condition=condition)
+        else:
+            template = templates['select']
+    else:
+        template = templates['select']
+    return template.format(**values)
+
+
+class StubChatModel:
+    """Offline stand-in for a chat model client answering from local SQL templates.
+
+    Answers are deterministic for a prompt; only timing is random. Every call
+    waits a time-to-first-token drawn from ``latency_ms`` and then streams the
+    completion at a rate drawn from ``tokens_per_second``. Draws are
+    reproducible with a ``seed``. Responses carry ``usage_metadata`` like the
+    provider clients.
+    """
+
+    def __init__(self, model_name='stub', latency_ms=300, tokens_per_second=250, seed=None, templates=None):
+        self.model_name = model_name
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.templates = templates
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def invoke(self, input, **kwargs):
+        content, usage, first_token, per_token = self._plan(input)
+        time.sleep(first_token + per_token * usage['output_tokens'])
+        return AIMessage(content=content, usage_metadata=usage, response_metadata={'model_name': self.model_name})
+
+    async def ainvoke(self, input, **kwargs):
+        content, usage, first_token, per_token = self._plan(input)
+        await asyncio.sleep(first_token + per_token * usage['output_tokens'])
+        return AIMessage(content=content, usage_metadata=usage, response_metadata={'model_name': self.model_name})
+
+    def stream(self, input, **kwargs):
+        content, usage, first_token, per_token = self._plan(input)
+        time.sleep(first_token)
+        for index, piece in enumerate(_TOKEN.findall(content)):
+            if index:
+                time.sleep(per_token)
+            yield AIMessageChunk(content=piece)
+        yield AIMessageChunk(content='', usage_metadata=usage)
+
+    async def astream(self, input, **kwargs):
+        content, usage, first_token, per_token = self._plan(input)
+        await asyncio.sleep(first_token)
+        for index, piece in enumerate(_TOKEN.findall(content)):
+            if index:
+                await asyncio.sleep(per_token)
+            yield AIMessageChunk(content=piece)
+        yield AIMessageChunk(content='', usage_metadata=usage)
+
+    def _plan(self, input):
+        text = input if isinstance(input, str) else str(input)
+        content = f"```sql\n{render_sql(text, self.templates)};\n```"
+        input_tokens, output_tokens = estimate_tokens(text), len(_TOKEN.findall(content))
+        with self._lock:
+            first_token = sample(self.latency_ms, self._rng) / 1000
+            tokens_per_second = sample(self.tokens_per_second, self._rng)
+        usage = {'input_tokens': input_tokens, 'output_tokens': output_tokens,
+                 'total_tokens': input_tokens + output_tokens}
+        return content, usage, first_token, 1 / tokens_per_second if tokens_per_second else 0.0
@@ -0,0 +1,156 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from ..repo.repository import LLMMetricsRepository
+from .latency_tracker import latency_tracker, percentile
+from .schema_prompt import estimate_tokens
+
+PERCENTILES = {'p50': 0.5, 'p95': 0.95, 'p99': 0.99}
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+
+def is_retryable(error):
+    """Whether a failed provider call may succeed when repeated: timeouts, connection errors, 429 and 5xx"""
+    status_code = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    if isinstance(status_code, int):
+        return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return type(error).__name__.endswith(('TimeoutError', 'ConnectionError', 'Timeout'))
+
+
+def retry_delay(retries):
+    """Seconds to wait before retry number ``retries``"""
+    return getattr(settings, 'QUERY_LLM_RETRY_BACKOFF', 0.5) * 2 ** (retries - 1)
+
+
+class CallTelemetry:
+    """Timing, token usage and retries of one provider call.
+
+    ``call_time_ms`` covers the whole call, retries included;
+    ``time_to_first_token_ms`` is measured from the start of the attempt that
+    answered. Token counts come from the provider's usage metadata and are
+    estimated from the texts when it reports none.
+    """
+
+    def __init__(self, llmmodel, prompt):
+        self.llmmodel = llmmodel
+        self.prompt = prompt
+        self.started = time.monotonic()
+        self.retries = 0
+        self.attempt()
+
+    def attempt(self):
+        self.attempt_started = time.monotonic()
+        self.first_token = None
+        self.usage = {}
+
+    def retry(self):
+        self.retries += 1
+
+    def chunk(self, chunk):
+        if chunk.content and self.first_token is None:
+            self.first_token = time.monotonic()
+        for key, value in (getattr(chunk, 'usage_metadata', None) or {}).items():
+            if key in ('input_tokens', 'output_tokens'):
+                self.usage[key] = self.usage.get(key, 0) + value
+
+    def finish(self, content=None, error=None):
+        """Fields of the LLMCallMetric of the call, also fed to the rolling latency tracker"""
+        call_time_ms = int((time.monotonic() - self.started) * 1000)
+        if error is None:
+            latency_tracker.record(self.llmmodel.model_code, call_time_ms)
+        else:
+            latency_tracker.record_error(self.llmmodel.model_code)
+
+        return {
+            'model_code': self.llmmodel.model_code,
+            'provider': self.llmmodel.provider,
+            'call_time_ms': call_time_ms,
+            'time_to_first_token_ms': (
+                int((self.first_token - self.attempt_started) * 1000) if self.first_token is not None else None
+            ),
+            'prompt_tokens': self.usage.get('input_tokens', estimate_tokens(self.prompt)),
+            'completion_tokens': self.usage.get('output_tokens', estimate_tokens(content or '')),
+            'tokens_estimated': not self.usage,
+            'retries': self.retries,
+            'succeeded': error is None,
+            'error': '' if error is None else f"{type(error).__name__}: {error}"[:255]
+        }
+
+
+def generation_telemetry(metrics):
+    """Telemetry of a call as kept with the GeneratedQuery"""
+    return {
+        key: metrics[key] for key in (
+            'call_time_ms', 'time_to_first_token_ms', 'prompt_tokens', 'completion_tokens', 'tokens_estimated', 'retries'
+        )
+    }
+
+
+def summarize(rows):
+    """Per model aggregates of LLMCallMetric rows
+
+    Args:
+        rows: Iterable of dictionaries with the LLMCallMetric fields
+
+    Returns:
+        ``{model_code: {...}}`` with the ``calls``, ``errors``, ``error_rate``
+        and ``retries`` counts and the p50/p95/p99 of call time, time to first
+        token, prompt and completion tokens and completion tokens per second
+        over the successful calls
+    """
+    by_model = {}
+    for row in rows:
+        by_model.setdefault(row['model_code'], []).append(row)
+
+    summary = {}
+    for model_code, model_rows in by_model.items():
+        succeeded = [row for row in model_rows if row['succeeded']]
+
+        def percentiles(values):
+            values = [value for value in values if value is not None]
+            return {name: percentile(values, fraction) for name, fraction in PERCENTILES.items()}
+
+        errors = len(model_rows) - len(succeeded)
+        summary[model_code] = {
+            'calls': len(model_rows),
+            'errors': errors,
+            'error_rate': round(errors / len(model_rows), 4),
+            'retries': sum(row['retries'] for row in model_rows),
+            'call_time_ms': percentiles(row['call_time_ms'] for row in succeeded),
+            'time_to_first_token_ms': percentiles(row['time_to_first_token_ms'] for row in succeeded),
+            'prompt_tokens': percentiles(row['prompt_tokens'] for row in succeeded),
+            'completion_tokens': percentiles(row['completion_tokens'] for row in succeeded),
+            'completion_tokens_per_second': percentiles(
+                round(row['completion_tokens'] * 1000 / row['call_time_ms'], 1)
+                for row in succeeded if row['call_time_ms']
+            ),
+        }
+    return summary
+
+
+_summary_cache = {}
+_summary_lock = threading.Lock()
+
+
+def get_llm_metrics(refresh=False):
+    """Per model aggregates of the calls of the last LLM_METRICS_WINDOW_HOURS, cached LLM_METRICS_CACHE_TTL seconds"""
+    with _summary_lock:
+        cached = _summary_cache.get('summary')
+    if not refresh and cached and time.monotonic() - cached[0] < getattr(settings, 'LLM_METRICS_CACHE_TTL', 30):
+        return cached[1]
+
+    window_hours = getattr(settings, 'LLM_METRICS_WINDOW_HOURS', 24)
+    rows = LLMMetricsRepository().recent_calls(
+        since=timezone.now() - timedelta(hours=window_hours),
+        limit=getattr(settings, 'LLM_METRICS_MAX_SAMPLES', 10000)
+    )
+    summary = summarize(rows)
+    with _summary_lock:
+        _summary_cache['summary'] = (time.monotonic(), summary)
+    return summary
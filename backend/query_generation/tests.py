@@ -1,3 +1,692 @@
-from django.test import TestCase
+import asyncio
+import unittest
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.utils import timezone
+from langchain_core.messages import AIMessageChunk
+from rest_framework.test import APIRequestFactory
+
+from query_generation import admin as generation_admin
+from query_generation.src.api import views
+from query_generation.src.repo.models import GenerationCacheEntry, LLMModel
+from query_generation.src.repo.repository import GenerationCacheRepository
+from query_generation.src.service import generation_service
+from query_generation.src.service.generation_cache import generation_key
+from query_generation.src.service.generation_service import QueryGenerationService
+from query_generation.src.service.latency_tracker import LatencyTracker, percentile
+from query_generation.src.service.llm_registry import LLMRegistry
+from query_generation.src.service.model_router import ModelRouter
+from query_generation.src.service.providers import PROVIDER_ADAPTERS, get_adapter
+from query_generation.src.service.rate_limiter import TokenBucket
+from query_generation.src.service.single_flight import SingleFlight
+from query_generation.src.service.stub_llm import render_sql
+from query_generation.src.service.telemetry import summarize
+
+from query_generation.src.service.schema_prompt import estimate_tokens, serialize_schema
+from query_generation.src.service.schema_ranking import get_schema_index, prune_schema, tokenize
+
+
+def foreign_key(table, column, referenced_table):
+    return {
+        'name': f'{table}_{column}_fkey',
+        'table': table,
+        'columns': [column],
+        'referenced_table': referenced_table,
+        'referenced_columns': ['id']
+    }
+
+
+class SchemaRankingTests(SimpleTestCase):
+    schema = {
+        'schema': 'public',
+        'tables': {
+            'customers': {'columns': [{'name': 'id'}, {'name': 'email'}, {'name': 'country'}]},
+            'orders': {'columns': [{'name': 'id'}, {'name': 'customer_id'}, {'name': 'total_amount'}]},
+            'order_items': {'columns': [{'name': 'order_id'}, {'name': 'product_id'}, {'name': 'quantity'}]},
+            'products': {'columns': [{'name': 'id'}, {'name': 'name'}, {'name': 'unit_price'}]},
+            'audit_log': {'columns': [{'name': 'event'}, {'name': 'createdAt'}]},
+            'employees': {'columns': [{'name': 'id'}, {'name': 'salary'}]},
+        },
+        'relationships': {
+            'primary_keys': {'customers': ['id'], 'orders': ['id']},
+            'foreign_keys': [
+                foreign_key('orders', 'customer_id', 'customers'),
+                foreign_key('order_items', 'order_id', 'orders'),
+                foreign_key('order_items', 'product_id', 'products'),
+            ]
+        }
+    }
+
+    def test_tokenize_splits_identifiers_and_plurals(self):
+        self.assertEqual(tokenize('Show total_amount of Orders by createdAt'), ['total', 'amount', 'order', 'created'])
+
+    def test_top_tables_are_kept_with_their_foreign_key_neighbours(self):
+        schema, foreign_keys, _ = prune_schema(self.schema, 'email and country of customers', top_k=1)
+
+        self.assertEqual(list(schema['tables']), ['customers', 'orders'])
+        self.assertNotIn('relationships', schema)
+        self.assertEqual([key['name'] for key in foreign_keys], ['orders_customer_id_fkey'])
+
+    def test_unmatched_prompt_keeps_the_most_connected_tables(self):
+        schema, foreign_keys, _ = prune_schema(self.schema, 'something unrelated', top_k=2)
+
+        self.assertEqual(list(schema['tables']), ['orders', 'order_items'])
+        self.assertEqual([key['name'] for key in foreign_keys], ['order_items_order_id_fkey'])
+
+    def test_index_is_built_once_per_schema(self):
+        self.assertIs(get_schema_index(self.schema), get_schema_index(dict(self.schema)))
+        with_samples = {**self.schema, 'tables': {
+            table: {**table_info, 'sample_rows': [{'id': 1}]} for table, table_info in self.schema['tables'].items()
+        }}
+        self.assertIs(get_schema_index(with_samples), get_schema_index(self.schema))
+
+        with mock.patch('query_generation.src.service.schema_ranking.schema_hash') as schema_hash:
+            index = get_schema_index(self.schema, key='v1')
+            self.assertIs(get_schema_index(self.schema, key='v1'), index)
+            schema_hash.assert_not_called()
+
+
+class SchemaPromptTests(SimpleTestCase):
+    schema = {
+        'schema': 'public',
+        'tables': {
+            'orders': {
+                'columns': [
+                    {'name': 'id', 'type': 'integer', 'nullable': False},
+                    {'name': 'customer_id', 'type': 'integer', 'nullable': True},
+                    {'name': 'status', 'type': 'character varying', 'nullable': True},
+                    {'name': 'note', 'type': 'text', 'nullable': True},
+                ],
+                'sample_rows': [
+                    {'id': 1, 'customer_id': 7, 'status': 'paid', 'note': 'x' * 100},
+                    {'id': 2, 'customer_id': 7, 'status': 'paid', 'note': None},
+                ]
+            },
+            'customers': {'columns': [{'name': 'id', 'type': 'integer'}], 'sample_rows': 'Error: timed out'},
+        }
+    }
+    relationships = {
+        'primary_keys': {'orders': ['id'], 'customers': ['id']},
+        'foreign_keys': [SchemaRankingTests.schema['relationships']['foreign_keys'][0]]
+    }
+    scores = {'orders': {'status': 2.0, 'note': 0.5}}
+
+    def test_schema_is_rendered_as_compact_table_lines(self):
+        text, report = serialize_schema(self.schema, relationships=self.relationships)
+
+        self.assertEqual(text.splitlines()[:2], [
+            '-- schema=public',
+            'orders(id int PK e.g. 1 | 2, customer_id int e.g. 7, status varchar e.g. paid, '
+            'note text e.g. ' + 'x' * 23 + '…)',
+        ])
+        self.assertEqual(text.splitlines()[2], 'customers(id int PK)')
+        self.assertLess(report['estimated_tokens'], estimate_tokens(str(self.schema)) / 2)
+
+    def test_samples_then_irrelevant_columns_then_tables_are_dropped(self):
+        full = serialize_schema(self.schema, relationships=self.relationships)[1]['estimated_tokens']
+
+        def fitted(budget):
+            return serialize_schema(self.schema, budget, self.relationships, self.scores)
+
+        text, report = fitted(full - 1)
+        self.assertNotIn('e.g.', text)
+        self.assertEqual(report['columns_dropped'], 0)
+
+        without_samples = report['estimated_tokens']
+        text, report = fitted(without_samples - 1)
+        self.assertIn('customer_id int', text)
+        self.assertNotIn('note', text)
+        self.assertLessEqual(report['estimated_tokens'], without_samples - 1)
+
+        text, report = fitted(1)
+        self.assertEqual(report['tables_dropped'], ['customers'])
+        self.assertEqual(report['tables'], ['orders'])
+
+    def test_tables_without_columns_left_are_dropped_instead_of_rendered_bare(self):
+        schema = {'tables': {
+            f'table_{index}': {'columns': [{'name': f'column_{column}', 'type': 'text'} for column in range(20)]}
+            for index in range(300)
+        }}
+
+        text, report = serialize_schema(schema, budget=2000)
+        self.assertLessEqual(report['estimated_tokens'], 2000)
+        self.assertNotIn('()', text)
+        self.assertEqual(len(report['tables']) + len(report['tables_dropped']), 300)
+
+
+def setUpModule():
+    # Provider calls are not recorded in the database
+    patcher = mock.patch.object(generation_service, 'LLMMetricsRepository', autospec=True)
+    patcher.start()
+    unittest.addModuleCleanup(patcher.stop)
+
+
+def streaming_client(respond):
+    """Chat client streaming what ``respond(prompt)`` resolves to as one chunk"""
+    async def astream(prompt):
+        yield AIMessageChunk(content=await respond(prompt))
+    return SimpleNamespace(astream=astream)
+
+
+def llm_model(**fields):
+    return SimpleNamespace(**{
+        'name': 'Llama3 70B', 'model_code': 'llama3-70b', 'api_model_name': 'llama3-70b-8192',
+        'provider': 'groq', 'context_window': 8192, 'max_output_tokens': 2048,
+        'default_temperature': 0.3, 'default_top_p': 0.9, 'base_url': None, 'is_default': False,
+        'is_active': True, 'model_type': 'chat', **fields
+    })
+
+
+class GenerationCacheTests(SimpleTestCase):
+    metadata = {'database_type': 'postgres', 'schema': SchemaRankingTests.schema}
+
+    def test_key_ignores_whitespace_and_trailing_punctuation(self):
+        key = generation_key('Total  amount per customer?', 'hash', 'llama3-70b', 0.3)
+        self.assertEqual(key, generation_key(' Total amount per customer ', 'hash', 'llama3-70b', 0.3))
+        self.assertNotEqual(key, generation_key('Total amount per customer', 'hash', 'llama3-70b', 0.7))
+
+    def test_cache_hit_skips_the_llm(self):
+        cache = mock.Mock()
+        cache.get.return_value = SimpleNamespace(
+            generated_query='SELECT 1', prepared_prompt='prompt', prompt_stats={'tables': []}
+        )
+        with mock.patch.object(generation_service.llm_registry, 'get_model', return_value=llm_model()), \
+                mock.patch.object(QueryGenerationService, 'generation_cache', return_value=cache), \
+                mock.patch.object(generation_service.llm_registry, 'get_client') as get_client:
+            result = QueryGenerationService.generate_query('orders per customer', self.metadata, 'Llama3 70B')
+
+        get_client.assert_not_called()
+        self.assertTrue(result['cache_hit'])
+        self.assertEqual(result['generated_query'], 'SELECT 1')
+        cache.get.assert_called_once_with(result['cache_key'])
+
+
+class GenerationCacheRepositoryTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # The app has no migrations; the table is dropped again when the class transaction rolls back
+        with connection.schema_editor() as editor:
+            editor.create_model(GenerationCacheEntry)
+
+    def put(self, repository, key):
+        return repository.put(key, {
+            'normalized_prompt': key, 'schema_hash': 'hash', 'model_code': 'llama3-70b', 'temperature': 0.3,
+            'generated_query': 'SELECT 1', 'prepared_prompt': 'prompt', 'prompt_stats': {}
+        })
+
+    def test_stores_only_evict_now_and_then_down_to_the_most_recently_used(self):
+        repository = GenerationCacheRepository(ttl=60, max_entries=2, evict_every=1000)
+        with mock.patch('query_generation.src.repo.repository.random.random', return_value=0.5):
+            for key in ('a', 'b', 'c', 'd'):
+                self.put(repository, key)
+        self.assertEqual(GenerationCacheEntry.objects.count(), 4)
+
+        GenerationCacheEntry.objects.filter(cache_key='a').update(created_at=timezone.now() - timedelta(minutes=5))
+        GenerationCacheEntry.objects.filter(cache_key='b').update(last_used_at=timezone.now())
+        repository.evict()
+        self.assertEqual(set(GenerationCacheEntry.objects.values_list('cache_key', flat=True)), {'b', 'd'})
+
+
+class AsyncGenerateQueryTests(SimpleTestCase):
+    metadata = {'database_type': 'postgres', 'schema': {'tables': {'orders': {'columns': [{'name': 'id'}]}}}}
+
+    def test_concurrent_generations_do_not_block_each_other(self):
+        async def respond(prompt):
+            await asyncio.sleep(0.2)
+            return 'SELECT 1'
+
+        async def generate_all():
+            return await asyncio.gather(*(
+                QueryGenerationService.agenerate_query(f'orders {index}', self.metadata, 'Llama3 70B', use_cache=False)
+                for index in range(50)
+            ))
+
+        client = streaming_client(respond)
+        with mock.patch.object(generation_service.llm_registry, 'aget_model',
+                               new=mock.AsyncMock(return_value=llm_model(provider='other'))), \
+                mock.patch.object(generation_service.llm_registry, 'get_async_client', return_value=client):
+            start = time.perf_counter()
+            results = asyncio.run(generate_all())
+
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertEqual({result['generated_query'] for result in results}, {'SELECT 1'})
+
+    def test_view_saves_and_validates_the_query(self):
+        body = {'user_requirements': 'orders', 'dataset_metadata': self.metadata,
+                'llm_provider': 'Llama3 70B', 'project_id': 1}
+        request = APIRequestFactory().post('/api/v1/query/generate/', body, format='json')
+        result = {'generated_query': 'SELECT 1', 'prepared_prompt': 'prompt', 'prompt_stats': {},
+                  'cache_hit': False, 'cache_key': 'key'}
+
+        with mock.patch.object(QueryGenerationService, 'agenerate_query', new=mock.AsyncMock(return_value=result)), \
+                mock.patch.object(views, 'GenerationRepository') as repository:
+            repository.return_value.asave_query_metadata = mock.AsyncMock(return_value=SimpleNamespace(query_id=7))
+            repository.return_value.aupdate_validation_status = mock.AsyncMock()
+            response = asyncio.run(views.generate_query(request))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['query_id'], 7)
+        repository.return_value.aupdate_validation_status.assert_awaited_once_with(query_id=7, is_valid=True)
+
+    def test_view_keeps_drf_csrf_checks_for_session_users(self):
+        request = APIRequestFactory(enforce_csrf_checks=True).post('/api/v1/query/generate/', {}, format='json')
+        request.user = User(username='analyst')
+
+        with mock.patch.object(QueryGenerationService, 'agenerate_query') as agenerate_query:
+            response = asyncio.run(views.generate_query(request))
+
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('CSRF', str(response.data['detail']))
+        agenerate_query.assert_not_called()
+
+
+class BatchGenerationTests(SimpleTestCase):
+    metadata = {'database_type': 'postgres', 'schema': {'tables': {'orders': {'columns': [{'name': 'id'}]}}}}
+
+    def test_token_bucket_makes_callers_wait_for_the_refill(self):
+        bucket = TokenBucket(rate=10, capacity=2)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertAlmostEqual(bucket.reserve(), 0.1, places=2)
+        self.assertAlmostEqual(bucket.reserve(), 0.2, places=2)
+
+    def test_batch_streams_every_item_and_reports_failures(self):
+        async def respond(prompt):
+            if 'broken' in prompt:
+                raise RuntimeError('provider error')
+            return 'SELECT 1'
+
+        body = {'prompts': ['orders', 'broken orders', 'orders per day'], 'dataset_metadata': self.metadata,
+                'llm_provider': 'Llama3 70B', 'project_id': 1, 'use_cache': False}
+        request = APIRequestFactory().post('/api/v1/query/generate/batch/', body, format='json')
+
+        async def run():
+            response = await views.generate_query_batch(request)
+            return response, b''.join([chunk async for chunk in response.streaming_content]).decode()
+
+        with mock.patch.object(generation_service.llm_registry, 'aget_model',
+                               new=mock.AsyncMock(return_value=llm_model(provider='other'))) as aget_model, \
+                mock.patch.object(generation_service.llm_registry, 'get_async_client',
+                                  return_value=streaming_client(respond)), \
+                mock.patch.object(generation_service, 'get_schema_index', wraps=get_schema_index) as index, \
+                mock.patch.object(views, 'GenerationRepository') as repository:
+            repository.return_value.asave_query_metadata = mock.AsyncMock(return_value=SimpleNamespace(query_id=7))
+            repository.return_value.aupdate_validation_status = mock.AsyncMock()
+            response, body = asyncio.run(run())
+
+        events = [chunk.splitlines() for chunk in body.strip().split('\n\n')]
+        items = {json.loads(data[6:])['index']: event for event, data in events[:-1]}
+        self.assertEqual(items, {0: 'event: item', 1: 'event: item_error', 2: 'event: item'})
+        self.assertEqual(events[-1][0], 'event: complete')
+        self.assertIn('"failed": 1', events[-1][1])
+        aget_model.assert_awaited_once()
+        index.assert_called_once()
+
+
+class HedgedGenerationTests(SimpleTestCase):
+    metadata = {'database_type': 'postgres', 'schema': {'tables': {'orders': {'columns': [{'name': 'id'}]}}}}
+
+    def generate(self, latencies, contents):
+        primary = llm_model(provider='other')
+        hedge = llm_model(name='Mixtral', model_code='mixtral', provider='other')
+        cancelled = []
+
+        def client(llmmodel):
+            async def respond(prompt):
+                try:
+                    await asyncio.sleep(latencies[llmmodel.model_code])
+                except asyncio.CancelledError:
+                    cancelled.append(llmmodel.model_code)
+                    raise
+                return contents[llmmodel.model_code]
+            return streaming_client(respond)
+
+        registry = generation_service.llm_registry
+        with mock.patch.object(registry, 'aget_model', new=mock.AsyncMock(return_value=primary)), \
+                mock.patch.object(registry, 'aget_active_models', new=mock.AsyncMock(return_value=[primary, hedge])), \
+                mock.patch.object(registry, 'get_async_client', side_effect=client), \
+                mock.patch.object(generation_service, 'latency_tracker', LatencyTracker()), \
+                mock.patch.object(generation_service, 'HedgeRepository') as repository:
+            repository.return_value.arecord = mock.AsyncMock()
+            repository.return_value.arecent_latencies = mock.AsyncMock(return_value=[])
+            with self.settings(QUERY_HEDGE_DEFAULT_DELAY_MS=50):
+                result = asyncio.run(QueryGenerationService.agenerate_hedged(
+                    'orders', self.metadata, 'Llama3 70B', use_cache=False
+                ))
+        repository.return_value.arecord.assert_awaited_once_with(result['hedge'])
+        return result, cancelled
+
+    def test_slow_primary_is_cancelled_when_the_hedge_answers_first(self):
+        result, cancelled = self.generate({'llama3-70b': 5, 'mixtral': 0.01},
+                                          {'llama3-70b': 'SELECT 1', 'mixtral': 'SELECT 2'})
+        self.assertEqual(result['generated_query'], 'SELECT 2')
+        self.assertEqual(result['llm_provider'], 'Mixtral')
+        self.assertEqual(cancelled, ['llama3-70b'])
+        self.assertEqual((result['hedge']['winner'], result['hedge']['primary_outcome']), ('hedge', 'cancelled'))
+
+    def test_invalid_primary_answer_is_hedged(self):
+        result, _ = self.generate({'llama3-70b': 0, 'mixtral': 0},
+                                  {'llama3-70b': 'DROP TABLE orders', 'mixtral': 'SELECT 2'})
+        self.assertEqual(result['generated_query'], 'SELECT 2')
+        self.assertEqual(result['hedge']['primary_outcome'], 'invalid')
+
+    def test_fast_primary_is_not_hedged(self):
+        result, _ = self.generate({'llama3-70b': 0, 'mixtral': 0}, {'llama3-70b': 'SELECT 1', 'mixtral': 'SELECT 2'})
+        self.assertEqual(result['generated_query'], 'SELECT 1')
+        self.assertEqual((result['hedge']['winner'], result['hedge']['hedge_outcome']), ('primary', 'not_started'))
+        self.assertEqual(percentile([30, 10, 20, 40], 0.5), 20)
+
+
+class SingleFlightTests(SimpleTestCase):
+    metadata = {'database_type': 'postgres', 'schema': {'tables': {'orders': {'columns': [{'name': 'id'}]}}}}
+
+    def test_identical_async_generations_share_one_llm_call(self):
+        calls = []
+
+        async def respond(prompt):
+            calls.append(prompt)
+            await asyncio.sleep(0.05)
+            return 'SELECT 1'
+
+        async def generate_all():
+            return await asyncio.gather(*(
+                QueryGenerationService.agenerate_query(prompt, self.metadata, 'Llama3 70B', use_cache=False)
+                for prompt in ['orders', 'orders ', 'Orders?', 'orders.', 'orders']
+            ))
+
+        with mock.patch.object(generation_service.llm_registry, 'aget_model',
+                               new=mock.AsyncMock(return_value=llm_model(provider='other'))), \
+                mock.patch.object(generation_service.llm_registry, 'get_async_client',
+                                  return_value=streaming_client(respond)):
+            results = asyncio.run(generate_all())
+
+        # 'Orders?' differs in case, which is kept in the key
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(sum(bool(result.get('coalesced')) for result in results), 3)
+        self.assertEqual(generation_service.single_flight.in_flight(), 0)
+
+    def test_followers_get_the_leaders_error(self):
+        flight = SingleFlight()
+        started = threading.Event()
+
+        def fail():
+            started.set()
+            time.sleep(0.05)
+            raise RuntimeError('provider error')
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            leader = executor.submit(flight.do, 'key', fail)
+            started.wait()
+            follower = executor.submit(flight.do, 'key', lambda: self.fail('follower called the provider'))
+            for future in (leader, follower):
+                with self.assertRaisesMessage(RuntimeError, 'provider error'):
+                    future.result()
+
+
+    def test_cancelling_the_last_waiter_cancels_the_leaders_call(self):
+        flight = SingleFlight()
+        cancelled = []
+
+        async def call():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        async def run():
+            leader = asyncio.ensure_future(flight.ado('key', call))
+            follower = asyncio.ensure_future(flight.ado('key', call))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            await asyncio.sleep(0.01)
+            # The follower still waits, so the call goes on
+            self.assertEqual(cancelled, [])
+            follower.cancel()
+            await asyncio.sleep(0.01)
+            # Checked before asyncio.run cancels whatever is left
+            self.assertEqual(cancelled, [True])
+
+        asyncio.run(run())
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_client_disconnect_stops_the_in_flight_provider_call(self):
+        cancelled = []
+
+        async def respond(prompt):
+            if 'slow' not in prompt:
+                return 'SELECT 1'
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(prompt)
+                raise
+
+        async def disconnect_after_first_item():
+            results = QueryGenerationService.agenerate_batch(
+                ['orders', 'slow orders'], self.metadata, 'Llama3 70B', use_cache=False
+            )
+            first = await anext(results)
+            # What the batch view does when the client goes away
+            await results.aclose()
+            await asyncio.sleep(0.01)
+            # Checked before asyncio.run cancels whatever is left
+            self.assertEqual(len(cancelled), 1)
+            return first
+
+        with mock.patch.object(generation_service.llm_registry, 'aget_model',
+                               new=mock.AsyncMock(return_value=llm_model(provider='other'))), \
+                mock.patch.object(generation_service.llm_registry, 'get_async_client',
+                                  return_value=streaming_client(respond)):
+            first = asyncio.run(disconnect_after_first_item())
+
+        self.assertEqual(first[0], 0)
+        self.assertEqual(generation_service.single_flight.in_flight(), 0)
+
+
+class StubProviderTests(SimpleTestCase):
+    metadata = {
+        'database_type': 'postgres',
+        'schema': {'tables': {
+            'orders': {'columns': [{'name': 'id', 'type': 'integer'}, {'name': 'status', 'type': 'text'},
+                                   {'name': 'amount', 'type': 'numeric'}]},
+        }}
+    }
+
+    def test_templates_follow_the_request(self):
+        prompt, _ = QueryGenerationService.prepare_prompt('total amount per status', self.metadata, llm_model())
+        self.assertEqual(render_sql(prompt), "SELECT status, SUM(amount) AS sum_amount\nFROM orders\nGROUP BY status")
+        prompt, _ = QueryGenerationService.prepare_prompt('how many orders', self.metadata, llm_model())
+        self.assertEqual(render_sql(prompt), "SELECT COUNT(*) AS row_count\nFROM orders")
+
+    def test_other_provider_generates_offline(self):
+        registry = LLMRegistry()
+        with self.settings(LLM_STUB_LATENCY_MS={'distribution': 'uniform', 'low': 0, 'high': 5},
+                           LLM_STUB_TOKENS_PER_SECOND=100000, LLM_STUB_SEED=1), \
+                mock.patch.object(generation_service, 'llm_registry', registry), \
+                mock.patch.object(registry, 'get_model', return_value=llm_model(provider='other')):
+            result = QueryGenerationService.generate_query('orders', self.metadata, 'Llama3 70B', use_cache=False)
+            response = registry.get_client(llm_model(provider='other')).invoke('2. User Request: orders')
+
+        self.assertEqual(result['generated_query'], "SELECT id, status, amount\nFROM orders\nLIMIT 100")
+        self.assertEqual(response.content, "```sql\nSELECT 1;\n```")
+        self.assertEqual(response.usage_metadata['output_tokens'], 6)
+
+
+class ModelRouterTests(SimpleTestCase):
+    def test_fastest_reliable_fitting_model_is_chosen(self):
+        tracker = LatencyTracker()
+        fast = llm_model(name='Fast', model_code='fast')
+        flaky = llm_model(name='Flaky', model_code='flaky')
+        small = llm_model(name='Small', model_code='small', context_window=1024, max_output_tokens=256)
+        slow = llm_model(name='Slow', model_code='slow')
+        for _ in range(10):
+            tracker.record('fast', 400)
+            tracker.record('flaky', 300)
+            tracker.record_error('flaky')
+            tracker.record('small', 100)
+            tracker.record('slow', 900)
+        router = ModelRouter(tracker)
+        models = [slow, flaky, small, fast, llm_model(name='Coder', model_code='coder', model_type='code')]
+
+        self.assertIs(router.choose(models, 'chat', required_tokens=2000), fast)
+        self.assertIs(router.choose(models, 'chat', required_tokens=100), small)
+        self.assertEqual(router.choose(models + [llm_model(name='New', model_code='new')], 'chat', 2000).name, 'New')
+        with self.assertRaises(ValueError):
+            router.choose(models, 'general')
+
+    def test_always_failing_model_is_not_chosen(self):
+        tracker = LatencyTracker()
+        good = llm_model(name='Good', model_code='good')
+        bad = llm_model(name='Bad', model_code='bad')
+        for _ in range(50):
+            tracker.record('good', 800)
+            tracker.record_error('bad')
+
+        self.assertEqual(tracker.error_rate('bad'), 1.0)
+        self.assertIs(ModelRouter(tracker).choose([bad, good], 'chat'), good)
+        self.assertIs(ModelRouter(tracker).choose([bad], 'chat'), bad)
+
+    def test_every_provider_has_an_adapter(self):
+        self.assertEqual(set(PROVIDER_ADAPTERS) - {'stub'}, {code for code, _ in LLMModel.PROVIDER_CHOICES} - {'other'})
+        with self.settings(LLM_STUB_ALL=True):
+            self.assertEqual(get_adapter(llm_model(provider='openai')).name, 'stub')
+
+    def test_models_of_providers_without_their_package_are_skipped(self):
+        openai = llm_model(name='GPT', provider='openai')
+        with mock.patch.object(PROVIDER_ADAPTERS['openai'], 'is_available', return_value=False):
+            with self.assertRaisesMessage(ValueError, 'langchain_openai'):
+                get_adapter(openai)
+            with self.assertLogs('query_generation.src.service.llm_registry', 'ERROR'):
+                self.assertEqual(LLMRegistry._usable([openai, llm_model()]), [llm_model()])
+
+
+class TelemetryTests(SimpleTestCase):
+    def test_call_is_retried_and_measured(self):
+        attempts = []
+
+        def stream(prompt):
+            attempts.append(prompt)
+            if len(attempts) == 1:
+                raise TimeoutError('read timed out')
+            yield AIMessageChunk(content='SELECT ')
+            yield AIMessageChunk(content='1', usage_metadata={'input_tokens': 120, 'output_tokens': 2,
+                                                              'total_tokens': 122})
+
+        generation = {'llmmodel': llm_model(), 'system_prompt': 'prompt'}
+        with self.settings(QUERY_LLM_RETRY_BACKOFF=0), \
+                mock.patch.object(generation_service, 'latency_tracker', LatencyTracker()), \
+                mock.patch.object(QueryGenerationService, '_create_llm', return_value=SimpleNamespace(stream=stream)):
+            content, metrics = QueryGenerationService._call_llm(generation)
+
+        self.assertEqual(content, 'SELECT 1')
+        self.assertEqual((metrics['retries'], metrics['prompt_tokens'], metrics['completion_tokens']), (1, 120, 2))
+        self.assertFalse(metrics['tokens_estimated'])
+        self.assertIsNotNone(metrics['time_to_first_token_ms'])
+        generation_service.LLMMetricsRepository.return_value.record.assert_called_with(metrics)
+
+    def test_metrics_are_aggregated_per_model(self):
+        rows = [
+            {'model_code': 'llama3-70b', 'call_time_ms': ms, 'time_to_first_token_ms': ms // 4, 'prompt_tokens': 500,
+             'completion_tokens': 50, 'retries': 0, 'succeeded': True}
+            for ms in range(100, 1100, 10)
+        ] + [{'model_code': 'llama3-70b', 'call_time_ms': 30000, 'time_to_first_token_ms': None,
+              'prompt_tokens': 500, 'completion_tokens': 0, 'retries': 2, 'succeeded': False}]
+        summary = summarize(rows)
+
+        with mock.patch.object(views, 'get_llm_metrics', return_value=summary), \
+                mock.patch.object(views.LLMModel, 'objects') as objects:
+            objects.values_list.return_value = [('llama3-70b', 'Llama3 70B')]
+            response = views.llm_metrics(APIRequestFactory().get('/api/v1/query/metrics/?model=llama3-70b'))
+
+        metrics = response.data['models']['llama3-70b']
+        self.assertEqual(metrics['name'], 'Llama3 70B')
+        self.assertEqual((metrics['calls'], metrics['errors'], metrics['retries']), (101, 1, 2))
+        self.assertEqual(metrics['call_time_ms'], {'p50': 590, 'p95': 1040, 'p99': 1080})
+        self.assertEqual(metrics['time_to_first_token_ms']['p50'], 147)
+
+
+class LLMModelAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # The app has no migrations; the table is dropped again when the class transaction rolls back
+        with connection.schema_editor() as editor:
+            editor.create_model(LLMModel)
+
+    def test_changelist_reads_the_telemetry_once(self):
+        LLMModel.objects.bulk_create([
+            LLMModel(name=code, model_code=code, api_model_name=code) for code in ('a', 'b', 'c')
+        ])
+        request = RequestFactory().get('/admin/query_generation/llmmodel/')
+        request.user = User(username='admin', is_active=True, is_staff=True, is_superuser=True)
+        model_admin = site._registry[LLMModel]
+        metrics = {'a': {'call_time_ms': {'p50': 1, 'p95': 2, 'p99': 3}, 'calls': 4, 'error_rate': 0.25}}
+
+        with mock.patch.object(generation_admin, 'get_llm_metrics', return_value=metrics) as get_llm_metrics:
+            changelist = model_admin.get_changelist_instance(request)
+            cells = {obj.model_code: model_admin.latency(obj) for obj in changelist.result_list}
+
+        get_llm_metrics.assert_called_once()
+        self.assertIn('25.0% errors', cells['a'])
+        self.assertEqual((cells['b'], cells['c']), ('-', '-'))
+
+
+class StreamGenerateQueryTests(SimpleTestCase):
+    body = {
+        'user_requirements': 'orders per customer',
+        'dataset_metadata': {'schema': {'tables': {}}},
+        'llm_provider': 'Llama3 70B',
+        'project_id': 1
+    }
+
+    def test_tokens_are_forwarded_and_the_query_is_saved_at_the_end(self):
+        events = iter([
+            {'type': 'token', 'text': '```sql\nSELECT '},
+            {'type': 'token', 'text': '1\n```'},
+            {'type': 'done', 'generated_query': 'SELECT 1', 'prepared_prompt': 'prompt',
+             'prompt_stats': {}, 'cache_hit': False, 'cache_key': 'key'},
+        ])
+        request = APIRequestFactory().post('/api/v1/query/generate/stream/', self.body, format='json')
+
+        with mock.patch.object(QueryGenerationService, 'stream_query', return_value=events), \
+                mock.patch.object(views, 'GenerationRepository') as repository:
+            repository.return_value.save_query_metadata.return_value = SimpleNamespace(query_id=42)
+            response = views.stream_generate_query(request)
+            body = b''.join(response.streaming_content).decode()
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = body.strip().split('\n\n')
+        self.assertEqual([chunk.splitlines()[0] for chunk in chunks],
+                         ['event: token', 'event: token', 'event: complete'])
+        self.assertIn('"query_id": 42', chunks[-1])
+        self.assertIn('"is_valid": true', chunks[-1])
+
+
+class LLMRegistryTests(SimpleTestCase):
+    def test_models_and_clients_are_reused_until_invalidated(self):
+        registry = LLMRegistry(ttl=60)
+        with mock.patch('query_generation.src.service.llm_registry.LLMModel.objects') as objects, \
+                mock.patch('query_generation.src.service.providers.ChatGroq') as chat:
+            objects.get.return_value = llm_model()
+            chat.side_effect = lambda **options: mock.Mock()
+            client = registry.get_client(registry.get_model('Llama3 70B'))
+            self.assertIs(registry.get_client(registry.get_model('Llama3 70B')), client)
+            self.assertIsNot(registry.get_client(llm_model(default_temperature=0.7)), client)
+
+            registry.invalidate()
+            registry.get_client(registry.get_model('Llama3 70B'))
+
+        self.assertEqual(objects.get.call_count, 2)
+        self.assertEqual(chat.call_count, 3)
@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     'query_integration',
     'query_generation',
     'rest_framework',
+    'adrf',
     'rest_framework.authtoken',
     'api_aggregation',
     'corsheaders',
@@ -129,6 +130,93 @@ CSRF_TRUSTED_ORIGINS = CORS_ALLOWED_ORIGINS.copy()
 # Requests timeout (seconds)
 REQUESTS_TIMEOUT = 30
 
+# Warehouse schema cache (seconds / number of projects)
+SCHEMA_CACHE_TTL = 3600
+SCHEMA_CACHE_MAX_ENTRIES = 128
+SCHEMA_CACHE_RECHECK_INTERVAL = 30
+# Stored schema catalog versions kept per project (0 keeps every version)
+SCHEMA_CATALOG_KEEP_VERSIONS = 10
+
+# Concurrent sample-row fetching during schema retrieval
+SCHEMA_SAMPLE_MAX_WORKERS = 8
+SCHEMA_SAMPLE_TIMEOUT = 10
+# Column statistics (?profile=true): per-table query timeout and cache lifetime (seconds)
+SCHEMA_PROFILE_TIMEOUT = 60
+SCHEMA_PROFILE_TTL = 86400
+
+# Pooled source-warehouse connections per project (connections / seconds)
+CONNECTION_POOL_MAX_IDLE = 8
+CONNECTION_POOL_IDLE_TIMEOUT = 300
+CONNECTION_POOL_HEALTH_CHECK_INTERVAL = 30
+CONNECTION_POOL_EVICTION_INTERVAL = 60
+
+# Background schema refresh (manage.py refresh_schemas)
+SCHEMA_REFRESH_INTERVAL = 900
+SCHEMA_REFRESH_JITTER = 0.1
+SCHEMA_REFRESH_POLL_INTERVAL = 30
+SCHEMA_REFRESH_MAX_CONCURRENCY = 4
+SCHEMA_REFRESH_TYPE_LIMITS = {
+    'postgres': 4,
+    'mysql': 4,
+    'snowflake': 2,
+    'bigquery': 2,
+}
+
+# Prompt schema pruning: tables ranked most relevant to a request (plus their
+# foreign key neighbours) and number of cached schema relevance indexes
+QUERY_SCHEMA_TOP_K = 8
+QUERY_SCHEMA_INDEX_CACHE_SIZE = 64
+# Tokens kept free in the model's context window besides max_output_tokens
+QUERY_PROMPT_TOKEN_RESERVE = 256
+# Generated queries reused for identical requests (seconds / number of entries)
+QUERY_GENERATION_CACHE_TTL = 86400
+QUERY_GENERATION_CACHE_MAX_ENTRIES = 10000
+# Stores that evict expired and least recently used entries: one in this many, on average
+QUERY_GENERATION_CACHE_EVICT_EVERY = 100
+# Seconds LLMModel rows stay cached per process (admin edits invalidate them at once)
+LLM_REGISTRY_TTL = 300
+# Batch generation: concurrent LLM calls per batch and prompts per request
+QUERY_BATCH_CONCURRENCY = 8
+QUERY_BATCH_MAX_PROMPTS = 100
+# Per-provider limits of the async generation path (requests_per_minute, tokens_per_minute)
+LLM_PROVIDER_RATE_LIMITS = {
+    'groq': {'requests_per_minute': 30},
+}
+# Hedged generation ("hedge": true): a second active model (QUERY_HEDGE_MODEL, or
+# the fastest one) is asked when the first one is slower than this percentile of
+# its last QUERY_HEDGE_LATENCY_WINDOW calls, or than the default delay (ms) while
+# fewer than QUERY_HEDGE_MIN_SAMPLES are known
+QUERY_HEDGE_PERCENTILE = 0.95
+QUERY_HEDGE_MIN_SAMPLES = 20
+QUERY_HEDGE_DEFAULT_DELAY_MS = 3000
+QUERY_HEDGE_LATENCY_WINDOW = 200
+QUERY_HEDGE_MODEL = None
+# Seconds a request waits for an identical generation already in flight before calling the LLM itself
+QUERY_COALESCE_TIMEOUT = 120
+# Offline stub LLM: models of these providers (every model with LLM_STUB_ALL=1)
+# answer with template SQL after a simulated time-to-first-token (ms) and token
+# rate. Both are a number or a distribution: {'distribution': 'constant' (value),
+# 'uniform' (low, high), 'normal' (mean, stddev) or 'lognormal' (median, sigma)}
+LLM_STUB_PROVIDERS = ['other']
+LLM_STUB_ALL = os.getenv('LLM_STUB_ALL', '').lower() in ('1', 'true', 'yes')
+LLM_STUB_LATENCY_MS = {'distribution': 'lognormal', 'median': 300, 'sigma': 0.5}
+LLM_STUB_TOKENS_PER_SECOND = {'distribution': 'normal', 'mean': 250, 'stddev': 50}
+LLM_STUB_SEED = None
+# Model routing ("model_class" instead of "llm_provider"): models with fewer
+# recorded calls than this are tried first, then the lowest expected latency wins;
+# models failing more often than QUERY_ROUTER_MAX_ERROR_RATE are used last
+QUERY_ROUTER_MIN_SAMPLES = 5
+QUERY_ROUTER_MAX_ERROR_RATE = 0.5
+# Retries of failed provider calls (timeouts, connection errors, 429, 5xx) and first backoff (seconds)
+QUERY_LLM_MAX_RETRIES = 2
+QUERY_LLM_RETRY_BACKOFF = 0.5
+# Per-call LLM telemetry (saved as LLMCallMetric rows when enabled): hours aggregated by /api/v1/query/metrics/ and the
+# admin, maximum calls read, and seconds the aggregates are cached
+LLM_CALL_METRICS_ENABLED = True
+LLM_METRICS_WINDOW_HOURS = 24
+LLM_METRICS_MAX_SAMPLES = 10000
+LLM_METRICS_CACHE_TTL = 30
+
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 